@@ -0,0 +1,2 @@
+# conftest.py
+# Berada di root repo agar pytest menaruh root di sys.path (import "src.*").
@@ -0,0 +1,305 @@
+# src/communication/binary_rpc.py
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from urllib.parse import urlsplit
+
+try:
+    import msgpack
+except ImportError:  # msgpack opsional; tanpa itu body frame memakai JSON
+    msgpack = None
+
+log = logging.getLogger(__name__)
+
+# Aktifkan transport biner internal (server + client); HTTP tetap jadi fallback
+RPC_BINARY = os.environ.get("RPC_BINARY", "0") == "1"
+
+# Port biner = port HTTP node + offset ini (TCP)
+RPC_BINARY_PORT_OFFSET = int(os.environ.get("RPC_BINARY_PORT_OFFSET", 1000))
+
+# Direktori Unix socket untuk node yang satu host; kosong = hanya TCP.
+# Socket bernama "<host>-<port>.sock" sesuai host:port di URL yang dipakai peer
+# (server memakai nama yang diiklankan, bukan alamat bind seperti 0.0.0.0).
+RPC_UNIX_DIR = os.environ.get("RPC_UNIX_DIR", "")
+
+# Setelah gagal konek, peer dikirimi lewat HTTP dulu selama ini (detik)
+RPC_BINARY_RETRY = float(os.environ.get("RPC_BINARY_RETRY", 5.0))
+
+# Batas ukuran satu frame (byte); chunk snapshot jauh di bawah ini
+RPC_BINARY_MAX_FRAME = int(os.environ.get("RPC_BINARY_MAX_FRAME", 64 * 1024 * 1024))
+
+# Header frame: panjang body, correlation id, jenis frame, codec body
+FRAME_HEADER = struct.Struct(">IIBB")
+
+FRAME_REQUEST = 0
+FRAME_RESPONSE = 1
+FRAME_ERROR = 2          # handler gagal; pemanggil menganggap RPC gagal (seperti HTTP 5xx)
+FRAME_NOT_FOUND = 3      # path tidak punya handler biner; pemanggil pakai HTTP
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+
+class BinaryUnavailable(Exception):
+    """RPC tidak bisa lewat transport biner (belum terkirim); aman diulang lewat HTTP."""
+
+
+def encode_body(value, codec: int) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def decode_body(body: bytes, codec: int):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("codec msgpack tidak tersedia")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body) if body else None
+
+
+def pack_frame(kind: int, correlation_id: int, value, codec: int) -> bytes:
+    body = encode_body(value, codec)
+    return FRAME_HEADER.pack(len(body), correlation_id, kind, codec) + body
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Membaca satu frame; mengembalikan (kind, correlation_id, codec, body)."""
+    header = await reader.readexactly(FRAME_HEADER.size)
+    length, correlation_id, kind, codec = FRAME_HEADER.unpack(header)
+    if length > RPC_BINARY_MAX_FRAME:
+        raise ValueError(f"frame terlalu besar ({length} byte)")
+    body = await reader.readexactly(length) if length else b""
+    return kind, correlation_id, codec, body
+
+
+def unix_socket_path(host: str, port: int) -> str:
+    """Path socket untuk node yang dihubungi peer lewat http://<host>:<port>."""
+    return os.path.join(RPC_UNIX_DIR, f"{host}-{port}.sock")
+
+
+class BinaryRpcServer:
+    """
+    Server RPC internal: frame biner di atas koneksi TCP/Unix persisten.
+
+    Setiap frame request berisi [path, payload] dan dijawab dengan frame
+    ber-correlation id yang sama; request dalam satu koneksi diproses
+    bersamaan sehingga balasan bisa keluar tidak berurutan (multiplexing).
+    Handler menerima payload dict dan mengembalikan dict, sama seperti body
+    JSON endpoint HTTP-nya.
+
+    'advertise_host' adalah nama host di URL yang dipakai peer untuk node ini
+    (biasanya node_id); dari situ nama Unix socket dibentuk, sama seperti client.
+    """
+
+    def __init__(self, host: str, http_port: int, advertise_host: str = None):
+        self.host = host
+        self.advertise_host = advertise_host or host
+        self.http_port = http_port
+        self.port = http_port + RPC_BINARY_PORT_OFFSET
+        self.routes = {}
+        # (prefix, handler) untuk path berparameter, mis. /bus/invalidate/{key}
+        self.prefix_routes = []
+        self.servers = []
+        self.tasks = set()
+
+    def add_route(self, path: str, handler, prefix: bool = False):
+        """Daftarkan handler async(payload) -> dict untuk path (atau semua path berawalan 'path')."""
+        if prefix:
+            self.prefix_routes.append((path, handler))
+        else:
+            self.routes[path] = handler
+
+    def resolve(self, path: str):
+        handler = self.routes.get(path)
+        if handler is None:
+            for prefix, prefix_handler in self.prefix_routes:
+                if path.startswith(prefix):
+                    return prefix_handler
+        return handler
+
+    async def start(self):
+        self.servers.append(await asyncio.start_server(self.handle_connection, self.host, self.port))
+        endpoints = [f"tcp://{self.host}:{self.port}"]
+        if RPC_UNIX_DIR:
+            path = unix_socket_path(self.advertise_host, self.http_port)
+            if os.path.exists(path):
+                os.unlink(path)
+            self.servers.append(await asyncio.start_unix_server(self.handle_connection, path))
+            endpoints.append(f"unix://{path}")
+        log.info(f"RPC biner aktif di {', '.join(endpoints)}")
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        for task in list(self.tasks):
+            task.cancel()
+        self.servers = []
+        if RPC_UNIX_DIR:
+            path = unix_socket_path(self.advertise_host, self.http_port)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                kind, correlation_id, codec, body = await read_frame(reader)
+                if kind != FRAME_REQUEST:
+                    continue
+                task = asyncio.create_task(self.handle_request(writer, correlation_id, codec, body))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            log.error(f"Koneksi RPC biner ditutup: {e}")
+        finally:
+            writer.close()
+
+    async def handle_request(self, writer: asyncio.StreamWriter, correlation_id: int, codec: int, body: bytes):
+        try:
+            path, payload = decode_body(body, codec)
+        except Exception as e:
+            # Codec tidak didukung di sisi ini: balas JSON agar pengirim fallback ke HTTP
+            writer.write(pack_frame(FRAME_NOT_FOUND, correlation_id, str(e), CODEC_JSON))
+            return
+        handler = self.resolve(path)
+        if handler is None:
+            writer.write(pack_frame(FRAME_NOT_FOUND, correlation_id, path, codec))
+            return
+        try:
+            frame = pack_frame(FRAME_RESPONSE, correlation_id, await handler(payload), codec)
+        except Exception as e:
+            log.error(f"Error handler RPC biner {path}: {e}")
+            frame = pack_frame(FRAME_ERROR, correlation_id, str(e), codec)
+        if not writer.is_closing():
+            writer.write(frame)
+
+
+class BinaryConnection:
+    """Satu koneksi persisten ke peer; banyak request in-flight dibedakan dengan correlation id."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        # correlation id -> Future balasan
+        self.pending = {}
+        self.drain_lock = asyncio.Lock()
+        self.closed = False
+        self.reader_task = asyncio.create_task(self.read_loop())
+
+    async def read_loop(self):
+        try:
+            while True:
+                kind, correlation_id, codec, body = await read_frame(self.reader)
+                future = self.pending.pop(correlation_id, None)
+                if future is not None and not future.done():
+                    future.set_result((kind, codec, body))
+        except Exception as e:
+            self.fail(e)
+
+    def fail(self, error: Exception):
+        self.closed = True
+        self.writer.close()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"koneksi RPC biner putus: {error}"))
+        self.pending.clear()
+
+    async def call(self, path: str, payload: dict, codec: int):
+        self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+        correlation_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[correlation_id] = future
+        try:
+            self.writer.write(pack_frame(FRAME_REQUEST, correlation_id, [path, payload], codec))
+            async with self.drain_lock:
+                await self.writer.drain()
+            return await future
+        finally:
+            self.pending.pop(correlation_id, None)
+
+    def close(self):
+        self.reader_task.cancel()
+        self.fail(ConnectionError("ditutup"))
+
+
+class BinaryRpcClient:
+    """
+    Sisi client transport biner: satu koneksi per peer (Unix socket jika ada
+    socket peer di RPC_UNIX_DIR, selain itu TCP ke port HTTP + offset).
+
+    call() melempar BinaryUnavailable jika RPC belum terkirim (peer tak bisa
+    dihubungi lewat biner, atau path tidak punya handler biner) sehingga
+    pemanggil bisa mengulang lewat HTTP tanpa risiko eksekusi ganda.
+    """
+
+    def __init__(self, connect_timeout: float):
+        self.connect_timeout = connect_timeout
+        self.codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+        # (host, port HTTP) -> BinaryConnection
+        self.connections = {}
+        self.connecting = {}
+        # (host, port HTTP) -> waktu monotonic sampai boleh mencoba biner lagi
+        self.retry_at = {}
+        # (host, port HTTP, path) yang ditolak peer (tidak ada handler biner)
+        self.unsupported = set()
+
+    async def connect(self, host: str, port: int) -> BinaryConnection:
+        path = unix_socket_path(host, port) if RPC_UNIX_DIR else None
+        if path and os.path.exists(path):
+            opener = asyncio.open_unix_connection(path)
+        else:
+            opener = asyncio.open_connection(host, port + RPC_BINARY_PORT_OFFSET)
+        reader, writer = await asyncio.wait_for(opener, self.connect_timeout)
+        return BinaryConnection(reader, writer)
+
+    async def get_connection(self, host: str, port: int) -> BinaryConnection:
+        key = (host, port)
+        connection = self.connections.get(key)
+        if connection is not None and not connection.closed:
+            return connection
+        if time.monotonic() < self.retry_at.get(key, 0.0):
+            raise BinaryUnavailable("peer sedang memakai HTTP")
+        # Satu percobaan konek per peer; pemanggil lain menunggu hasil yang sama
+        pending = self.connecting.get(key)
+        if pending is None:
+            pending = self.connecting[key] = asyncio.ensure_future(self.connect(host, port))
+        try:
+            connection = await asyncio.shield(pending)
+        except Exception as e:
+            self.retry_at[key] = time.monotonic() + RPC_BINARY_RETRY
+            raise BinaryUnavailable(f"gagal konek biner ke {host}:{port}: {e}")
+        finally:
+            if self.connecting.get(key) is pending and pending.done():
+                del self.connecting[key]
+        self.connections[key] = connection
+        return connection
+
+    async def call(self, target_url: str, payload: dict, timeout: float):
+        """Kirim satu RPC; mengembalikan dict balasan atau None jika gagal (seperti HTTP)."""
+        url = urlsplit(target_url)
+        host, port = url.hostname, url.port or 80
+        path = url.path or "/"
+        if (host, port, path) in self.unsupported:
+            raise BinaryUnavailable(path)
+        connection = await self.get_connection(host, port)
+        kind, codec, body = await asyncio.wait_for(connection.call(path, payload, self.codec), timeout)
+        if kind == FRAME_NOT_FOUND:
+            self.unsupported.add((host, port, path))
+            raise BinaryUnavailable(path)
+        if kind != FRAME_RESPONSE:
+            log.error(f"RPC biner ke {target_url} gagal: {decode_body(body, codec)}")
+            return None
+        result = decode_body(body, codec)
+        return result if result is not None else {}
+
+    async def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
@@ -3,22 +3,116 @@
 import aiohttp
 import asyncio
 import logging
+import os
+
+from src.communication.binary_rpc import RPC_BINARY, BinaryRpcClient, BinaryUnavailable
 
-# Mengatur logging dasar untuk melihat output
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-# src/communication/message_passing.py
-# (Pastikan di-update)
+# Konfigurasi transport antar-node (bisa di-override lewat environment)
+RPC_TIMEOUT = float(os.environ.get("RPC_TIMEOUT", 2.0))                    # Batas total satu RPC (detik)
+RPC_CONNECT_TIMEOUT = float(os.environ.get("RPC_CONNECT_TIMEOUT", 0.5))    # Batas buka koneksi TCP (detik)
+RPC_POOL_LIMIT = int(os.environ.get("RPC_POOL_LIMIT", 100))                # Total koneksi di pool
+RPC_POOL_LIMIT_PER_HOST = int(os.environ.get("RPC_POOL_LIMIT_PER_HOST", 16))  # Koneksi per peer
+RPC_KEEPALIVE_TIMEOUT = float(os.environ.get("RPC_KEEPALIVE_TIMEOUT", 30.0))  # Umur koneksi idle (detik)
 
-import aiohttp
-import asyncio
-import logging
 
-logging.basicConfig(level=logging.INFO)
-log = logging.getLogger(__name__)
+class NodeTransport:
+    """
+    Transport HTTP jangka panjang milik satu node.
+
+    Satu ClientSession (dan satu pool koneksi keep-alive) dipakai ulang
+    untuk semua RPC antar-node, sehingga heartbeat Raft, bus snooping MESI
+    dan forward queue tidak perlu handshake TCP baru setiap kali kirim.
+
+    Dengan RPC_BINARY=1, RPC dikirim dulu lewat transport biner (frame
+    length-prefixed, koneksi persisten ter-multiplex); HTTP dipakai jika
+    peer tidak bisa dihubungi lewat biner atau path-nya tidak didukung.
+    """
+
+    def __init__(self, timeout: float = RPC_TIMEOUT, connect_timeout: float = RPC_CONNECT_TIMEOUT,
+                 pool_limit: int = RPC_POOL_LIMIT, pool_limit_per_host: int = RPC_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = RPC_KEEPALIVE_TIMEOUT, binary: bool = RPC_BINARY):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.binary = BinaryRpcClient(connect_timeout) if binary else None
+
+    async def start(self):
+        """
+        Hook startup: membuat session dan pool koneksi.
+        Aman dipanggil berkali-kali.
+        """
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout)
+        )
+
+    async def close(self):
+        """Hook shutdown: menutup semua koneksi di pool."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        if self.binary is not None:
+            await self.binary.close()
+
+    async def send_message(self, target_url: str, payload: dict, timeout: float = None):
+        """
+        Sama seperti 'send_message' global, tapi memakai pool milik node.
+        Mengembalikan dict balasan, {} jika balasan bukan JSON, atau None jika gagal.
+        """
+        if self.binary is not None:
+            try:
+                return await self.binary.call(target_url, payload, timeout if timeout is not None else self.timeout)
+            except BinaryUnavailable:
+                pass
+            except asyncio.TimeoutError:
+                log.error(f"Timeout saat mengirim pesan ke {target_url}")
+                return None
+            except Exception as e:
+                log.error(f"Error saat mengirim pesan ke {target_url}: {e}")
+                return None
+        # Start malas (lazy) jika ada RPC sebelum hook startup dipanggil
+        await self.start()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+        try:
+            async with self.session.post(target_url, json=payload, timeout=request_timeout) as response:
+                response.raise_for_status()
+                try:
+                    return await response.json()
+                except aiohttp.ContentTypeError:
+                    return {}
+        except aiohttp.ClientConnectorError:
+            log.error(f"Gagal terhubung ke {target_url}. Node mungkin offline.")
+            return None
+        except asyncio.TimeoutError:
+            log.error(f"Timeout saat mengirim pesan ke {target_url}")
+            return None
+        except Exception as e:
+            log.error(f"Error saat mengirim pesan ke {target_url}: {e}")
+            return None
+
+
+async def send_message(target_url: str, payload: dict, transport: NodeTransport = None):
+    """
+    Mengirim satu pesan POST JSON ke node lain.
+    Jika 'transport' diberikan, koneksi dari pool-nya dipakai ulang;
+    tanpa transport, session sekali pakai dibuat seperti sebelumnya.
+    """
+    if transport is not None:
+        return await transport.send_message(target_url, payload)
 
-async def send_message(target_url: str, payload: dict):
     async with aiohttp.ClientSession() as session:
         try:
             async with session.post(target_url, json=payload) as response:
@@ -29,10 +123,10 @@ async def send_message(target_url: str, payload: dict):
                     return await response.json()
                 except aiohttp.ContentTypeError:
                     return {} # Kembalikan dict kosong jika tidak ada JSON
-                
+
         except aiohttp.ClientConnectorError:
             log.error(f"Gagal terhubung ke {target_url}. Node mungkin offline.")
             return None # Kembalikan None jika node down
         except Exception as e:
             log.error(f"Error saat mengirim pesan ke {target_url}: {e}")
-            return None # Kembalikan None untuk error lain
\ No newline at end of file
+            return None # Kembalikan None untuk error lain
@@ -1,97 +1,662 @@
 # src/consensus/raft.py
 
 import asyncio
+import base64
+import heapq
+import itertools
+import os
 import random
 import logging
+import time
+
+from src.utils.metrics import RttEstimator
 
 log = logging.getLogger(__name__)
 
+# Interval heartbeat Leader (detik) sebelum ada pengukuran RTT
+HEARTBEAT_INTERVAL = float(os.environ.get("RAFT_HEARTBEAT_INTERVAL", 0.5))
+
+# Election timeout minimum awal (detik), lihat get_election_timeout()
+ELECTION_TIMEOUT_MIN = float(os.environ.get("RAFT_ELECTION_TIMEOUT_MIN", 1.5))
+
+# Adaptive timing: Leader mengukur RTT tiap peer dari balasan AppendEntries lalu
+#   heartbeat        = HEARTBEAT_RTT_MULT x RTO peer ke-mayoritas, dibatasi [MIN, MAX]
+#   election timeout = ELECTION_HEARTBEAT_MULT x heartbeat + RTO peer terlambat,
+#                      dibatasi [FLOOR, CEIL]
+# Nilainya ikut dikirim di AppendEntries sehingga follower memakai nilai yang sama.
+ADAPTIVE_TIMING = os.environ.get("RAFT_ADAPTIVE_TIMING", "1") != "0"
+HEARTBEAT_MIN = float(os.environ.get("RAFT_HEARTBEAT_MIN", 0.05))
+HEARTBEAT_MAX = float(os.environ.get("RAFT_HEARTBEAT_MAX", HEARTBEAT_INTERVAL))
+ELECTION_TIMEOUT_FLOOR = float(os.environ.get("RAFT_ELECTION_TIMEOUT_FLOOR", 0.3))
+ELECTION_TIMEOUT_CEIL = float(os.environ.get("RAFT_ELECTION_TIMEOUT_CEIL", ELECTION_TIMEOUT_MIN))
+HEARTBEAT_RTT_MULT = float(os.environ.get("RAFT_HEARTBEAT_RTT_MULT", 4))
+ELECTION_HEARTBEAT_MULT = float(os.environ.get("RAFT_ELECTION_HEARTBEAT_MULT", 5))
+
+# Lease Leader = fraksi dari election timeout minimum, dihitung sejak heartbeat
+# yang di-ack mayoritas dikirim. Sisa fraksinya adalah margin untuk clock drift.
+LEASE_RATIO = float(os.environ.get("RAFT_LEASE_RATIO", 0.8))
+
+# Pre-Vote: node yang timeout harus mendapat pre-vote mayoritas dulu sebelum
+# menaikkan term, sehingga node yang terisolasi tidak mengganggu Leader sehat
+PRE_VOTE = os.environ.get("RAFT_PRE_VOTE", "1") != "0"
+
+# Check-quorum: Leader turun jika mayoritas tidak meng-ack heartbeat-nya
+# dalam election timeout minimum
+CHECK_QUORUM = os.environ.get("RAFT_CHECK_QUORUM", "1") != "0"
+
+# Batas jumlah entry log dalam satu AppendEntries
+MAX_ENTRIES_PER_APPEND = int(os.environ.get("RAFT_MAX_ENTRIES_PER_APPEND", 256))
+
+# Maksimum AppendEntries yang boleh berjalan bersamaan ke satu follower (pipeline)
+REPLICATION_WINDOW = int(os.environ.get("RAFT_REPLICATION_WINDOW", 4))
+
+# Node baru yang bergabung ke cluster berjalan: mulai tanpa konfigurasi (bukan voter,
+# tidak pernah memulai election) sampai Leader mengirim konfigurasi lewat log/snapshot
+JOIN_EXISTING = os.environ.get("RAFT_JOIN", "0") == "1"
+
+# Learner dianggap sudah mengejar jika tertinggal paling banyak sekian entry dari Leader
+LEARNER_CATCHUP_ENTRIES = int(os.environ.get("RAFT_LEARNER_CATCHUP_ENTRIES", 100))
+
+# Ambil snapshot setiap kali sekian entry diterapkan sejak snapshot terakhir
+SNAPSHOT_THRESHOLD = int(os.environ.get("RAFT_SNAPSHOT_THRESHOLD", 10000))
+
+# Ukuran satu chunk InstallSnapshot (byte, sebelum base64)
+SNAPSHOT_CHUNK_BYTES = int(os.environ.get("RAFT_SNAPSHOT_CHUNK_BYTES", 256 * 1024))
+
+# Leadership transfer: seberapa sering match_index target dicek selama dikejar worker (detik)
+TRANSFER_POLL_INTERVAL = 0.01
+
+
+class PeerReplicator:
+    """
+    Stream replikasi Leader ke satu follower, dijalankan oleh satu worker.
+
+    probing=True : titik cocok log follower belum diketahui, hanya satu
+                   AppendEntries berjalan dan next_index baru maju setelah di-ack.
+    probing=False: pipeline, hingga REPLICATION_WINDOW AppendEntries berjalan
+                   bersamaan dan next_index dimajukan optimistis saat mengirim.
+    """
+    __slots__ = ("peer_id", "probing", "inflight", "last_sent", "retry_at", "read_seq_sent", "wake", "task")
+
+    def __init__(self, peer_id: str):
+        self.peer_id = peer_id
+        self.probing = True
+        self.inflight = 0
+        self.last_sent = 0.0
+        self.retry_at = 0.0   # Setelah RPC gagal, entry baru ditahan sampai waktu ini
+        self.read_seq_sent = 0  # read_seq terbaru yang sudah ikut AppendEntries ke peer ini
+        self.wake = asyncio.Event()
+        self.task = None
+
+    def window(self) -> int:
+        return 1 if self.probing else REPLICATION_WINDOW
+
+    def to_dict(self) -> dict:
+        return {
+            "probing": self.probing,
+            "inflight": self.inflight
+        }
+
+
+def config_from_command(command: dict) -> dict:
+    """Konfigurasi cluster dari entry log {"op": "config", ...}."""
+    return {"voters": command.get("voters", {}), "learners": command.get("learners", {})}
+
+
 class RaftConsensus:
     """
-    Mengelola logika state Raft (Follower, Candidate, Leader)
-    dan proses election.
+    Mengelola logika state Raft (Follower, Candidate, Leader),
+    proses election, dan replikasi log perintah.
     """
-    
-    def __init__(self, node):
+
+    def __init__(self, node, storage=None):
         # 'node' adalah referensi ke objek LockManagerNode
         # agar kita bisa mengakses self.node_id, self.peer_list,
-        # dan self.broadcast_message()
-        self.node = node 
-        
+        # self.broadcast_rpc() dan self.apply_command()
+        self.node = node
+
+        # Penyimpanan persisten (RaftStorage) opsional; None = hanya di memori
+        self.storage = storage
+
         # Inisialisasi state Raft
         self.state = 'follower'
         self.current_term = 0
         self.voted_for = None
         self.votes_received = set()
-        
-        # Timer yang akan memicu election jika tidak di-reset
+
+        # Replicated log
+        # Format entry: {"term": int, "command": dict}, index dimulai dari 1.
+        # self.log hanya berisi entry SETELAH snapshot_index (sisanya sudah dipadatkan).
+        self.log = []
+        self.snapshot_index = 0  # Index entry terakhir yang tercakup snapshot
+        self.snapshot_term = 0
+        self.snapshot_data = None  # Snapshot state machine (bytes) untuk dikirim ke follower
+        self.incoming_snapshot = None  # Chunk InstallSnapshot yang sedang diterima
+        self.commit_index = 0   # Index tertinggi yang sudah di-commit mayoritas
+        self.last_applied = 0   # Index tertinggi yang sudah diterapkan ke state machine
+
+        # State khusus Leader (di-reset setiap kali menang pemilu)
+        self.next_index = {}    # peer_id -> index entry berikutnya yang dikirim
+        self.match_index = {}   # peer_id -> index tertinggi yang diketahui sudah tereplikasi
+
+        # Perintah klien yang menunggu commit: index -> Future(hasil apply)
+        self.pending_commands = {}
+
+        # Pembaca yang menunggu last_applied mencapai index tertentu: heap (index, seq, Future)
+        self.apply_waiters = []
+        self.apply_waiter_seq = itertools.count()
+
+        # Leader yang kita kenal (dari AppendEntries) dan kapan terakhir kontak (monotonic)
+        self.leader_id = None
+        self.last_leader_contact = 0.0
+
+        # Khusus Leader: index entry no-op term ini, dan waktu kirim heartbeat
+        # terbaru yang sudah di-ack tiap peer (untuk lease)
+        self.term_start_index = 0
+        self.peer_ack_at = {}
+        self.leader_since = 0.0
+
+        # Timing yang sedang berlaku (adaptive). lease_timeout adalah election timeout
+        # yang pasti sudah dipakai semua follower: turun seketika, naik tertunda.
+        self.heartbeat_interval = HEARTBEAT_INTERVAL
+        self.election_timeout_min = ELECTION_TIMEOUT_MIN
+        self.lease_timeout = ELECTION_TIMEOUT_MIN
+        self.timing_raised_at = 0.0
+        self.peer_rtt = {}   # peer_id -> RttEstimator (diukur Leader)
+
+        # Khusus Leader: peer tujuan leadership transfer yang sedang berjalan.
+        # Selama transfer, perintah baru ditolak dan lease read tidak dipakai.
+        self.transfer_target = None
+
+        # Peer yang sedang dikirimi snapshot (agar tidak dikirim dobel)
+        self.snapshot_transfers = set()
+
+        # Konfigurasi cluster: {"voters": {id: url}, "learners": {id: url}}.
+        # Berlaku begitu entry config masuk log (belum perlu commit); config_index
+        # = index entry-nya (0 = bootstrap dari PEERS). snapshot_config = konfigurasi
+        # pada snapshot_index, ikut disimpan/dikirim bersama snapshot.
+        self.initial_config = self.bootstrap_config()
+        self.config = self.initial_config
+        self.config_index = 0
+        self.snapshot_config = None
+
+        # Satu loop timer election yang hidup terus; heartbeat/vote hanya
+        # memajukan deadline (monotonic), tanpa cancel/buat task baru
+        self.election_deadline = 0.0
         self.election_timer_task = None
-        
-        # Timer untuk Leader mengirim heartbeat
+
+        # Timer untuk Leader mengirim heartbeat (check-quorum & timing adaptif)
         self.heartbeat_timer_task = None
 
+        # Khusus Leader: peer_id -> PeerReplicator (satu worker replikasi per follower)
+        self.replicators = {}
+
+        # ReadIndex: setiap read yang butuh konfirmasi kepemimpinan menaikkan read_seq,
+        # worker membawa read_seq terbaru di AppendEntries berikutnya ke peer-nya, dan
+        # peer_read_ack = read_seq tertinggi yang sudah di-ack tiap peer. Read yang
+        # datang sebelum AppendEntries itu terkirim berbagi satu ronde heartbeat.
+        self.read_seq = 0
+        self.peer_read_ack = {}
+        self.read_waiters = []  # heap (read_seq, Future)
+
+        if self.storage is not None:
+            self.restore_from_storage()
+        else:
+            self.rebuild_config()
+
+    # --- Persistensi ---
+
+    def restore_from_storage(self):
+        """
+        Memuat term, vote, snapshot terakhir, lalu hanya tail log
+        setelah snapshot dari disk setelah restart.
+        """
+        meta = self.storage.load_meta()
+        self.current_term = meta.get("current_term", 0)
+        self.voted_for = meta.get("voted_for")
+        snapshot = self.storage.load_snapshot()
+        if snapshot is not None:
+            index, term, data, config = snapshot
+            self.node.restore_state(data, index)
+            self.snapshot_index = self.commit_index = self.last_applied = index
+            self.snapshot_term = term
+            self.snapshot_data = data
+            self.snapshot_config = config
+        self.log = self.storage.load(after_index=self.snapshot_index)
+        self.rebuild_config()
+        self.storage.on_synced = self.advance_commit_index
+        log.info(f"[{self.node.node_id}] Raft dipulihkan: term {self.current_term}, "
+                 f"voted_for {self.voted_for}, snapshot index {self.snapshot_index}, "
+                 f"{len(self.log)} entry log")
+
+    def persist_meta(self):
+        """Simpan current_term/voted_for sebelum membalas RPC apa pun."""
+        if self.storage is not None:
+            self.storage.save_meta(self.current_term, self.voted_for)
+
+    def append_to_log(self, entries: list):
+        """Menambahkan entry ke akhir log (memori + WAL)."""
+        start_index = self.last_log_index() + 1
+        self.log.extend(entries)
+        if self.storage is not None:
+            self.storage.append(start_index, entries)
+        # Entry config langsung berlaku begitu masuk log
+        for offset in range(len(entries) - 1, -1, -1):
+            if entries[offset]["command"].get("op") == "config":
+                self.set_config(config_from_command(entries[offset]["command"]), start_index + offset)
+                break
+
+    def truncate_log(self, index: int):
+        """Membuang entry dengan index >= 'index' (memori + WAL)."""
+        del self.log[index - self.snapshot_index - 1:]
+        if self.storage is not None:
+            self.storage.truncate_from(index)
+        if self.config_index >= index:
+            # Entry config yang berlaku ikut terbuang: kembali ke konfigurasi sebelumnya
+            self.rebuild_config()
+
+    def durable_index(self) -> int:
+        """Index terakhir yang sudah aman di disk lokal (seluruh log jika tanpa storage)."""
+        if self.storage is None:
+            return self.last_log_index()
+        return min(self.storage.synced_index, self.last_log_index())
+
+    # --- Helper Log ---
+
+    def last_log_index(self) -> int:
+        return self.snapshot_index + len(self.log)
+
+    def last_log_term(self) -> int:
+        return self.log[-1]["term"] if self.log else self.snapshot_term
+
+    def term_at(self, index: int) -> int:
+        """Term dari entry di 'index' (0 jika sudah dipadatkan / di luar log)."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self.last_log_index():
+            return 0
+        return self.log[index - self.snapshot_index - 1]["term"]
+
+    def entry_at(self, index: int) -> dict:
+        return self.log[index - self.snapshot_index - 1]
+
+    def majority(self) -> int:
+        """
+        Mayoritas = (jumlah_voter / 2) + 1
+        Learner menerima replikasi tapi tidak ikut dihitung.
+        """
+        return (len(self.config["voters"]) // 2) + 1
+
+    def is_voter(self, node_id: str) -> bool:
+        return node_id in self.config["voters"]
+
+    # --- Membership (Konfigurasi Cluster) ---
+
+    def bootstrap_config(self) -> dict:
+        """Konfigurasi awal dari PEERS: semua node voter (kosong jika RAFT_JOIN=1)."""
+        if JOIN_EXISTING:
+            return {"voters": {}, "learners": {}}
+        voters = dict(self.node.peer_list)
+        voters[self.node.node_id] = self.node.node_url
+        return {"voters": voters, "learners": {}}
+
+    def set_config(self, config: dict, index: int):
+        """Pasang konfigurasi yang berlaku dan sinkronkan peer_list node dengannya."""
+        self.config = config
+        self.config_index = index
+        if config["voters"]:
+            # Konfigurasi kosong (node yang baru join) tidak menghapus peer dari PEERS,
+            # yang masih dipakai untuk menemukan Leader
+            members = {**config["voters"], **config["learners"]}
+            members.pop(self.node.node_id, None)
+            self.node.peer_list.clear()
+            self.node.peer_list.update(members)
+        if self.state == 'leader':
+            self.sync_replicators()
+
+    def config_at(self, index: int):
+        """(konfigurasi, index entry-nya) yang berlaku pada log 'index'."""
+        for position in range(min(index, self.last_log_index()) - self.snapshot_index - 1, -1, -1):
+            command = self.log[position]["command"]
+            if command.get("op") == "config":
+                return config_from_command(command), self.snapshot_index + position + 1
+        return self.snapshot_config or self.initial_config, 0
+
+    def rebuild_config(self):
+        """Hitung ulang konfigurasi dari log + snapshot (setelah restore/truncate/install snapshot)."""
+        config, index = self.config_at(self.last_log_index())
+        self.set_config(config, index)
+
+    def membership_stats(self) -> dict:
+        members = {}
+        for role in ("voters", "learners"):
+            for node_id, url in self.config[role].items():
+                info = {"url": url, "role": role[:-1]}
+                if self.state == 'leader' and node_id != self.node.node_id:
+                    info["match_index"] = self.match_index.get(node_id, 0)
+                members[node_id] = info
+        return {
+            "config_index": self.config_index,
+            "config_committed": self.config_index <= self.commit_index,
+            "members": members
+        }
+
+    def check_config_change(self):
+        """Alasan perubahan membership tidak boleh dilakukan sekarang, atau None."""
+        if self.state != 'leader':
+            return "Not leader"
+        if self.config_index > self.commit_index:
+            return "Another membership change is still uncommitted"
+        if self.commit_index < self.term_start_index:
+            # Leader baru harus commit entry term-nya dulu (lihat koreksi single-server change)
+            return "Leader has not committed an entry in its term yet, retry shortly"
+        if self.transfer_target is not None:
+            return "Leadership transfer in progress, retry shortly"
+        return None
+
+    async def propose_config(self, voters: dict, learners: dict) -> dict:
+        """Ajukan entry config baru dan tunggu sampai ter-commit."""
+        result = await self.propose({"op": "config", "voters": voters, "learners": learners})
+        if isinstance(result, dict) and result.get("status") == "error":
+            return result
+        return {"status": "success", "config_index": self.config_index, **self.membership_stats()}
+
+    async def add_learner(self, node_id: str, url: str) -> dict:
+        """
+        Leader: tambahkan node sebagai learner (non-voting). Ia langsung direplikasi
+        (biasanya lewat snapshot) tanpa mengubah mayoritas.
+        """
+        reason = self.check_config_change()
+        if reason:
+            return {"status": "error", "message": reason}
+        if node_id in self.config["voters"] or node_id in self.config["learners"]:
+            return {"status": "error", "message": f"{node_id} is already a member"}
+        learners = {**self.config["learners"], node_id: url}
+        log.info(f"[{self.node.node_id}] Menambahkan learner {node_id} ({url})")
+        return await self.propose_config(dict(self.config["voters"]), learners)
+
+    def learner_caught_up(self, node_id: str) -> bool:
+        return self.match_index.get(node_id, 0) >= self.last_log_index() - LEARNER_CATCHUP_ENTRIES
+
+    async def promote_learner(self, node_id: str, timeout: float) -> dict:
+        """
+        Leader: jadikan learner voter, setelah ia mengejar log Leader
+        (menunggu paling lama 'timeout' detik).
+        """
+        if node_id not in self.config["learners"]:
+            return {"status": "error", "message": f"{node_id} is not a learner"}
+        deadline = time.monotonic() + timeout
+        while not self.learner_caught_up(node_id):
+            if self.state != 'leader' or node_id not in self.config["learners"]:
+                return {"status": "error", "message": "Membership changed while waiting for catch-up"}
+            if time.monotonic() > deadline:
+                return {
+                    "status": "error",
+                    "message": f"{node_id} has not caught up yet",
+                    "match_index": self.match_index.get(node_id, 0),
+                    "last_log_index": self.last_log_index()
+                }
+            await asyncio.sleep(self.heartbeat_interval)
+
+        reason = self.check_config_change()
+        if reason:
+            return {"status": "error", "message": reason}
+        learners = dict(self.config["learners"])
+        url = learners.pop(node_id)
+        log.info(f"[{self.node.node_id}] Mempromosikan learner {node_id} menjadi voter")
+        return await self.propose_config({**self.config["voters"], node_id: url}, learners)
+
+    async def remove_member(self, node_id: str) -> dict:
+        """Leader: keluarkan satu voter/learner dari cluster (satu server per perubahan)."""
+        reason = self.check_config_change()
+        if reason:
+            return {"status": "error", "message": reason}
+        if node_id == self.node.node_id:
+            return {"status": "error", "message": "Cannot remove the current leader, transfer leadership first"}
+        voters = dict(self.config["voters"])
+        learners = dict(self.config["learners"])
+        if voters.pop(node_id, None) is None and learners.pop(node_id, None) is None:
+            return {"status": "error", "message": f"{node_id} is not a member"}
+        log.info(f"[{self.node.node_id}] Mengeluarkan {node_id} dari cluster")
+        return await self.propose_config(voters, learners)
+
+    def log_is_up_to_date(self, last_index: int, last_term: int) -> bool:
+        """Aturan pemilu Raft: log candidate minimal sama baru dengan log kita."""
+        if last_term != self.last_log_term():
+            return last_term > self.last_log_term()
+        return last_index >= self.last_log_index()
+
+    # --- Election ---
+
     def get_election_timeout(self):
         """
         Waktu timeout harus acak untuk mencegah
         semua node menjadi candidate di waktu yang bersamaan.
         """
-        # Perbesar timeout dan tambah variasi lebih besar
-        base_timeout = 1.0 + (hash(self.node.node_id) % 3) * 0.5  # 1.0-2.5s base
-        return base_timeout + random.uniform(0.5, 1.5)  # Total: 1.5-4.0s
+        # Acak di [min, 2 x min]; min mengikuti timing adaptif dari Leader
+        return random.uniform(self.election_timeout_min, 2 * self.election_timeout_min)
+
+    # --- Adaptive Timing ---
 
-    async def start_election_timer(self):
+    def set_election_timeout_min(self, value: float):
         """
-        Memulai "jam pasir". Jika habis, mulai election.
+        Ganti election timeout minimum. Penurunan langsung berlaku untuk lease;
+        kenaikan baru dipakai lease setelah semua follower pasti menerimanya.
         """
-        timeout = self.get_election_timeout()
-        await asyncio.sleep(timeout)
-        
-        # Jika timer habis dan kita MASIH follower,
-        # artinya kita tidak dapat heartbeat. Saatnya jadi candidate.
-        if self.state == 'follower':
-            log.warning(f"[{self.node.node_id}] Timeout! Tidak ada heartbeat. Memulai election...")
-            await self.start_election()
+        value = min(max(value, ELECTION_TIMEOUT_FLOOR), ELECTION_TIMEOUT_CEIL)
+        if value < self.lease_timeout:
+            self.lease_timeout = value
+        elif value > self.election_timeout_min:
+            self.timing_raised_at = time.monotonic()
+        self.election_timeout_min = value
+
+    def lease_window(self) -> float:
+        """Election timeout yang aman dipakai untuk lease Leader."""
+        if self.election_timeout_min > self.lease_timeout and \
+           time.monotonic() - self.timing_raised_at > 2 * ELECTION_TIMEOUT_CEIL:
+            self.lease_timeout = self.election_timeout_min
+        return self.lease_timeout
+
+    def update_timing(self):
+        """Leader: hitung ulang heartbeat interval & election timeout dari RTT terukur."""
+        if not ADAPTIVE_TIMING:
+            return
+        rtos = sorted(estimator.rto() for peer_id, estimator in self.peer_rtt.items()
+                      if estimator.samples and self.is_voter(peer_id))
+        needed = self.majority() - 1
+        if not rtos or len(rtos) < needed:
+            return
+        quorum_rto = rtos[max(needed, 1) - 1]
+        heartbeat = min(max(HEARTBEAT_RTT_MULT * quorum_rto, HEARTBEAT_MIN), HEARTBEAT_MAX)
+        self.heartbeat_interval = round(heartbeat, 3)
+        self.set_election_timeout_min(round(ELECTION_HEARTBEAT_MULT * heartbeat + rtos[-1], 3))
+
+    def timing_stats(self) -> dict:
+        return {
+            "adaptive": ADAPTIVE_TIMING,
+            "heartbeat_interval": self.heartbeat_interval,
+            "election_timeout_min": self.election_timeout_min,
+            "election_timeout_max": 2 * self.election_timeout_min,
+            "lease_timeout": self.lease_timeout,
+            "peer_rtt": {peer_id: estimator.to_dict() for peer_id, estimator in self.peer_rtt.items()}
+        }
+
+    async def election_timer_loop(self):
+        """
+        "Jam pasir" yang hidup terus: tidur sampai deadline, dan jika deadline
+        tidak dimajukan (tidak ada heartbeat), mulai election.
+        """
+        while True:
+            delay = self.election_deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            if self.state == 'leader' or not self.is_voter(self.node.node_id):
+                # Leader tidak butuh timer, learner tidak boleh mencalonkan diri;
+                # cek lagi setelah satu periode
+                self.election_deadline = time.monotonic() + self.election_timeout_min
+                continue
+
+            self.election_deadline = time.monotonic() + self.get_election_timeout()
+            try:
+                if self.state == 'candidate':
+                    # Election sebelumnya tidak menghasilkan Leader (split vote): ulangi
+                    log.warning(f"[{self.node.node_id}] Election Term {self.current_term} tanpa hasil, mengulang...")
+                    await self.start_election()
+                    continue
+
+                # Timer habis dan kita MASIH follower,
+                # artinya kita tidak dapat heartbeat. Saatnya jadi candidate.
+                log.warning(f"[{self.node.node_id}] Timeout! Tidak ada heartbeat. Memulai election...")
+                if PRE_VOTE and not await self.pre_vote():
+                    # Mayoritas masih punya Leader (atau log kita tertinggal): jangan naikkan term
+                    continue
+                if self.state == 'follower' and time.monotonic() >= self.last_leader_contact + self.election_timeout_min:
+                    await self.start_election()
+            except Exception as e:
+                log.error(f"[{self.node.node_id}] Error di election timer: {e}")
 
     def reset_election_timer(self):
         """
         Me-reset "jam pasir". Dipanggil saat kita menerima
         heartbeat dari Leader atau saat kita memberi suara.
+        Hanya memajukan deadline; loop timer dibuat sekali saja.
+        """
+        self.election_deadline = time.monotonic() + self.get_election_timeout()
+        if self.election_timer_task is None or self.election_timer_task.done():
+            self.election_timer_task = asyncio.create_task(self.election_timer_loop())
+
+    async def pre_vote(self) -> bool:
+        """
+        Pre-Vote: tanya peer apakah mereka AKAN memilih kita di term berikutnya,
+        tanpa mengubah term/vote siapa pun. True jika mayoritas setuju.
         """
-        # Batalkan timer yang sedang berjalan (jika ada)
-        if self.election_timer_task:
-            self.election_timer_task.cancel()
-            
-        # Buat task timer baru
-        self.election_timer_task = asyncio.create_task(self.start_election_timer())
-        # log.info(f"[{self.node.node_id}] Timer di-reset.")
+        granted = 1 # Suara kita sendiri
+        if granted >= self.majority():
+            return True
+        term = self.current_term
+        payload = {
+            'type': 'request_vote',
+            'pre_vote': True,
+            'term': term + 1,
+            'candidate_id': self.node.node_id,
+            'last_log_index': self.last_log_index(),
+            'last_log_term': self.last_log_term()
+        }
+        log.info(f"[{self.node.node_id}] Pre-Vote untuk Term {term + 1}...")
+        tasks = [
+            asyncio.create_task(self.node.send_rpc(peer_id, f"{peer_url}/request-vote", payload))
+            for peer_id, peer_url in list(self.node.peer_list.items()) if self.is_voter(peer_id)
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            response = await next_done
+            if self.state != 'follower' or self.current_term != term:
+                return False
+            if response and response.get('vote_granted'):
+                granted += 1
+            if granted >= self.majority():
+                return True
+        log.info(f"[{self.node.node_id}] Pre-Vote gagal ({granted}/{self.majority()}), term tidak dinaikkan")
+        return False
 
-    async def start_election(self):
+    async def start_election(self, leadership_transfer: bool = False):
         """
         Proses untuk menjadi Candidate dan meminta suara.
+        leadership_transfer=True (dari TimeoutNow) melewati leader stickiness di peer.
         """
         # 1. Ubah state jadi Candidate
         self.state = 'candidate'
-        
+
         # 2. Naikkan term (ronde pemilu)
         self.current_term += 1
-        
+
         # 3. Beri suara untuk diri sendiri
         self.voted_for = self.node.node_id
         self.votes_received = {self.node.node_id} # Simpan suara kita
-        
+        self.persist_meta()
+
         log.info(f"[{self.node.node_id}] Menjadi CANDIDATE untuk Term {self.current_term}. Meminta suara...")
 
+        # Cluster satu node langsung menang
+        if len(self.votes_received) >= self.majority():
+            self.become_leader()
+            return
+
         # 4. Kirim RequestVote RPC (Remote Procedure Call) ke semua peer
         payload = {
             'type': 'request_vote',
             'term': self.current_term,
-            'candidate_id': self.node.node_id
+            'candidate_id': self.node.node_id,
+            'last_log_index': self.last_log_index(),
+            'last_log_term': self.last_log_term(),
+            'leadership_transfer': leadership_transfer
         }
         # Kita gunakan 'broadcast_message' dari node kita
         await self.node.broadcast_rpc("/request-vote", payload)
-        
+
         # 5. Reset timer kita sendiri, untuk election berikutnya jika kita gagal
-        self.reset_election_timer()
+        if self.state != 'leader':
+            self.reset_election_timer()
+
+    def receive_request_vote(self, data: dict) -> dict:
+        """
+        Memproses RequestVote dari candidate, mengembalikan balasan RPC.
+        """
+        candidate_term = data.get('term')
+        candidate_id = data.get('candidate_id')
+
+        vote_granted = False
+
+        # 0. Leader stickiness: jika kita baru saja mendengar Leader yang sah,
+        #    abaikan candidate (juga term-nya). Ini yang membuat lease read aman:
+        #    tidak ada Leader baru sebelum lease Leader lama habis.
+        #    Pengecualian: election dari leadership transfer (Leader sendiri yang meminta).
+        if self.leader_recently_seen() and not data.get('leadership_transfer'):
+            return {"term": self.current_term, "vote_granted": False}
+
+        # Pre-Vote: jawab tanpa mengubah term, vote, maupun timer kita
+        if data.get('pre_vote'):
+            vote_granted = self.state != 'leader' and candidate_term > self.current_term and \
+                self.log_is_up_to_date(data.get('last_log_index', 0), data.get('last_log_term', 0))
+            return {"term": self.current_term, "vote_granted": vote_granted}
+
+        # 1. Cek apakah term si candidate lebih baru dari kita
+        if candidate_term > self.current_term:
+            # Jika ya, kita otomatis 'step_down' dan update term
+            self.step_down(candidate_term)
+
+        # 2. Logika memberi suara: term sama, belum vote (atau vote dia lagi),
+        #    dan log candidate tidak lebih tua dari log kita
+        if (candidate_term == self.current_term) and \
+           (self.voted_for is None or self.voted_for == candidate_id) and \
+           self.log_is_up_to_date(data.get('last_log_index', 0), data.get('last_log_term', 0)):
+            vote_granted = True
+            self.voted_for = candidate_id
+            self.persist_meta()
+            self.reset_election_timer() # Kita reset timer kita karena kita berpartisipasi
+            log.info(f"[{self.node.node_id}] Memberi suara YA untuk {candidate_id} di Term {self.current_term}")
+
+        return {
+            "term": self.current_term,
+            "vote_granted": vote_granted
+        }
+
+    def handle_vote_response(self, peer_id: str, response: dict):
+        """
+        Memproses balasan RequestVote (hanya relevan saat masih candidate).
+        """
+        if self.state != 'candidate' or not self.is_voter(peer_id):
+            return # Suara learner tidak dihitung
+        if response.get('vote_granted'):
+            log.info(f"[{self.node.node_id}] Mendapat suara YA dari {peer_id}")
+            self.votes_received.add(peer_id)
+
+            log.info(f"[{self.node.node_id}] Total suara: {len(self.votes_received)}/{self.majority()}")
+            if len(self.votes_received) >= self.majority():
+                self.become_leader()
+        else:
+            log.info(f"[{self.node.node_id}] Mendapat suara TIDAK dari {peer_id}")
 
     def become_leader(self):
         """
@@ -102,32 +667,723 @@ class RaftConsensus:
 
         log.info(f"👑 [{self.node.node_id}] Menang pemilu! Menjadi LEADER untuk Term {self.current_term} 👑")
         self.state = 'leader'
-        
-        # Batalkan timer election, ganti dengan timer heartbeat
-        if self.election_timer_task:
-            self.election_timer_task.cancel()
-        
-        # Mulai kirim heartbeat
+
+        # Timer election tetap hidup tapi diam selama kita Leader
+
+        # Inisialisasi state replikasi per peer
+        for peer_id in self.node.peer_list:
+            self.next_index[peer_id] = self.last_log_index() + 1
+            self.match_index[peer_id] = 0
+        self.peer_ack_at = {}
+        self.peer_read_ack = {}
+        self.leader_since = time.monotonic()
+        # Follower bisa saja memegang timeout lebih kecil dari Leader lama:
+        # mulai lease dari floor dan biarkan naik setelah tertunda
+        self.lease_timeout = ELECTION_TIMEOUT_FLOOR
+        self.timing_raised_at = self.leader_since
+        self.transfer_target = None
+        self.leader_id = self.node.node_id
+
+        # Entry no-op dari term baru agar entry term lama ikut ter-commit
+        self.append_to_log([{"term": self.current_term, "command": {"op": "noop"}}])
+        self.term_start_index = self.last_log_index()
+        self.advance_commit_index()
+
+        # Mulai kirim heartbeat (loop ini juga menyalakan worker replikasi per peer)
         self.heartbeat_timer_task = asyncio.create_task(self.send_heartbeats())
-        
+
+    # --- Replikasi Log ---
+
+    async def propose(self, command: dict) -> dict:
+        """
+        Menambahkan perintah klien ke log Leader dan menunggu sampai
+        perintah itu di-commit mayoritas dan diterapkan ke state machine.
+        Worker replikasi dibangunkan segera; perintah yang datang saat window
+        sebuah peer penuh digabung ke AppendEntries berikutnya ke peer itu.
+        """
+        if self.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
+        if self.transfer_target is not None:
+            return {"status": "error", "message": "Leadership transfer in progress, retry shortly"}
+
+        self.append_to_log([{"term": self.current_term, "command": command}])
+        index = self.last_log_index()
+        future = asyncio.get_running_loop().create_future()
+        self.pending_commands[index] = future
+
+        # Cluster satu node bisa langsung commit (setelah fsync lokal, jika ada storage)
+        self.advance_commit_index()
+        self.wake_replicators()
+        return await future
+
+    def build_append_entries(self, peer_id: str) -> dict:
+        """Membangun payload AppendEntries untuk satu peer berdasarkan next_index-nya."""
+        next_index = self.next_index.get(peer_id, self.last_log_index() + 1)
+        prev_log_index = next_index - 1
+        start = prev_log_index - self.snapshot_index
+        entries = self.log[start:start + MAX_ENTRIES_PER_APPEND]
+        return {
+            'type': 'append_entries',
+            'term': self.current_term,
+            'leader_id': self.node.node_id,
+            'prev_log_index': prev_log_index,
+            'prev_log_term': self.term_at(prev_log_index),
+            'entries': entries,
+            'leader_commit': self.commit_index,
+            'heartbeat_interval': self.heartbeat_interval,
+            'election_timeout_min': self.election_timeout_min
+        }
+
+    def build_heartbeat(self, peer_id: str) -> dict:
+        """
+        Heartbeat di tengah pipeline: dijangkarkan di match_index (pasti ada di
+        log follower) alih-alih next_index yang sudah dimajukan optimistis,
+        sehingga tidak ditolak dan tidak memundurkan pipeline.
+        """
+        match_index = self.match_index.get(peer_id, 0)
+        if match_index < self.snapshot_index:
+            return self.build_append_entries(peer_id)
+        return {
+            'type': 'append_entries',
+            'term': self.current_term,
+            'leader_id': self.node.node_id,
+            'prev_log_index': match_index,
+            'prev_log_term': self.term_at(match_index),
+            'entries': [],
+            'leader_commit': self.commit_index,
+            'heartbeat_interval': self.heartbeat_interval,
+            'election_timeout_min': self.election_timeout_min
+        }
+
+    async def send_append_entries(self, peer_id: str, payload: dict, replicator: PeerReplicator = None,
+                                  urgent: bool = False):
+        """
+        Kirim AppendEntries yang sudah dibangun dan catat hasilnya (RTT, ack
+        lease). Balasan diproses handle_append_entries_response. Jika dikirim
+        worker, slot window-nya (sudah diisi pemanggil) dilepas di sini.
+        urgent=True: heartbeat untuk ReadIndex, tidak ditahan penggabungan heartbeat.
+        """
+        peer_url = self.node.peer_list.get(peer_id)
+        if peer_url is None:
+            if replicator is not None:
+                replicator.inflight -= 1
+            return None
+        sent_at = time.monotonic()
+        read_seq = self.read_seq
+        timing = {}
+        try:
+            response = await self.node.send_rpc(peer_id, f"{peer_url}/append-entries", payload,
+                                                urgent=urgent, timing=timing)
+        finally:
+            if replicator is not None:
+                replicator.inflight -= 1
+                replicator.wake.set()
+        # RTT & lease dihitung dari waktu kirim sebenarnya (heartbeat gabungan menunggu jendela dulu)
+        sent_at = timing.get("sent_at", sent_at)
+        if response:
+            self.peer_rtt.setdefault(peer_id, RttEstimator()).observe(time.monotonic() - sent_at)
+        if response and response.get('term') == payload['term'] == self.current_term:
+            # Peer masih mengakui kita sebagai Leader per waktu 'sent_at'
+            self.peer_ack_at[peer_id] = max(self.peer_ack_at.get(peer_id, 0.0), sent_at)
+            if read_seq > self.peer_read_ack.get(peer_id, 0):
+                self.peer_read_ack[peer_id] = read_seq
+                self.notify_read_waiters()
+        elif not response and replicator is not None:
+            # Peer tidak terjangkau: jangan langsung kirim ulang, tunggu satu heartbeat
+            replicator.retry_at = time.monotonic() + self.heartbeat_interval
+            if payload['entries'] and self.state == 'leader' and payload['term'] == self.current_term:
+                # Entry di pesan ini mungkin hilang: mundur ke awal pesan dan probe lagi
+                replicator.probing = True
+                self.next_index[peer_id] = max(
+                    self.match_index.get(peer_id, 0) + 1,
+                    min(self.next_index.get(peer_id, 1), payload['prev_log_index'] + 1)
+                )
+        return response
+
+    async def replication_worker(self, replicator: PeerReplicator, term: int):
+        """
+        Worker Leader untuk satu follower: mengisi window dengan AppendEntries
+        selama ada entry yang belum terkirim, dan mengirim heartbeat jika peer
+        tidak dikirimi apa pun selama satu heartbeat interval. Follower yang
+        lambat hanya memenuhi window-nya sendiri, tidak menahan peer lain.
+        """
+        peer_id = replicator.peer_id
+        while self.state == 'leader' and self.current_term == term and peer_id in self.node.peer_list:
+            replicator.wake.clear()
+
+            if self.next_index.get(peer_id, 1) <= self.snapshot_index:
+                # Entry yang dibutuhkan peer sudah dipadatkan: kirim snapshot (blok worker ini saja),
+                # kecuali sudah ada transfer snapshot ke peer ini yang berjalan
+                if replicator.inflight == 0 and peer_id not in self.snapshot_transfers:
+                    await self.send_snapshot(peer_id)
+                    replicator.probing = True
+                    replicator.last_sent = time.monotonic()
+                    if self.next_index.get(peer_id, 1) > self.snapshot_index:
+                        continue
+            else:
+                now = time.monotonic()
+                idle = now - replicator.last_sent
+                pending = self.next_index.get(peer_id, 1) <= self.last_log_index() and now >= replicator.retry_at
+                # Ada ReadIndex yang menunggu konfirmasi: heartbeat jangan menunggu interval
+                read_pending = replicator.read_seq_sent < self.read_seq
+                send_entries = pending and replicator.inflight < replicator.window()
+                if send_entries or ((idle >= self.heartbeat_interval or read_pending)
+                                    and replicator.inflight < REPLICATION_WINDOW):
+                    if send_entries or replicator.probing or replicator.inflight == 0:
+                        payload = self.build_append_entries(peer_id)
+                        if payload['entries'] and not replicator.probing:
+                            # Pipeline: pesan berikutnya melanjutkan dari akhir pesan ini
+                            self.next_index[peer_id] = payload['prev_log_index'] + len(payload['entries']) + 1
+                    else:
+                        payload = self.build_heartbeat(peer_id)
+                    replicator.inflight += 1
+                    replicator.last_sent = time.monotonic()
+                    replicator.read_seq_sent = self.read_seq
+                    asyncio.create_task(self.send_append_entries(peer_id, payload, replicator, urgent=read_pending))
+                    continue
+
+            # Tidur sampai heartbeat peer ini jatuh tempo, ada entry baru, atau slot window kosong
+            timeout = max(0.0, replicator.last_sent + self.heartbeat_interval - time.monotonic())
+            try:
+                await asyncio.wait_for(replicator.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def sync_replicators(self):
+        """Leader: pastikan setiap peer punya worker replikasi yang hidup, dan hanya peer itu."""
+        for peer_id in list(self.replicators):
+            if peer_id not in self.node.peer_list:
+                # Peer dikeluarkan dari konfigurasi
+                self.replicators.pop(peer_id).task.cancel()
+                for progress in (self.next_index, self.match_index, self.peer_ack_at, self.peer_read_ack,
+                                 self.peer_rtt):
+                    progress.pop(peer_id, None)
+        for peer_id in self.node.peer_list:
+            replicator = self.replicators.get(peer_id)
+            if replicator is None:
+                replicator = self.replicators[peer_id] = PeerReplicator(peer_id)
+                self.next_index.setdefault(peer_id, self.last_log_index() + 1)
+                self.match_index.setdefault(peer_id, 0)
+            if replicator.task is None or replicator.task.done():
+                replicator.task = asyncio.create_task(self.replication_worker(replicator, self.current_term))
+
+    def stop_replicators(self):
+        for replicator in self.replicators.values():
+            if replicator.task is not None:
+                replicator.task.cancel()
+        self.replicators = {}
+
+    def wake_replicators(self):
+        for replicator in self.replicators.values():
+            replicator.wake.set()
+
+    def replication_stats(self) -> dict:
+        """Progres replikasi per follower (hanya berisi data di Leader)."""
+        return {
+            peer_id: {
+                "match_index": self.match_index.get(peer_id, 0),
+                "next_index": self.next_index.get(peer_id, 1),
+                **replicator.to_dict()
+            }
+            for peer_id, replicator in self.replicators.items()
+        }
+
     async def send_heartbeats(self):
         """
-        Tugas Leader: kirim pesan 'AppendEntries' (heartbeat)
-        secara periodik untuk mempertahankan kekuasaan.
+        Tugas Leader: menjaga worker replikasi per peer tetap hidup (mereka
+        yang mengirim AppendEntries/heartbeat), lalu setiap heartbeat interval
+        menjalankan check-quorum dan menghitung ulang timing adaptif.
         """
         while self.state == 'leader':
-            # log.info(f"[{self.node.node_id}] Mengirim heartbeat...")
-            payload = {
-                'type': 'append_entries',
-                'term': self.current_term,
+            if CHECK_QUORUM and not self.quorum_active():
+                log.warning(f"[{self.node.node_id}] Check-quorum gagal: mayoritas tidak terjangkau, turun tahta")
+                self.step_down()
+                return
+
+            self.update_timing()
+            self.sync_replicators()
+
+            # Interval heartbeat adaptif (default 500ms sebelum ada pengukuran RTT)
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def quorum_active(self) -> bool:
+        """Leader: apakah mayoritas meng-ack heartbeat dalam election timeout minimum terakhir?"""
+        now = time.monotonic()
+        if now - self.leader_since < self.election_timeout_min:
+            return True # Masa tenggang awal kepemimpinan
+        active = 1 + sum(1 for peer_id, acked_at in self.peer_ack_at.items()
+                         if now - acked_at < self.election_timeout_min and self.is_voter(peer_id))
+        return active >= self.majority()
+
+    # --- Leadership Transfer (TimeoutNow) ---
+
+    async def transfer_leadership(self, target: str = None) -> dict:
+        """
+        Leader: serahkan kepemimpinan ke 'target' (default: peer paling mutakhir).
+        Perintah baru ditahan, target dikejar sampai log-nya sama (oleh worker
+        replikasinya, tanpa AppendEntries tambahan), lalu dikirimi TimeoutNow
+        agar langsung memulai election; kita turun jadi follower.
+        """
+        if self.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
+        if self.transfer_target is not None:
+            return {"status": "error", "message": f"Transfer to {self.transfer_target} already in progress"}
+        candidates = [peer_id for peer_id in self.node.peer_list if self.is_voter(peer_id)]
+        if not candidates:
+            return {"status": "error", "message": "No peer to transfer leadership to"}
+        if target is None:
+            target = max(candidates, key=lambda peer_id: self.match_index.get(peer_id, 0))
+        peer_url = self.node.peer_list.get(target)
+        if peer_url is None:
+            return {"status": "error", "message": f"Unknown peer {target}"}
+        if not self.is_voter(target):
+            return {"status": "error", "message": f"{target} is a learner, promote it first"}
+
+        term = self.current_term
+        self.transfer_target = target
+        deadline = time.monotonic() + self.election_timeout_min
+        log.info(f"[{self.node.node_id}] Leadership transfer ke {target} dimulai")
+        try:
+            while self.match_index.get(target, 0) < self.last_log_index():
+                if self.state != 'leader' or self.current_term != term:
+                    return {"status": "error", "message": "Leadership lost during transfer"}
+                if time.monotonic() > deadline:
+                    return {"status": "error", "message": f"{target} did not catch up in time"}
+                replicator = self.replicators.get(target)
+                if replicator is not None:
+                    replicator.wake.set()
+                await asyncio.sleep(TRANSFER_POLL_INTERVAL)
+
+            response = await self.node.send_rpc(target, f"{peer_url}/timeout-now", {
+                'type': 'timeout_now',
+                'term': term,
                 'leader_id': self.node.node_id
+            })
+            if not response or not response.get('success'):
+                return {"status": "error", "message": f"{target} rejected TimeoutNow"}
+            if self.state == 'leader' and self.current_term == term:
+                self.step_down()
+            log.info(f"[{self.node.node_id}] Leadership diserahkan ke {target}")
+            return {"status": "success", "message": "Leadership transferred", "target": target}
+        finally:
+            self.transfer_target = None
+
+    def receive_timeout_now(self, data: dict) -> dict:
+        """
+        Follower: Leader meminta kita langsung memulai election (tanpa Pre-Vote).
+        """
+        if data.get('term') != self.current_term or self.state != 'follower':
+            return {"term": self.current_term, "success": False}
+        log.info(f"[{self.node.node_id}] TimeoutNow dari {data.get('leader_id')}: memulai election sekarang")
+        asyncio.create_task(self.start_election(leadership_transfer=True))
+        return {"term": self.current_term, "success": True}
+
+    async def receive_append_entries(self, data: dict) -> dict:
+        """
+        Memproses AppendEntries dari Leader (heartbeat + entry log),
+        mengembalikan balasan RPC. Balasan sukses baru dikirim setelah
+        entry-nya ter-fsync (group fsync dari RaftStorage).
+        """
+        leader_term = data.get('term')
+
+        if leader_term < self.current_term:
+            # Jika ada Leader 'abal-abal' dari term lama, tolak
+            return {"term": self.current_term, "success": False}
+
+        # Jika kita menerima heartbeat, berarti Leader-nya sah.
+        # Kita reset "jam pasir" kita.
+        self.reset_election_timer()
+
+        if leader_term > self.current_term or self.state != 'follower':
+            # Term Leader lebih baru, atau kita candidate/leader di term yang sama:
+            # akui Leader ini dan turun jadi follower
+            self.step_down(leader_term)
+        self.leader_id = data.get('leader_id')
+        self.last_leader_contact = time.monotonic()
+
+        # Ikuti timing adaptif Leader
+        if 'election_timeout_min' in data:
+            self.heartbeat_interval = data.get('heartbeat_interval', self.heartbeat_interval)
+            self.set_election_timeout_min(data['election_timeout_min'])
+
+        # Cek konsistensi: log kita harus punya entry prev_log_index dengan term yang sama
+        prev_log_index = data.get('prev_log_index', 0)
+        prev_log_term = data.get('prev_log_term', 0)
+        entries = data.get('entries', [])
+        if prev_log_index < self.snapshot_index:
+            # Bagian awal sudah ada di snapshot kita (pasti committed), lewati
+            entries = entries[self.snapshot_index - prev_log_index:]
+            prev_log_index = self.snapshot_index
+            prev_log_term = self.snapshot_term
+        if prev_log_index > self.last_log_index():
+            # Log kita terlalu pendek: Leader bisa langsung lompat ke ujungnya
+            return {
+                "term": self.current_term,
+                "success": False,
+                "last_log_index": self.last_log_index(),
+                "conflict_index": self.last_log_index() + 1
             }
-            # Kirim ke semua peer, tapi jangan tunggu balasan (kirim & lupakan)
-            asyncio.create_task(self.node.broadcast_rpc("/append-entries", payload))
-            
-            # Kirim heartbeat setiap 500ms (lebih realistis untuk network)
-            await asyncio.sleep(0.5)
-            
+        if self.term_at(prev_log_index) != prev_log_term:
+            # Hint conflict-term: term entry yang konflik dan index pertamanya di log kita,
+            # agar Leader melompati seluruh term itu dalam satu ronde
+            conflict_term = self.term_at(prev_log_index)
+            conflict_index = prev_log_index
+            while conflict_index - 1 > self.snapshot_index and self.term_at(conflict_index - 1) == conflict_term:
+                conflict_index -= 1
+            return {
+                "term": self.current_term,
+                "success": False,
+                "last_log_index": self.last_log_index(),
+                "conflict_term": conflict_term,
+                "conflict_index": conflict_index
+            }
+
+        # Tambahkan entry baru, buang suffix yang konflik
+        new_entries = []
+        for offset, entry in enumerate(entries):
+            index = prev_log_index + 1 + offset
+            if index <= self.last_log_index():
+                if self.term_at(index) == entry["term"]:
+                    continue # Entry sudah ada
+                self.truncate_log(index)
+            new_entries = entries[offset:]
+            break
+        self.append_to_log(new_entries)
+
+        match_index = prev_log_index + len(entries)
+
+        # Pastikan entry sudah durable sebelum mengaku sudah mereplikasi
+        if self.storage is not None:
+            await self.storage.barrier()
+
+        # Majukan commit index mengikuti Leader
+        leader_commit = data.get('leader_commit', 0)
+        if leader_commit > self.commit_index:
+            self.commit_index = max(self.commit_index, min(leader_commit, match_index))
+            self.apply_committed()
+
+        return {"term": self.current_term, "success": True, "match_index": match_index}
+
+    def handle_append_entries_response(self, peer_id: str, request_payload: dict, response: dict):
+        """
+        Memproses balasan AppendEntries di sisi Leader.
+        """
+        if self.state != 'leader' or request_payload.get('term') != self.current_term:
+            return # Balasan basi dari term lama
+
+        replicator = self.replicators.get(peer_id)
+        if response.get('success'):
+            match_index = response.get(
+                'match_index',
+                request_payload['prev_log_index'] + len(request_payload['entries'])
+            )
+            if match_index > self.match_index.get(peer_id, 0):
+                self.match_index[peer_id] = match_index
+            self.next_index[peer_id] = max(self.next_index.get(peer_id, 1), match_index + 1)
+            if replicator is not None:
+                replicator.probing = False # Titik cocok ditemukan: mulai pipeline
+            self.advance_commit_index()
+            return
+
+        # Log follower tertinggal / konflik: mundurkan next_index
+        prev_log_index = request_payload['prev_log_index']
+        match_index = self.match_index.get(peer_id, 0)
+        if prev_log_index >= self.next_index.get(peer_id, 1) or prev_log_index < match_index:
+            return # Penolakan basi dari pipeline: next_index sudah mundur melewatinya
+        if response.get('conflict_term') is not None:
+            # Lompati seluruh term yang konflik; jika kita punya term itu, lanjut dari entry terakhirnya
+            last_of_term = self.last_index_of_term(response['conflict_term'], prev_log_index)
+            next_index = last_of_term + 1 if last_of_term else response.get('conflict_index', prev_log_index)
+        elif 'conflict_index' in response:
+            next_index = response['conflict_index']
+        elif 'last_log_index' in response:
+            next_index = response['last_log_index'] + 1
+        else:
+            next_index = prev_log_index
+        self.next_index[peer_id] = max(match_index + 1, 1, min(next_index, prev_log_index))
+        if replicator is not None:
+            replicator.probing = True
+            replicator.wake.set()
+
+    def last_index_of_term(self, term: int, upto: int) -> int:
+        """Index terakhir (<= upto) di log kita yang ber-term 'term', atau 0 jika tidak ada."""
+        index = min(upto, self.last_log_index())
+        while index > self.snapshot_index:
+            entry_term = self.term_at(index)
+            if entry_term == term:
+                return index
+            if entry_term < term:
+                break # Term di log naik monoton
+            index -= 1
+        return 0
+
+    def advance_commit_index(self):
+        """
+        Leader meng-commit index N jika mayoritas punya entry N
+        dan entry N berasal dari term saat ini.
+        """
+        if self.state != 'leader':
+            return
+        for n in range(self.last_log_index(), self.commit_index, -1):
+            if self.term_at(n) != self.current_term:
+                break # Entry term lama hanya ter-commit secara tidak langsung
+            replicated = (1 if self.durable_index() >= n else 0) + \
+                sum(1 for peer_id, m in self.match_index.items() if m >= n and self.is_voter(peer_id))
+            if replicated >= self.majority():
+                self.commit_index = n
+                break
+        self.apply_committed()
+
+    def apply_committed(self):
+        """
+        Menerapkan semua entry yang sudah di-commit ke state machine (node),
+        lalu membangunkan klien yang menunggu hasilnya.
+        """
+        while self.last_applied < self.commit_index:
+            self.last_applied += 1
+            entry = self.entry_at(self.last_applied)
+            result = self.node.apply_command(entry["command"])
+            future = self.pending_commands.pop(self.last_applied, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+        self.notify_apply_waiters()
+
+        if self.last_applied - self.snapshot_index >= SNAPSHOT_THRESHOLD:
+            self.take_snapshot()
+
+    # --- Snapshot & Log Compaction ---
+
+    def take_snapshot(self):
+        """
+        Menyimpan state machine pada last_applied lalu membuang log
+        sampai index tersebut (memori + segment WAL lama).
+        """
+        index = self.last_applied
+        term = self.term_at(index)
+        data = self.node.snapshot_state()
+        config, _ = self.config_at(index)
+        if self.storage is not None:
+            self.storage.save_snapshot(index, term, data, config)
+        del self.log[:index - self.snapshot_index]
+        self.snapshot_index = index
+        self.snapshot_term = term
+        self.snapshot_data = data
+        self.snapshot_config = config
+        log.info(f"[{self.node.node_id}] Snapshot diambil di index {index} ({len(data)} byte)")
+
+    def install_snapshot(self, index: int, term: int, data: bytes, config: dict = None):
+        """
+        Follower: mengganti state machine dengan snapshot dari Leader.
+        Suffix log yang masih cocok dengan snapshot dipertahankan.
+        """
+        if index <= self.snapshot_index:
+            return # Snapshot lama, kita sudah punya yang lebih baru
+
+        if index <= self.last_log_index() and self.term_at(index) == term:
+            del self.log[:index - self.snapshot_index]
+            keep_suffix = True
+        else:
+            self.log = []
+            keep_suffix = False
+
+        self.snapshot_index = index
+        self.snapshot_term = term
+        self.snapshot_data = data
+        self.snapshot_config = config
+        if self.storage is not None:
+            self.storage.save_snapshot(index, term, data, config)
+            if not keep_suffix:
+                self.storage.reset(index)
+        self.rebuild_config()
+
+        if index > self.last_applied:
+            self.node.restore_state(data, index)
+            self.last_applied = index
+        self.commit_index = max(self.commit_index, index)
+        self.notify_apply_waiters()
+        log.info(f"[{self.node.node_id}] Snapshot dari Leader dipasang di index {index}")
+
+    async def send_snapshot(self, peer_id: str):
+        """
+        Leader: streaming snapshot ke follower yang tertinggal dalam
+        beberapa chunk lewat /install-snapshot.
+        """
+        peer_url = self.node.peer_list.get(peer_id)
+        data = self.snapshot_data
+        if peer_url is None or data is None:
+            return
+        index, term, current_term = self.snapshot_index, self.snapshot_term, self.current_term
+        config = self.snapshot_config
+        self.snapshot_transfers.add(peer_id)
+        log.info(f"[{self.node.node_id}] Mengirim snapshot index {index} ke {peer_id} ({len(data)} byte)")
+        try:
+            offset = 0
+            while True:
+                chunk = data[offset:offset + SNAPSHOT_CHUNK_BYTES]
+                done = offset + len(chunk) >= len(data)
+                payload = {
+                    'type': 'install_snapshot',
+                    'term': current_term,
+                    'leader_id': self.node.node_id,
+                    'last_included_index': index,
+                    'last_included_term': term,
+                    'offset': offset,
+                    'data': base64.b64encode(chunk).decode('ascii'),
+                    'done': done
+                }
+                if done:
+                    payload['config'] = config
+                response = await self.node.send_rpc(peer_id, f"{peer_url}/install-snapshot", payload)
+                if not response or not response.get('success') or \
+                   self.state != 'leader' or self.current_term != current_term:
+                    return # Coba lagi di heartbeat berikutnya
+                if done:
+                    break
+                offset += len(chunk)
+
+            if index > self.match_index.get(peer_id, 0):
+                self.match_index[peer_id] = index
+            self.next_index[peer_id] = max(self.next_index.get(peer_id, 1), index + 1)
+            self.advance_commit_index()
+        finally:
+            self.snapshot_transfers.discard(peer_id)
+
+    async def receive_install_snapshot(self, data: dict) -> dict:
+        """
+        Follower: menerima satu chunk snapshot, mengembalikan balasan RPC.
+        """
+        leader_term = data.get('term')
+        if leader_term < self.current_term:
+            return {"term": self.current_term, "success": False}
+
+        self.reset_election_timer()
+        if leader_term > self.current_term or self.state != 'follower':
+            self.step_down(leader_term)
+        self.leader_id = data.get('leader_id')
+        self.last_leader_contact = time.monotonic()
+
+        index = data.get('last_included_index')
+        term = data.get('last_included_term')
+        offset = data.get('offset', 0)
+        chunk = base64.b64decode(data.get('data', ''))
+
+        if offset == 0:
+            self.incoming_snapshot = {"index": index, "term": term, "data": bytearray()}
+        incoming = self.incoming_snapshot
+        if incoming is None or incoming["index"] != index or len(incoming["data"]) != offset:
+            # Chunk tidak berurutan, minta Leader mengulang dari awal
+            self.incoming_snapshot = None
+            return {"term": self.current_term, "success": False}
+        incoming["data"] += chunk
+
+        if data.get('done'):
+            self.incoming_snapshot = None
+            self.install_snapshot(index, term, bytes(incoming["data"]), data.get('config'))
+
+        return {"term": self.current_term, "success": True}
+
+    # --- Read Path (ReadIndex / Lease / Follower Read) ---
+
+    def leader_recently_seen(self) -> bool:
+        """True jika kita follower yang mendengar Leader sah dalam election timeout minimum."""
+        return self.state == 'follower' and self.leader_id is not None and \
+            time.monotonic() - self.last_leader_contact < self.election_timeout_min
+
+    def lease_valid(self) -> bool:
+        """
+        Leader lease: mayoritas sudah meng-ack heartbeat yang dikirim pada
+        waktu t, sehingga tidak ada Leader lain sampai t + election timeout.
+        """
+        if self.state != 'leader' or self.transfer_target is not None:
+            return False
+        needed = self.majority() - 1 # Leader menghitung dirinya sendiri
+        if needed == 0:
+            return True
+        acks = sorted((acked_at for peer_id, acked_at in self.peer_ack_at.items() if self.is_voter(peer_id)),
+                      reverse=True)
+        if len(acks) < needed:
+            return False
+        return time.monotonic() < acks[needed - 1] + self.lease_window() * LEASE_RATIO
+
+    async def confirm_leadership(self) -> bool:
+        """
+        Satu ronde heartbeat: True jika mayoritas masih mengakui kita
+        sebagai Leader di term ini. Heartbeat-nya dikirim worker replikasi
+        (tanpa RPC tambahan), dan read yang bersamaan berbagi ronde yang sama.
+        """
+        term = self.current_term
+        if self.state != 'leader':
+            return False
+        if self.majority() <= 1:
+            return True
+        self.read_seq += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.read_waiters, (self.read_seq, future))
+        self.wake_replicators()
+        try:
+            confirmed = await asyncio.wait_for(future, self.election_timeout_min)
+        except asyncio.TimeoutError:
+            return False
+        return confirmed and self.state == 'leader' and self.current_term == term
+
+    def notify_read_waiters(self):
+        """Bangunkan read yang read_seq-nya sudah di-ack mayoritas voter."""
+        needed = self.majority() - 1 # Leader menghitung dirinya sendiri
+        acks = sorted((seq for peer_id, seq in self.peer_read_ack.items() if self.is_voter(peer_id)),
+                      reverse=True)
+        confirmed = acks[needed - 1] if 0 < needed <= len(acks) else 0
+        while self.read_waiters and self.read_waiters[0][0] <= confirmed:
+            _, future = heapq.heappop(self.read_waiters)
+            if not future.done():
+                future.set_result(True)
+
+    def fail_read_waiters(self):
+        for _, future in self.read_waiters:
+            if not future.done():
+                future.set_result(False)
+        self.read_waiters = []
+
+    async def read_index(self, use_lease: bool = False):
+        """
+        ReadIndex di Leader: index yang harus sudah diterapkan sebelum read
+        boleh dilayani. None jika kita bukan (lagi) Leader.
+        Dengan use_lease=True, ronde heartbeat dilewati selama lease masih berlaku.
+        """
+        if self.state != 'leader':
+            return None
+        # Commit index baru bisa dipercaya setelah no-op term ini ter-commit
+        index = max(self.commit_index, self.term_start_index)
+        if use_lease and self.lease_valid():
+            return index
+        if not await self.confirm_leadership():
+            return None
+        return index
+
+    async def wait_for_applied(self, index: int):
+        """Menunggu sampai state machine lokal sudah menerapkan entry 'index'."""
+        if self.last_applied >= index:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.apply_waiters, (index, next(self.apply_waiter_seq), future))
+        await future
+
+    def notify_apply_waiters(self):
+        while self.apply_waiters and self.apply_waiters[0][0] <= self.last_applied:
+            _, _, future = heapq.heappop(self.apply_waiters)
+            if not future.done():
+                future.set_result(None)
+
+    def fail_pending_commands(self):
+        """Gagalkan semua perintah yang belum ter-commit (misal: kehilangan kepemimpinan)."""
+        for future in self.pending_commands.values():
+            if not future.done():
+                future.set_result({
+                    "status": "error",
+                    "message": "Leadership lost before commit, outcome unknown"
+                })
+        self.pending_commands = {}
+
     def step_down(self, new_term=None):
         """
         Turun tahta (misal: kita menemukan Leader/Candidate
@@ -135,21 +1391,30 @@ class RaftConsensus:
         """
         if new_term is None:
             new_term = self.current_term
-            
+
         if new_term > self.current_term:
             log.warning(f"[{self.node.node_id}] Turun tahta karena term lebih tinggi: {new_term}")
+            # Vote hanya berlaku untuk satu term
+            self.voted_for = None
         else:
             log.warning(f"[{self.node.node_id}] Turun tahta ke follower (Term {self.current_term})")
-            
+
+        if self.state == 'leader' or new_term > self.current_term:
+            self.leader_id = None # Leader term baru belum diketahui
         self.state = 'follower'
         self.current_term = new_term
-        self.voted_for = None
         self.votes_received = set()
-        
-        # Jika kita tadinya Leader, hentikan pengiriman heartbeat
+        self.persist_meta()
+
+        # Perintah yang belum ter-commit tidak bisa dijamin lagi oleh kita
+        self.fail_pending_commands()
+        self.fail_read_waiters()
+
+        # Jika kita tadinya Leader, hentikan pengiriman heartbeat dan worker replikasi
         if self.heartbeat_timer_task:
             self.heartbeat_timer_task.cancel()
             self.heartbeat_timer_task = None
-            
+        self.stop_replicators()
+
         # Mulai lagi timer election
-        self.reset_election_timer()
\ No newline at end of file
+        self.reset_election_timer()
@@ -0,0 +1,431 @@
+# src/consensus/storage.py
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+# Jendela group-fsync: semua append dalam jendela ini di-fsync sekaligus (detik)
+FSYNC_WINDOW = float(os.environ.get("RAFT_FSYNC_WINDOW_MS", 2)) / 1000.0
+
+# Ukuran maksimum satu segment WAL sebelum pindah ke file baru (byte)
+SEGMENT_MAX_BYTES = int(os.environ.get("RAFT_SEGMENT_MAX_BYTES", 16 * 1024 * 1024))
+
+# Header record: index entry + panjang payload + CRC32 payload.
+# Index ada di header agar replay bisa melompati entry yang sudah
+# tercakup snapshot tanpa men-decode payload-nya.
+RECORD_HEADER = struct.Struct(">QII")
+
+# Header snapshot: last_included_index, last_included_term, panjang data, CRC32 data
+SNAPSHOT_HEADER = struct.Struct(">QQII")
+
+# Trailer opsional setelah data snapshot: panjang + CRC32 JSON konfigurasi cluster
+# (membership pada last_included_index). Snapshot lama tanpa trailer tetap terbaca.
+SNAPSHOT_CONFIG_HEADER = struct.Struct(">II")
+
+META_FILE = "meta.json"
+SNAPSHOT_FILE = "snapshot.bin"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+class RaftStorage:
+    """
+    Penyimpanan persisten untuk satu node Raft.
+
+    - meta.json: current_term dan voted_for (ditulis atomik: tmp + fsync + rename)
+    - wal-<index_pertama>.log: segment WAL append-only, satu record per entry log,
+      setiap record diawali panjang dan CRC32 sehingga tail yang robek saat crash
+      bisa dideteksi dan dipotong ketika replay.
+    - snapshot.bin: snapshot state machine terakhir; segment yang seluruhnya
+      tercakup snapshot dihapus, jadi replay hanya membaca tail setelahnya.
+    """
+
+    def __init__(self, data_dir: str, fsync_window: float = FSYNC_WINDOW,
+                 segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.data_dir = data_dir
+        self.fsync_window = fsync_window
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        # Daftar segment terurut: [(index_pertama, path), ...]
+        self.segments = []
+        self.active_file = None
+        self.active_size = 0
+
+        self.written_index = 0   # Index terakhir yang sudah ditulis ke file
+        self.synced_index = 0    # Index terakhir yang sudah dijamin fsync
+        self.generation = 0      # Naik setiap truncate, untuk mengabaikan fsync basi
+
+        # Group fsync
+        self.sync_waiters = []
+        self.sync_task = None
+        self.on_synced = None    # Callback opsional setelah fsync selesai
+
+        self.stats = {
+            "fsync_total": 0,
+            "entries_synced": 0,
+            "replayed_entries": 0,
+            "replay_seconds": 0.0,
+            "start_time": time.time()
+        }
+
+    # --- Metadata (term & vote) ---
+
+    def load_meta(self) -> dict:
+        path = os.path.join(self.data_dir, META_FILE)
+        if not os.path.exists(path):
+            return {"current_term": 0, "voted_for": None}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save_meta(self, current_term: int, voted_for):
+        """
+        Ditulis secara sinkron: node tidak boleh membalas vote sebelum
+        term/vote-nya tersimpan, kalau tidak bisa double-vote setelah restart.
+        """
+        path = os.path.join(self.data_dir, META_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"current_term": current_term, "voted_for": voted_for}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.fsync_dir()
+
+    def fsync_dir(self):
+        fd = os.open(self.data_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # --- Segment WAL ---
+
+    def segment_path(self, first_index: int) -> str:
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{first_index:020d}{SEGMENT_SUFFIX}")
+
+    def list_segments(self) -> list:
+        segments = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                first_index = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                segments.append((first_index, os.path.join(self.data_dir, name)))
+        segments.sort()
+        return segments
+
+    @staticmethod
+    def encode_record(index: int, entry: dict) -> bytes:
+        payload = json.dumps(
+            {"t": entry["term"], "c": entry["command"]},
+            separators=(",", ":")
+        ).encode()
+        return RECORD_HEADER.pack(index, len(payload), zlib.crc32(payload)) + payload
+
+    @staticmethod
+    def read_records(path: str, after_index: int = 0):
+        """
+        Generator (offset, index, entry) untuk satu segment.
+        Entry dengan index <= after_index dilewati tanpa decode (entry = None).
+        Berhenti di record pertama yang tidak utuh / CRC-nya salah.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            index, length, crc = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            entry = None
+            if index > after_index:
+                record = json.loads(payload)
+                entry = {"term": record["t"], "command": record["c"]}
+            yield offset, index, entry
+            offset = start + length
+        # Sisa byte setelah 'offset' adalah tail yang robek (jika ada)
+        yield offset, None, None
+
+    def load(self, after_index: int = 0) -> list:
+        """
+        Replay WAL dan mengembalikan daftar entry dengan index > after_index.
+        Tail yang robek dipotong sehingga append berikutnya tetap konsisten.
+        """
+        started = time.time()
+        entries = []
+        expected_index = None
+        self.segments = self.list_segments()
+
+        for position, (first_index, path) in enumerate(self.segments):
+            valid_end = 0
+            broken = False
+            for offset, index, entry in self.read_records(path, after_index):
+                if index is None:
+                    valid_end = offset
+                    break
+                if expected_index is not None and index != expected_index:
+                    broken = True
+                    valid_end = offset
+                    break
+                expected_index = index + 1
+                if entry is not None:
+                    entries.append(entry)
+            if broken or valid_end < os.path.getsize(path):
+                log.warning(f"WAL {path} terpotong di offset {valid_end}, membuang tail yang rusak")
+                with open(path, "r+b") as f:
+                    f.truncate(valid_end)
+                for _, later_path in self.segments[position + 1:]:
+                    os.remove(later_path)
+                self.segments = self.segments[:position + 1]
+                break
+
+        last_index = (expected_index - 1) if expected_index is not None else after_index
+        first_loaded = last_index - len(entries) + 1
+        if last_index < after_index or (entries and first_loaded != after_index + 1):
+            # WAL tidak menyambung dengan snapshot (crash di tengah install snapshot):
+            # buang seluruh WAL, log dimulai lagi tepat setelah snapshot
+            log.warning(f"WAL tidak menyambung dengan snapshot index {after_index}, WAL di-reset")
+            entries = []
+            self.reset(after_index)
+        else:
+            self.written_index = last_index
+            self.synced_index = self.written_index
+        if self.segments and self.active_file is None:
+            first_index, path = self.segments[-1]
+            self.active_file = open(path, "ab")
+            self.active_size = self.active_file.tell()
+
+        self.stats["replayed_entries"] = len(entries)
+        self.stats["replay_seconds"] = round(time.time() - started, 4)
+        log.info(f"WAL replay: {len(entries)} entry dari {len(self.segments)} segment "
+                 f"dalam {self.stats['replay_seconds']}s")
+        return entries
+
+    def open_segment(self, first_index: int):
+        path = self.segment_path(first_index)
+        self.active_file = open(path, "ab")
+        self.active_size = self.active_file.tell()
+        self.segments.append((first_index, path))
+        self.fsync_dir()
+
+    def roll_segment(self, first_index: int):
+        """Menutup segment aktif (fsync dulu) dan membuka segment baru."""
+        if self.active_file is not None:
+            self.active_file.flush()
+            os.fsync(self.active_file.fileno())
+            self.active_file.close()
+        self.open_segment(first_index)
+
+    def append(self, start_index: int, entries: list):
+        """
+        Menulis entry ke WAL (tanpa menunggu fsync).
+        Pakai 'barrier()' untuk menunggu sampai data benar-benar durable.
+        """
+        if not entries:
+            return
+        if start_index != self.written_index + 1:
+            raise ValueError(f"WAL append tidak berurutan: {start_index} setelah {self.written_index}")
+
+        for offset, entry in enumerate(entries):
+            index = start_index + offset
+            if self.active_file is None or self.active_size >= self.segment_max_bytes:
+                self.roll_segment(index)
+            record = self.encode_record(index, entry)
+            self.active_file.write(record)
+            self.active_size += len(record)
+        self.written_index = start_index + len(entries) - 1
+        self.schedule_sync()
+
+    def truncate_from(self, index: int):
+        """Membuang semua entry dengan index >= 'index' (konflik dari Leader baru)."""
+        if index > self.written_index:
+            return
+        if self.active_file is not None:
+            self.active_file.flush()
+            self.active_file.close()
+            self.active_file = None
+
+        keep = []
+        for first_index, path in self.segments:
+            if first_index >= index:
+                os.remove(path)
+                continue
+            keep.append((first_index, path))
+        self.segments = keep
+
+        if self.segments:
+            _, path = self.segments[-1]
+            for offset, record_index, _ in self.read_records(path):
+                if record_index is None or record_index >= index:
+                    with open(path, "r+b") as f:
+                        f.truncate(offset)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    break
+            self.active_file = open(path, "ab")
+            self.active_size = self.active_file.tell()
+        self.fsync_dir()
+
+        self.generation += 1
+        self.written_index = index - 1
+        self.synced_index = min(self.synced_index, self.written_index)
+
+    # --- Snapshot ---
+
+    def save_snapshot(self, index: int, term: int, data: bytes, config: dict = None):
+        """
+        Menyimpan snapshot (dan konfigurasi cluster pada index tersebut) secara
+        atomik lalu menghapus segment WAL yang seluruh isinya sudah tercakup snapshot.
+        """
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(index, term, len(data), zlib.crc32(data)))
+            f.write(data)
+            if config is not None:
+                encoded = json.dumps(config, separators=(",", ":")).encode()
+                f.write(SNAPSHOT_CONFIG_HEADER.pack(len(encoded), zlib.crc32(encoded)))
+                f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.fsync_dir()
+        self.compact(index)
+
+    def load_snapshot(self):
+        """Mengembalikan (index, term, data, config) dari snapshot terakhir, atau None."""
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            raw = f.read()
+        if len(raw) < SNAPSHOT_HEADER.size:
+            log.error(f"Snapshot {path} rusak (header terpotong), diabaikan")
+            return None
+        index, term, length, crc = SNAPSHOT_HEADER.unpack_from(raw, 0)
+        data = raw[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length]
+        if len(data) != length or zlib.crc32(data) != crc:
+            log.error(f"Snapshot {path} rusak (CRC salah), diabaikan")
+            return None
+        config = None
+        offset = SNAPSHOT_HEADER.size + length
+        if len(raw) >= offset + SNAPSHOT_CONFIG_HEADER.size:
+            config_length, config_crc = SNAPSHOT_CONFIG_HEADER.unpack_from(raw, offset)
+            encoded = raw[offset + SNAPSHOT_CONFIG_HEADER.size:offset + SNAPSHOT_CONFIG_HEADER.size + config_length]
+            if len(encoded) != config_length or zlib.crc32(encoded) != config_crc:
+                log.error(f"Konfigurasi di snapshot {path} rusak (CRC salah), diabaikan")
+                return None
+            config = json.loads(encoded)
+        return index, term, data, config
+
+    def compact(self, index: int):
+        """
+        Menghapus segment yang semua entry-nya <= index.
+        Segment aktif (terakhir) tidak pernah dihapus.
+        """
+        keep_from = 0
+        for position in range(len(self.segments) - 1):
+            next_first_index = self.segments[position + 1][0]
+            if next_first_index <= index + 1:
+                os.remove(self.segments[position][1])
+                keep_from = position + 1
+            else:
+                break
+        if keep_from:
+            self.segments = self.segments[keep_from:]
+            self.fsync_dir()
+
+    def reset(self, index: int):
+        """Membuang seluruh WAL; append berikutnya dimulai dari index + 1."""
+        if self.active_file is not None:
+            self.active_file.close()
+            self.active_file = None
+        for _, path in self.segments:
+            os.remove(path)
+        self.segments = []
+        self.fsync_dir()
+        self.generation += 1
+        self.written_index = index
+        self.synced_index = index
+
+    # --- Group fsync ---
+
+    def schedule_sync(self):
+        if self.sync_task is None:
+            self.sync_task = asyncio.create_task(self.group_sync())
+
+    async def group_sync(self):
+        """
+        Menunggu satu jendela fsync lalu melakukan SATU fsync untuk semua
+        append yang terkumpul. fsync berjalan di thread pool pada fd duplikat
+        agar event loop tidak ter-block dan segment boleh di-roll sementara itu.
+        """
+        await asyncio.sleep(self.fsync_window)
+        waiters, self.sync_waiters = self.sync_waiters, []
+        self.sync_task = None
+        target_index = self.written_index
+        generation = self.generation
+
+        try:
+            if self.active_file is not None:
+                self.active_file.flush()
+                fd = os.dup(self.active_file.fileno())
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, os.fsync, fd)
+                finally:
+                    os.close(fd)
+        except Exception as e:
+            log.error(f"fsync WAL gagal: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        if generation == self.generation and target_index > self.synced_index:
+            self.stats["fsync_total"] += 1
+            self.stats["entries_synced"] += target_index - self.synced_index
+            self.synced_index = target_index
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(self.synced_index)
+        if self.synced_index < self.written_index:
+            self.schedule_sync()
+        if self.on_synced is not None:
+            self.on_synced()
+
+    async def barrier(self):
+        """Menunggu sampai semua entry yang sudah ditulis ikut ter-fsync."""
+        while self.synced_index < self.written_index:
+            waiter = asyncio.get_running_loop().create_future()
+            self.sync_waiters.append(waiter)
+            self.schedule_sync()
+            await waiter
+
+    def get_stats(self) -> dict:
+        uptime = time.time() - self.stats["start_time"]
+        fsyncs = self.stats["fsync_total"]
+        return {
+            "data_dir": self.data_dir,
+            "segments": len(self.segments),
+            "written_index": self.written_index,
+            "synced_index": self.synced_index,
+            "fsync_total": fsyncs,
+            "fsync_per_second": round(fsyncs / uptime, 2) if uptime > 0 else 0,
+            "entries_per_fsync": round(self.stats["entries_synced"] / fsyncs, 2) if fsyncs else 0,
+            "fsync_window_ms": self.fsync_window * 1000,
+            "replayed_entries": self.stats["replayed_entries"],
+            "replay_seconds": self.stats["replay_seconds"]
+        }
+
+    def close(self):
+        if self.active_file is not None:
+            self.active_file.flush()
+            os.fsync(self.active_file.fileno())
+            self.active_file.close()
+            self.active_file = None
@@ -5,8 +5,8 @@ import argparse
 import logging
 from aiohttp import web
 
-# Impor fungsi 'send_message' dari file yang kita buat sebelumnya
-from src.communication.message_passing import send_message
+# Impor transport ber-pool dari file yang kita buat sebelumnya
+from src.communication.message_passing import NodeTransport
 
 # Mengatur logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
@@ -29,6 +29,9 @@ class BaseNode:
             peer_id = f"node-{p_port}"
             self.peer_list[peer_id] = f"http://{host}:{p_port}"
         
+        # Transport ber-pool (keep-alive) untuk semua pesan keluar node ini
+        self.transport = NodeTransport()
+        
         log.info(f"Node {self.node_id} dibuat. Peers: {list(self.peer_list.keys())}")
 
     # --- Bagian Server (Menerima Pesan) ---
@@ -67,7 +70,7 @@ class BaseNode:
             # Setiap peer mendapat 'task' send_message-nya sendiri
             # Kita targetkan endpoint /receive di node peer
             tasks.append(
-                send_message(f"{peer_url}/receive", payload)
+                self.transport.send_message(f"{peer_url}/receive", payload)
             )
         
         # Menjalankan semua task secara paralel dan menunggu semuanya selesai
@@ -91,6 +94,14 @@ class BaseNode:
             return web.Response(text=f"Error: {e}", status=500)
 
     # --- Menjalankan Server ---
+
+    async def on_startup(self, app: web.Application):
+        """Hook startup aiohttp: buka pool koneksi keluar."""
+        await self.transport.start()
+
+    async def on_cleanup(self, app: web.Application):
+        """Hook shutdown aiohttp: tutup pool koneksi keluar."""
+        await self.transport.close()
     
     async def run_server(self):
         """
@@ -102,6 +113,10 @@ class BaseNode:
         app.router.add_post('/receive', self.handle_receive)
         app.router.add_get('/send', self.handle_send_test) # Endpoint untuk tes
         
+        # Hook siklus hidup transport
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        
         # Setup dan jalankan server
         runner = web.AppRunner(app)
         await runner.setup()
@@ -111,7 +126,11 @@ class BaseNode:
         log.info(f"======= Node {self.node_id} aktif di http://{self.host}:{self.port} =======")
         
         # Baris ini penting agar server tetap berjalan selamanya
-        await asyncio.Event().wait()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            # Menjalankan on_cleanup (menutup pool koneksi)
+            await runner.cleanup()
 
 # --- Titik Masuk Eksekusi Skrip ---
 
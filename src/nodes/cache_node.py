@@ -8,7 +8,8 @@ from aiohttp import web
 from collections import OrderedDict # Penting untuk LRU
 
 # Impor utilitas komunikasi kita yang sudah di-update
-from src.communication.message_passing import send_message
+from src.communication.message_passing import NodeTransport
+from src.communication.binary_rpc import RPC_BINARY, BinaryRpcServer
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
@@ -29,6 +30,10 @@ class CacheNode:
         for p_name in peer_names:
             self.peer_urls[p_name] = f"http://{p_name}:{peer_port}"
 
+        # Transport ber-pool: bus snooping memakai ulang koneksi keep-alive
+        self.transport = NodeTransport()
+        self.rpc_server = None
+
         # --- Data Inti Node ---
         
         # 1. Cache Lokal (LRU): Menyimpan data (key -> value)
@@ -70,7 +75,7 @@ class CacheNode:
         self.metrics["bus_transactions"] += 1
         tasks = []
         for peer_url in self.peer_urls.values():
-            tasks.append(send_message(f"{peer_url}{endpoint}", payload))
+            tasks.append(self.transport.send_message(f"{peer_url}{endpoint}", payload))
         
         # Jalankan semua secara paralel dan kumpulkan hasilnya
         responses = await asyncio.gather(*tasks)
@@ -213,7 +218,10 @@ class CacheNode:
         Handler untuk: POST /bus/read_miss/{key}
         NODE LAIN meminta data. Kita "snoop" request ini.
         """
-        key = request.match_info.get('key')
+        return web.json_response(await self.bus_read_miss(request.match_info.get('key')))
+
+    async def bus_read_miss(self, key: str) -> dict:
+        """Snoop Bus Read untuk 'key' (dipakai endpoint HTTP dan transport biner)."""
         state = self.cache_state.get(key, "I")
         
         # Jika kita punya data yang valid (M, E, atau S)
@@ -225,25 +233,27 @@ class CacheNode:
                 self.cache_state[key] = "S"
                 # (Dalam implementasi nyata, M akan write-back ke memori dulu)
                 
-            return web.json_response({"state": "S", "data": self.cache.get(key)})
+            return {"state": "S", "data": self.cache.get(key)}
             
         # Jika kita tidak punya, kembalikan Invalid
-        return web.json_response({"state": "I"})
+        return {"state": "I"}
 
     async def handle_bus_invalidate(self, request: web.Request):
         """
         Handler untuk: POST /bus/invalidate/{key}
         NODE LAIN menulis data. Kita "snoop" request ini.
         """
-        key = request.match_info.get('key')
-        
+        return web.json_response(await self.bus_invalidate(request.match_info.get('key')))
+
+    async def bus_invalidate(self, key: str) -> dict:
+        """Snoop Bus Invalidate untuk 'key' (dipakai endpoint HTTP dan transport biner)."""
         if key in self.cache_state and self.cache_state[key] != "I":
             self.metrics["invalidations_received"] += 1
             log.warning(f"[{self.node_id}] BUS SNOOP (Invalidate): '{key}' Hit! State -> I")
             # Paksa state kita jadi Invalid
             self.cache_state[key] = "I"
             
-        return web.json_response({"status": "acked"})
+        return {"status": "acked"}
 
     async def handle_root(self, request: web.Request):
         """
@@ -339,6 +349,16 @@ class CacheNode:
 
     # --- Menjalankan Server ---
     
+    async def on_startup(self, app: web.Application):
+        """Hook startup aiohttp: buka pool koneksi keluar."""
+        await self.transport.start()
+
+    async def on_cleanup(self, app: web.Application):
+        """Hook shutdown aiohttp: tutup pool koneksi keluar."""
+        if self.rpc_server is not None:
+            await self.rpc_server.close()
+        await self.transport.close()
+    
     async def run_server(self):
         app = web.Application()
         
@@ -355,6 +375,10 @@ class CacheNode:
         app.router.add_post('/bus/read_miss/{key}', self.handle_bus_read_miss)
         app.router.add_post('/bus/invalidate/{key}', self.handle_bus_invalidate)
         
+        # Hook siklus hidup transport
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        
         # --- UBAH BARIS INI ---
         # Matikan access log aiohttp yang berisik
         runner = web.AppRunner(app, access_log=None)
@@ -364,8 +388,18 @@ class CacheNode:
         site = web.TCPSite(runner, self.host, self.port)
         await site.start()
         
+        if RPC_BINARY:
+            # Bus snooping lewat transport biner; key ikut di payload
+            self.rpc_server = BinaryRpcServer(self.host, self.port, advertise_host=self.node_id)
+            self.rpc_server.add_route('/bus/read_miss/', lambda data: self.bus_read_miss(data.get("key")), prefix=True)
+            self.rpc_server.add_route('/bus/invalidate/', lambda data: self.bus_invalidate(data.get("key")), prefix=True)
+            await self.rpc_server.start()
+        
         log.info(f"======= Cache Node {self.node_id} aktif di http://{self.host}:{self.port} =======")
-        await asyncio.Event().wait()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
 # --- Titik Masuk Eksekusi Skrip ---
 # --- UBAH SEMUA SETELAH INI ---
@@ -0,0 +1,55 @@
+# src/nodes/lock_events.py
+
+import asyncio
+
+
+class LockEventSubscription:
+    """Satu pelanggan stream event lock, dengan filter opsional resource/client."""
+    __slots__ = ("resource_id", "client_id", "queue", "overflowed")
+
+    def __init__(self, resource_id: str = None, client_id: str = None, max_queue: int = 1000):
+        self.resource_id = resource_id
+        self.client_id = client_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        # Event tanpa resource_id (mis. "reset" setelah snapshot) untuk semua pelanggan
+        if "resource_id" not in event:
+            return True
+        if self.resource_id is not None and event.get("resource_id") != self.resource_id:
+            return False
+        if self.client_id is not None and event.get("client_id") != self.client_id:
+            return False
+        return True
+
+
+class LockEventHub:
+    """
+    Fan-out event lock (granted/released/expired/aborted) ke pelanggan stream.
+    Event diterbitkan dari state machine, jadi setiap node (termasuk follower)
+    bisa melayani stream. Pelanggan yang terlalu lambat (antrean penuh)
+    ditandai overflow dan diputus, bukan menahan apply.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self.subscribers = set()
+
+    def subscribe(self, resource_id: str = None, client_id: str = None) -> LockEventSubscription:
+        subscription = LockEventSubscription(resource_id, client_id, self.max_queue)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LockEventSubscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, event: dict):
+        for subscription in list(self.subscribers):
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.subscribers.discard(subscription)
@@ -1,51 +1,171 @@
 # src/nodes/lock_manager.py
 
 import asyncio
+import json
 import os  # <-- TAMBAHKAN untuk membaca environment variables
 import logging
+import time
+import heapq
+from collections import OrderedDict
 from aiohttp import web
 
 # Impor utilitas komunikasi kita
-from src.communication.message_passing import send_message
+from src.communication.message_passing import NodeTransport
+from src.communication.binary_rpc import RPC_BINARY, BinaryRpcServer
 # Impor OTAK Raft yang baru kita buat
 from src.consensus.raft import RaftConsensus
+from src.consensus.storage import RaftStorage
+from src.nodes.lock_snapshot import encode_lock_table, decode_lock_table
+from src.nodes.lock_table import LockRecord, ClientRecord
+from src.nodes.lock_events import LockEventHub
+from src.utils.wait_for_graph import WaitForGraph
+from src.utils.timer_wheel import TimerWheel
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 log = logging.getLogger(__name__)
 
+# Direktori data Raft (WAL + metadata). Kosong = state hanya di memori.
+RAFT_DATA_DIR = os.environ.get("RAFT_DATA_DIR", "")
+
+# Konsistensi default GET /locks: "linearizable" (ReadIndex), "lease", atau "stale" (lokal)
+LOCK_READ_CONSISTENCY = os.environ.get("LOCK_READ_CONSISTENCY", "linearizable")
+READ_CONSISTENCY_MODES = ("linearizable", "lease", "stale")
+
+# Batas waktu read konsisten menunggu konfirmasi Leader / apply lokal (detik)
+READ_TIMEOUT = float(os.environ.get("LOCK_READ_TIMEOUT", 2.0))
+
+# Deteksi deadlock: "immediate" (tolak request yang menutup siklus) atau
+# "periodic" (detector latar belakang membatalkan satu korban per siklus)
+DEADLOCK_DETECTION = os.environ.get("DEADLOCK_DETECTION", "immediate")
+DEADLOCK_CHECK_INTERVAL = float(os.environ.get("DEADLOCK_CHECK_INTERVAL", 1.0))
+# Pemilihan korban: "youngest", "oldest", atau "fewest_locks"
+DEADLOCK_VICTIM = os.environ.get("DEADLOCK_VICTIM", "youngest")
+
+# Kebijakan antrean reader/writer:
+# "fifo" = urut kedatangan; reader baru ikut holder shared hanya jika antrean kosong
+# "writer_preference" = selama ada writer menunggu, reader baru ikut antre dan
+#                       writer yang menunggu di-grant lebih dulu (anti starvation writer)
+LOCK_RW_POLICY = os.environ.get("LOCK_RW_POLICY", "fifo")
+
+# Lease lock: resolusi tick reaper (detik), batas TTL yang diterima, dan
+# jumlah lease kedaluwarsa maksimum per entry log "expire"
+LEASE_TICK = float(os.environ.get("LOCK_LEASE_TICK", 0.1))
+LEASE_MAX_TTL = float(os.environ.get("LOCK_LEASE_MAX_TTL", 86400))
+LEASE_EXPIRE_BATCH = int(os.environ.get("LOCK_LEASE_EXPIRE_BATCH", 1000))
+
+# Acquire blocking (wait=true): timeout default dan maksimum (detik)
+LOCK_WAIT_TIMEOUT = float(os.environ.get("LOCK_WAIT_TIMEOUT", 30))
+LOCK_WAIT_MAX_TIMEOUT = float(os.environ.get("LOCK_WAIT_MAX_TIMEOUT", 300))
+# Stream event GET /events: kapasitas antrean per pelanggan dan interval keep-alive
+LOCK_EVENT_QUEUE = int(os.environ.get("LOCK_EVENT_QUEUE", 1000))
+LOCK_EVENT_KEEPALIVE = float(os.environ.get("LOCK_EVENT_KEEPALIVE", 15))
+
+# Jumlah resource maksimum per /acquire-batch atau /release-batch
+LOCK_BATCH_MAX = int(os.environ.get("LOCK_BATCH_MAX", 1000))
+
+# GET /locks: ukuran halaman default/maksimum, dan jumlah tombstone resource
+# terhapus yang disimpan untuk mode diff (?since=<version>)
+LOCK_PAGE_DEFAULT = int(os.environ.get("LOCK_PAGE_DEFAULT", 1000))
+LOCK_PAGE_MAX = int(os.environ.get("LOCK_PAGE_MAX", 10000))
+LOCK_TOMBSTONES_MAX = int(os.environ.get("LOCK_TOMBSTONES_MAX", 100000))
+
+# Batas waktu default POST /raft/members/promote menunggu learner mengejar log (detik)
+MEMBER_PROMOTE_TIMEOUT = float(os.environ.get("RAFT_MEMBER_PROMOTE_TIMEOUT", 60))
+
+# Perilaku follower untuk /acquire dan /release:
+# "proxy" = teruskan ke Leader lewat koneksi pool, "redirect" = balas dengan leader hint
+LOCK_FOLLOWER_MODE = os.environ.get("LOCK_FOLLOWER_MODE", "proxy")
+
+def lease_clock() -> float:
+    """Waktu lease (epoch, resolusi milidetik) yang dicap Leader ke perintah log."""
+    return round(time.time(), 3)
+
+def is_positive_seconds(value) -> bool:
+    """Durasi dari body JSON: angka > 0 (bool bukan angka walau subclass int)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
 class LockManagerNode:
     """
     Node ini menjalankan server HTTP dan mengelola logika Raft Consensus.
     """
     
     # --- UBAH FUNGSI __init__ ---
-    def __init__(self, host: str, port: int, node_id: str, peer_names: list, peer_port: int):
+    def __init__(self, host: str, port: int, node_id: str, peer_names: list, peer_port: int,
+                 group_id: int = None, transport: NodeTransport = None):
         self.host = host
         self.port = port
         self.node_id = node_id  # <-- Gunakan node_id dari env
         
+        # Multi-Raft (lihat lock_router.py): satu instance per Raft group, semua
+        # endpoint-nya di bawah /groups/<group_id>. None = satu group di root.
+        self.group_id = group_id
+        self.group_prefix = f"/groups/{group_id}" if group_id is not None else ""
+        
         self.peer_list = {}
         for p_name in peer_names:
             # Bangun URL peer menggunakan nama layanan Docker
             # Nama layanan bisa langsung di-resolve oleh Docker network
-            self.peer_list[p_name] = f"http://{p_name}:{peer_port}"
+            self.peer_list[p_name] = f"http://{p_name}:{peer_port}{self.group_prefix}"
+        # URL kita sendiri seperti dilihat peer (dipakai di konfigurasi cluster Raft)
+        self.node_url = f"http://{node_id}:{peer_port}{self.group_prefix}"
         
-        # INI BAGIAN PENTING:
-        # Buat instance dari otak Raft.
-        # Kita 'pass' 'self' agar 'RaftConsensus' bisa memanggil
-        # fungsi di 'LockManagerNode' (seperti broadcast_rpc).
-        self.raft = RaftConsensus(self)
+        # Transport ber-pool: heartbeat & vote memakai ulang koneksi keep-alive.
+        # Group-group dalam satu proses berbagi satu transport milik router.
+        self.owns_transport = transport is None
+        self.transport = transport or NodeTransport()
+        # Server RPC biner (hanya mode satu group; router punya server sendiri)
+        self.rpc_server = None
+        # Diisi router: heartbeat kosong ke node yang sama digabung lintas group
+        self.heartbeat_coalescer = None
         
         # Lock Management State Machine
-        # Format: {"resource_id": {"type": "shared/exclusive", "holders": [list_of_clients], "queue": [waiting_clients]}}
+        # Format: {"resource_id": LockRecord(type, holders=set, queue=OrderedDict)}
+        # Resource tanpa holder dan tanpa antrean langsung dihapus (GC)
         self.lock_data = {}
         
         # Deadlock Detection: Track lock dependencies
-        # Format: {"client_id": {"waiting_for": "resource_id", "holding": [list_of_resources]}}
+        # Format: {"client_id": ClientRecord(waiting_for, holding=set)}
         self.client_dependencies = {}
         
-        log.info(f"Node {self.node_id} dibuat. Peers: {list(self.peer_list.keys())}")
+        # Wait-for graph index (waiter -> holders), di-update pada event antre/grant/release
+        self.wait_for_graph = WaitForGraph()
+        # Kapan tiap client mulai menunggu (lokal, hanya untuk memilih korban deadlock)
+        self.wait_started = {}
+        self.deadlock_task = None
+        
+        # Lease reaper (hanya di Leader): timer wheel (resource_id, client_id) -> expires_at.
+        # Dibangun ulang dari lock table setiap kali node menjadi Leader di term baru.
+        self.lease_wheel = None
+        self.lease_wheel_term = None
+        self.lease_task = None
+        
+        # Acquire blocking: (resource_id, client_id) -> Future yang diselesaikan saat
+        # waiter di-grant / dibatalkan. Event lock untuk GET /events (SSE).
+        self.grant_waiters = {}
+        self.events = LockEventHub(max_queue=LOCK_EVENT_QUEUE)
+        
+        # Versi perubahan untuk GET /locks?since=<version>. Versi = index log Raft yang
+        # terakhir mengubah resource, jadi sama di semua replika.
+        # OrderedDict diurutkan menurut versi (move_to_end saat berubah), sehingga diff
+        # cukup membaca dari ujung. Resource terhapus disimpan sebagai tombstone (terbatas);
+        # diff yang lebih tua dari changes_floor harus sinkron ulang penuh.
+        self.resource_versions = OrderedDict()
+        self.resource_tombstones = OrderedDict()
+        self.changes_floor = 0
+        
+        # INI BAGIAN PENTING:
+        # Buat instance dari otak Raft.
+        # Kita 'pass' 'self' agar 'RaftConsensus' bisa memanggil
+        # fungsi di 'LockManagerNode' (seperti broadcast_rpc).
+        # Dibuat setelah lock table, karena log dari disk akan diterapkan ke sana.
+        data_dir = os.path.join(RAFT_DATA_DIR, self.node_id)
+        if group_id is not None:
+            data_dir = os.path.join(data_dir, f"group-{group_id}")
+        storage = RaftStorage(data_dir) if RAFT_DATA_DIR else None
+        self.raft = RaftConsensus(self, storage=storage)
+        
+        log.info(f"Node {self.node_id}{self.group_prefix} dibuat. Peers: {list(self.peer_list.keys())}")
 
     # --- Komunikasi (Mirip BaseNode) ---
 
@@ -64,17 +184,31 @@ class LockManagerNode:
         # Jalankan semua RPC secara paralel dan tunggu hasilnya
         await asyncio.gather(*tasks, return_exceptions=True)
 
-    async def send_rpc(self, peer_id: str, target_url: str, payload: dict):
+    async def send_rpc(self, peer_id: str, target_url: str, payload: dict, urgent: bool = False,
+                       timing: dict = None):
         """
         Wrapper untuk 'send_message' yang memproses balasan.
+        Balasan juga dikembalikan ke pemanggil (None jika gagal).
+        'urgent' = heartbeat tidak boleh ditahan jendela penggabungan; 'timing'
+        (opsional) diisi "sent_at" jika RPC baru benar-benar dikirim belakangan.
         """
         try:
-            response = await send_message(target_url, payload)
+            if self.heartbeat_coalescer is not None and payload.get('type') == 'append_entries' \
+                    and not payload.get('entries'):
+                # Heartbeat murni: ikut satu RPC gabungan ke node tujuan
+                base_url = target_url[:-len(f"{self.group_prefix}/append-entries")]
+                response, sent_at = await self.heartbeat_coalescer.send(base_url, self.group_id, payload, urgent)
+                if timing is not None:
+                    timing["sent_at"] = sent_at
+            else:
+                response = await self.transport.send_message(target_url, payload)
             if response:
                 # Proses balasan RPC di sini
                 await self.handle_rpc_response(peer_id, payload, response)
+            return response
         except Exception as e:
             log.error(f"Error mengirim RPC ke {target_url}: {e}")
+            return None
 
     # --- Logika Pemrosesan RPC ---
 
@@ -89,25 +223,12 @@ class LockManagerNode:
             self.raft.step_down(response_term)
             return
             
-        if self.raft.state != 'candidate':
-            # Jika kita bukan candidate lagi, abaikan balasan suara
-            return 
-            
-        if request_payload.get('type') == 'request_vote':
-            # Jika ini adalah balasan untuk permintaan suara
-            if response.get('vote_granted'):
-                log.info(f"[{self.node_id}] Mendapat suara YA dari {peer_id}")
-                self.raft.votes_received.add(peer_id)
-                
-                # Cek apakah kita sudah menang (suara mayoritas)
-                # Mayoritas = (jumlah_node / 2) + 1
-                # (len(self.peer_list) + 1) adalah total node termasuk diri kita
-                mayoritas = ((len(self.peer_list) + 1) // 2) + 1
-                log.info(f"[{self.node_id}] Total suara: {len(self.raft.votes_received)}/{mayoritas}")
-                if len(self.raft.votes_received) >= mayoritas:
-                    self.raft.become_leader()
-            else:
-                log.info(f"[{self.node_id}] Mendapat suara TIDAK dari {peer_id}")
+        if request_payload.get('type') == 'request_vote' and not request_payload.get('pre_vote'):
+            # Jika ini adalah balasan untuk permintaan suara (Pre-Vote dihitung di raft.pre_vote)
+            self.raft.handle_vote_response(peer_id, response)
+        elif request_payload.get('type') == 'append_entries':
+            # Balasan replikasi log (match_index / next_index)
+            self.raft.handle_append_entries_response(peer_id, request_payload, response)
                 
         # Tidak perlu logic kompleks untuk restart election di sini
         # Biarkan election timeout handle restart otomatis
@@ -117,153 +238,684 @@ class LockManagerNode:
     
     def detect_deadlock(self, client_id: str, resource_id: str) -> bool:
         """
-        Simple deadlock detection using cycle detection in wait-for graph
+        Incremental deadlock check: would client_id waiting on resource_id close
+        a cycle in the wait-for graph? Only the component reachable from the
+        current holders is explored (iteratively).
+        """
+        holders = self.lock_data[resource_id].holders
+        return self.wait_for_graph.would_deadlock(client_id, holders)
+
+    def on_lock_granted(self, resource_id: str, client_id: str):
+        """Wait-for graph maintenance: client_id became a holder of resource_id."""
+        self.wait_for_graph.remove_waiter(client_id)
+        for waiter in self.lock_data[resource_id].queue:
+            self.wait_for_graph.add_edge(waiter, client_id)
+        self.wait_started.pop(client_id, None)
+
+    def on_lock_released(self, resource_id: str, client_id: str):
+        """Wait-for graph maintenance: client_id no longer holds resource_id."""
+        for waiter in self.lock_data[resource_id].queue:
+            self.wait_for_graph.remove_edge(waiter, client_id)
+
+    def rebuild_wait_for_graph(self):
+        """Rebuild the wait-for graph from the lock table (after a snapshot restore)."""
+        self.wait_for_graph.clear()
+        for lock_info in self.lock_data.values():
+            for waiter in lock_info.queue:
+                self.wait_for_graph.add_edges(waiter, lock_info.holders)
+
+    def choose_deadlock_victim(self, cycle: list) -> str:
+        """Pick which waiter in a cycle gets aborted, according to DEADLOCK_VICTIM."""
+        if DEADLOCK_VICTIM == "fewest_locks":
+            return min(cycle, key=lambda c: (len(self.client_dependencies[c].holding) if c in self.client_dependencies else 0, c))
+        if DEADLOCK_VICTIM == "oldest":
+            return min(cycle, key=lambda c: (self.wait_started.get(c, 0.0), c))
+        # "youngest": the most recent waiter has done the least waiting
+        return max(cycle, key=lambda c: (self.wait_started.get(c, 0.0), c))
+
+    async def deadlock_detector_loop(self):
+        """
+        Background detector (DEADLOCK_DETECTION=periodic): the leader looks for
+        cycles every DEADLOCK_CHECK_INTERVAL seconds and aborts one victim per
+        cycle through the Raft log.
+        """
+        while True:
+            await asyncio.sleep(DEADLOCK_CHECK_INTERVAL)
+            if self.raft.state != 'leader':
+                continue
+            try:
+                cycles = self.wait_for_graph.find_cycles()
+                if not cycles:
+                    continue
+                victims = sorted({self.choose_deadlock_victim(cycle) for cycle in cycles})
+                log.warning(f"[{self.node_id}] {len(cycles)} deadlock(s) detected, aborting waiters: {victims}")
+                await self.raft.propose({"op": "abort_wait", "client_ids": victims, "now": lease_clock()})
+            except Exception as e:
+                log.error(f"[{self.node_id}] Error in deadlock detector: {e}")
+
+    async def acquire_lock(self, resource_id: str, client_id: str, lock_type: str, ttl: float = None) -> dict:
         """
-        visited = set()
-        rec_stack = set()
+        Acquire lock (only accepted on Leader).
+        The command is appended to the Raft log and applied once committed by a majority.
+        ttl (seconds) turns the lock into a lease that expires unless renewed.
+        """
+        if self.raft.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
         
-        def has_cycle(current_client):
-            if current_client in rec_stack:
-                return True
-            if current_client in visited:
-                return False
-                
-            visited.add(current_client)
-            rec_stack.add(current_client)
-            
-            # Check what this client is waiting for
-            if current_client in self.client_dependencies:
-                waiting_resource = self.client_dependencies[current_client].get("waiting_for")
-                if waiting_resource and waiting_resource in self.lock_data:
-                    # Check who holds this resource
-                    holders = self.lock_data[waiting_resource].get("holders", [])
-                    for holder in holders:
-                        if has_cycle(holder):
-                            return True
-            
-            rec_stack.remove(current_client)
-            return False
+        return await self.raft.propose({
+            "op": "acquire",
+            "resource_id": resource_id,
+            "client_id": client_id,
+            "lock_type": lock_type,
+            "ttl": ttl,
+            "now": lease_clock()
+        })
+
+    async def release_lock(self, resource_id: str, client_id: str) -> dict:
+        """
+        Release lock (only accepted on Leader), replicated through the Raft log.
+        """
+        if self.raft.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
         
-        return has_cycle(client_id)
+        return await self.raft.propose({
+            "op": "release",
+            "resource_id": resource_id,
+            "client_id": client_id,
+            "now": lease_clock()
+        })
 
-    def acquire_lock(self, resource_id: str, client_id: str, lock_type: str) -> dict:
+    async def acquire_batch(self, client_id: str, resources: list, ttl: float = None) -> dict:
         """
-        Acquire lock logic (only executed on Leader)
+        All-or-nothing acquire of many resources in one Raft entry (only accepted on Leader).
+        resources: [{"resource_id": ..., "lock_type": ...}, ...]
         """
         if self.raft.state != 'leader':
             return {"status": "error", "message": "Not leader"}
         
-        # Initialize resource if not exists
-        if resource_id not in self.lock_data:
-            self.lock_data[resource_id] = {
-                "type": None,
-                "holders": [],
-                "queue": []
-            }
+        return await self.raft.propose({
+            "op": "acquire_batch",
+            "client_id": client_id,
+            "resources": resources,
+            "ttl": ttl,
+            "now": lease_clock()
+        })
+
+    async def release_batch(self, client_id: str, resource_ids: list) -> dict:
+        """
+        Release many resources in one Raft entry (only accepted on Leader).
+        """
+        if self.raft.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
         
-        lock_info = self.lock_data[resource_id]
+        return await self.raft.propose({
+            "op": "release_batch",
+            "client_id": client_id,
+            "resource_ids": resource_ids,
+            "now": lease_clock()
+        })
+
+    async def renew_lock(self, resource_id: str, client_id: str, ttl: float = None) -> dict:
+        """
+        Extend a lock lease (only accepted on Leader), replicated through the Raft log.
+        """
+        if self.raft.state != 'leader':
+            return {"status": "error", "message": "Not leader"}
+        
+        return await self.raft.propose({
+            "op": "renew",
+            "resource_id": resource_id,
+            "client_id": client_id,
+            "ttl": ttl,
+            "now": lease_clock()
+        })
+
+    # --- State Machine (dijalankan di SEMUA node saat entry di-commit) ---
+
+    def apply_command(self, command: dict):
+        """
+        Menerapkan satu perintah yang sudah di-commit ke lock table.
+        Dipanggil oleh RaftConsensus dengan urutan log yang sama di setiap node.
+        """
+        op = command.get("op")
+        if op == "acquire":
+            return self.apply_acquire(command["resource_id"], command["client_id"], command["lock_type"],
+                                      command.get("ttl"), command.get("now"))
+        if op == "release":
+            return self.apply_release(command["resource_id"], command["client_id"], command.get("now"))
+        if op == "acquire_batch":
+            return self.apply_acquire_batch(command["client_id"], command["resources"],
+                                            command.get("ttl"), command.get("now"))
+        if op == "release_batch":
+            return self.apply_release_batch(command["client_id"], command["resource_ids"], command.get("now"))
+        if op == "renew":
+            return self.apply_renew(command["resource_id"], command["client_id"], command.get("ttl"), command["now"])
+        if op == "expire":
+            return self.apply_expire(command["leases"], command["now"])
+        if op == "abort_wait":
+            return self.apply_abort_wait(command["client_ids"], command.get("reason", "deadlock"),
+                                         command.get("resource_id"), command.get("now"))
+        if op == "config":
+            return None # Membership sudah diterapkan Raft saat entry masuk log
+        return None # no-op dari Leader baru
+
+    def snapshot_state(self) -> bytes:
+        """Serialisasi lock table untuk snapshot Raft (format biner ringkas)."""
+        return encode_lock_table(self.lock_data, self.client_dependencies)
+
+    def restore_state(self, data: bytes, index: int = 0):
+        """Mengganti lock table dengan isi snapshot (diambil pada log index 'index')."""
+        self.lock_data, self.client_dependencies = decode_lock_table(data)
+        self.rebuild_wait_for_graph()
+        self.lease_wheel_term = None
+        # Diff dan stream tidak bisa menjembatani snapshot: pelanggan harus sinkron ulang
+        self.resource_versions = OrderedDict((resource_id, index) for resource_id in self.lock_data)
+        self.resource_tombstones = OrderedDict()
+        self.changes_floor = index
+        if self.events.subscribers:
+            self.events.publish({"event": "reset", "index": index})
+
+    def client_record(self, client_id: str) -> ClientRecord:
+        """Ambil (atau buat) ClientRecord untuk client_id."""
+        deps = self.client_dependencies.get(client_id)
+        if deps is None:
+            deps = self.client_dependencies[client_id] = ClientRecord()
+        return deps
+
+    def gc_client(self, client_id: str):
+        """Hapus ClientRecord yang tidak lagi memegang/menunggu apa pun."""
+        deps = self.client_dependencies.get(client_id)
+        if deps is not None and deps.is_empty():
+            del self.client_dependencies[client_id]
+
+    def gc_resource(self, resource_id: str):
+        """Hapus LockRecord yang sudah kosong (tanpa holder dan antrean), lalu catat versinya."""
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is not None and lock_info.is_empty():
+            del self.lock_data[resource_id]
+        self.touch_resource(resource_id)
+
+    def touch_resource(self, resource_id: str):
+        """Catat bahwa resource berubah pada entry log yang sedang diterapkan."""
+        version = self.raft.last_applied
+        if resource_id in self.lock_data:
+            self.resource_tombstones.pop(resource_id, None)
+            self.resource_versions[resource_id] = version
+            self.resource_versions.move_to_end(resource_id)
+        else:
+            self.resource_versions.pop(resource_id, None)
+            self.resource_tombstones[resource_id] = version
+            self.resource_tombstones.move_to_end(resource_id)
+            if len(self.resource_tombstones) > LOCK_TOMBSTONES_MAX:
+                _, dropped_version = self.resource_tombstones.popitem(last=False)
+                self.changes_floor = max(self.changes_floor, dropped_version)
+
+    def apply_acquire(self, resource_id: str, client_id: str, lock_type: str,
+                      ttl: float = None, now: float = None) -> dict:
+        """
+        Acquire lock logic (state machine)
+        """
+        # Initialize resource if not exists
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is None:
+            lock_info = self.lock_data[resource_id] = LockRecord()
+        self.touch_resource(resource_id)
         
-        # Check if client already holds this lock
-        if client_id in lock_info["holders"]:
+        # Check if client already holds this lock (re-acquire with a ttl refreshes the lease)
+        if client_id in lock_info.holders:
+            if ttl:
+                self.set_lease(resource_id, lock_info, client_id, ttl, now)
             return {"status": "success", "message": "Already holding lock"}
         
         # Case 1: No one holds the lock
-        if not lock_info["holders"]:
-            lock_info["type"] = lock_type
-            lock_info["holders"].append(client_id)
+        if not lock_info.holders:
+            lock_info.type = lock_type
+            lock_info.holders.add(client_id)
+            self.on_lock_granted(resource_id, client_id)
             
             # Update client dependencies
-            if client_id not in self.client_dependencies:
-                self.client_dependencies[client_id] = {"waiting_for": None, "holding": []}
-            self.client_dependencies[client_id]["holding"].append(resource_id)
+            self.client_record(client_id).holding.add(resource_id)
+            if ttl:
+                self.set_lease(resource_id, lock_info, client_id, ttl, now)
             
+            self.publish_lock_event("granted", resource_id, client_id, lock_type=lock_type)
             log.info(f"[{self.node_id}] Lock acquired: {client_id} -> {resource_id} ({lock_type})")
             return {"status": "success", "message": "Lock acquired"}
         
         # Case 2: Shared lock requested and current lock is shared
-        elif lock_type == "shared" and lock_info["type"] == "shared":
-            lock_info["holders"].append(client_id)
+        # (tidak boleh menyalip writer yang sedang menunggu)
+        elif lock_type == "shared" and lock_info.type == "shared" and self.can_join_readers(lock_info):
+            lock_info.holders.add(client_id)
+            self.on_lock_granted(resource_id, client_id)
             
-            if client_id not in self.client_dependencies:
-                self.client_dependencies[client_id] = {"waiting_for": None, "holding": []}
-            self.client_dependencies[client_id]["holding"].append(resource_id)
+            self.client_record(client_id).holding.add(resource_id)
+            if ttl:
+                self.set_lease(resource_id, lock_info, client_id, ttl, now)
             
+            self.publish_lock_event("granted", resource_id, client_id, lock_type=lock_type)
             log.info(f"[{self.node_id}] Shared lock acquired: {client_id} -> {resource_id}")
             return {"status": "success", "message": "Shared lock acquired"}
         
         # Case 3: Lock is held, need to wait
         else:
             # Check for deadlock before adding to queue
-            if self.detect_deadlock(client_id, resource_id):
+            if DEADLOCK_DETECTION == "immediate" and self.detect_deadlock(client_id, resource_id):
                 log.warning(f"[{self.node_id}] Deadlock detected! Rejecting {client_id} -> {resource_id}")
                 return {"status": "error", "message": "Deadlock detected, request rejected"}
             
             # Add to waiting queue
-            if client_id not in lock_info["queue"]:
-                lock_info["queue"].append(client_id)
+            if client_id not in lock_info.queue:
+                lock_info.enqueue(client_id, lock_type)
                 
                 # Update client dependencies
-                if client_id not in self.client_dependencies:
-                    self.client_dependencies[client_id] = {"waiting_for": None, "holding": []}
-                self.client_dependencies[client_id]["waiting_for"] = resource_id
+                self.client_record(client_id).waiting_for = resource_id
+                self.wait_for_graph.add_edges(client_id, lock_info.holders)
+                self.wait_started[client_id] = time.monotonic()
+                # A waiter's lease also runs while it waits, so crashed clients leave the queue
+                if ttl:
+                    self.set_lease(resource_id, lock_info, client_id, ttl, now)
             
             log.info(f"[{self.node_id}] Lock queued: {client_id} waiting for {resource_id}")
             return {"status": "waiting", "message": "Added to queue"}
 
-    def release_lock(self, resource_id: str, client_id: str) -> dict:
+    def apply_release(self, resource_id: str, client_id: str, now: float = None,
+                      event: str = "released") -> dict:
         """
-        Release lock logic (only executed on Leader)
+        Release lock logic (state machine)
         """
-        if self.raft.state != 'leader':
-            return {"status": "error", "message": "Not leader"}
-        
-        if resource_id not in self.lock_data:
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is None:
             return {"status": "error", "message": "Resource not found"}
         
-        lock_info = self.lock_data[resource_id]
-        
-        if client_id not in lock_info["holders"]:
+        if client_id not in lock_info.holders:
             return {"status": "error", "message": "Client does not hold this lock"}
         
         # Remove from holders
-        lock_info["holders"].remove(client_id)
+        lock_info.holders.discard(client_id)
+        lock_info.clear_lease(client_id)
+        self.on_lock_released(resource_id, client_id)
         
         # Update client dependencies
-        if client_id in self.client_dependencies:
-            if resource_id in self.client_dependencies[client_id]["holding"]:
-                self.client_dependencies[client_id]["holding"].remove(resource_id)
+        deps = self.client_dependencies.get(client_id)
+        if deps is not None:
+            deps.holding.discard(resource_id)
+            self.gc_client(client_id)
         
+        self.publish_lock_event(event, resource_id, client_id)
         log.info(f"[{self.node_id}] Lock released: {client_id} -> {resource_id}")
         
         # Process waiting queue if no more holders
-        if not lock_info["holders"] and lock_info["queue"]:
-            next_client = lock_info["queue"].pop(0)
-            
-            # Grant lock to next client (assume they want exclusive for simplicity)
-            lock_info["type"] = "exclusive"
-            lock_info["holders"].append(next_client)
+        granted = []
+        if not lock_info.holders and lock_info.queue:
+            # Grant lock to the next waiter, or a whole batch of compatible readers
+            granted, lock_type = self.next_grant_batch(lock_info)
+            self.grant_from_queue(resource_id, lock_info, granted, lock_type, now)
+        
+        self.gc_resource(resource_id)
+        return {"status": "success", "message": "Lock released", "granted": granted}
+
+    def grant_from_queue(self, resource_id: str, lock_info: LockRecord, granted: list, lock_type: str,
+                         now: float = None):
+        """Pindahkan waiter 'granted' dari antrean ke holder dan bangunkan acquire blocking-nya."""
+        lock_info.type = lock_type
+        for next_client in granted:
+            lease = lock_info.get_lease(next_client)
+            lock_info.dequeue(next_client)
+            lock_info.holders.add(next_client)
+            # The lease restarts at grant time (perintah log lama tanpa 'now': lease dibiarkan)
+            if lease is not None and now is not None:
+                self.set_lease(resource_id, lock_info, next_client, lease[0], now)
+        for next_client in granted:
+            self.on_lock_granted(resource_id, next_client)
             
             # Update dependencies
-            if next_client in self.client_dependencies:
-                self.client_dependencies[next_client]["waiting_for"] = None
-                self.client_dependencies[next_client]["holding"].append(resource_id)
+            deps = self.client_record(next_client)
+            deps.waiting_for = None
+            deps.holding.add(resource_id)
+            
+            self.publish_lock_event("granted", resource_id, next_client, lock_type=lock_type)
+            self.resolve_grant_waiter(resource_id, next_client, {
+                "status": "success", "message": "Lock granted from queue", "lock_type": lock_type})
+        
+        log.info(f"[{self.node_id}] Lock granted from queue: {granted} -> {resource_id} ({lock_type})")
+
+    def can_grant_now(self, resource_id: str, client_id: str, lock_type: str) -> bool:
+        """Apakah apply_acquire akan langsung memberi lock (tanpa antre)?"""
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is None or not lock_info.holders or client_id in lock_info.holders:
+            return True
+        return lock_type == "shared" and lock_info.type == "shared" and self.can_join_readers(lock_info)
+
+    def apply_acquire_batch(self, client_id: str, resources: list, ttl: float = None, now: float = None) -> dict:
+        """
+        Acquire batch logic (state machine): resources are taken in canonical
+        (sorted) order and only if every one of them can be granted right away;
+        otherwise nothing is acquired and nothing is queued, so a batch can
+        never hold half its locks while waiting for the rest.
+        """
+        # Canonical order; a resource listed twice is taken in the strongest mode
+        wanted = {}
+        for item in resources:
+            resource_id = item["resource_id"]
+            lock_type = item.get("lock_type", "exclusive")
+            if wanted.get(resource_id) != "exclusive":
+                wanted[resource_id] = lock_type
+        ordered = sorted(wanted.items())
+        
+        blocked = [resource_id for resource_id, lock_type in ordered
+                   if not self.can_grant_now(resource_id, client_id, lock_type)]
+        if blocked:
+            blocked_set = set(blocked)
+            results = {}
+            for resource_id, lock_type in ordered:
+                if resource_id in blocked_set:
+                    lock_info = self.lock_data[resource_id]
+                    results[resource_id] = {"status": "blocked", "type": lock_info.type,
+                                            "holders": sorted(lock_info.holders)}
+                else:
+                    results[resource_id] = {"status": "available"}
+            log.info(f"[{self.node_id}] Batch acquire rejected: {client_id} blocked on {len(blocked)} resource(s)")
+            return {"status": "error", "message": "Batch not acquired, some resources are held",
+                    "blocked": blocked, "results": results}
+        
+        results = {}
+        for resource_id, lock_type in ordered:
+            results[resource_id] = self.apply_acquire(resource_id, client_id, lock_type, ttl, now)
+        return {"status": "success", "message": f"{len(ordered)} lock(s) acquired", "results": results}
+
+    def apply_release_batch(self, client_id: str, resource_ids: list, now: float = None) -> dict:
+        """
+        Release batch logic (state machine), in canonical order; results per resource.
+        """
+        results = {}
+        for resource_id in sorted(set(resource_ids)):
+            results[resource_id] = self.apply_release(resource_id, client_id, now)
+        released = sum(1 for result in results.values() if result["status"] == "success")
+        return {"status": "success" if released == len(results) else "partial",
+                "message": f"{released} lock(s) released", "results": results}
+
+    def can_join_readers(self, lock_info: LockRecord) -> bool:
+        """Boleh-kah reader baru langsung ikut holder shared yang ada?"""
+        if LOCK_RW_POLICY == "writer_preference":
+            return not lock_info.waiting_writers
+        return not lock_info.queue
+
+    def next_grant_batch(self, lock_info: LockRecord):
+        """
+        Pilih waiter yang di-grant saat resource kosong: satu writer, atau
+        semua reader berurutan di kepala antrean sekaligus.
+        Mengembalikan (list client_id, lock_type).
+        """
+        if LOCK_RW_POLICY == "writer_preference" and lock_info.waiting_writers:
+            for client_id, wanted in lock_info.queue.items():
+                if wanted == "exclusive":
+                    return [client_id], "exclusive"
+
+        head_id, head_type = next(iter(lock_info.queue.items()))
+        if head_type != "shared":
+            return [head_id], "exclusive"
+
+        batch = []
+        for client_id, wanted in lock_info.queue.items():
+            if wanted != "shared":
+                break
+            batch.append(client_id)
+        return batch, "shared"
+
+    def set_lease(self, resource_id: str, lock_info: LockRecord, client_id: str, ttl: float, now: float):
+        """Pasang/perbarui lease; Leader juga menjadwalkannya di timer wheel."""
+        ttl = min(float(ttl), LEASE_MAX_TTL)
+        expires_at = round(now + ttl, 3)
+        lock_info.set_lease(client_id, ttl, expires_at)
+        self.touch_resource(resource_id)
+        if self.lease_wheel is not None and self.lease_wheel_term == self.raft.current_term:
+            self.lease_wheel.schedule((resource_id, client_id), expires_at)
+        return expires_at
+
+    def apply_renew(self, resource_id: str, client_id: str, ttl: float, now: float) -> dict:
+        """
+        Renew lease logic (state machine). Without ttl the lease's own TTL is reused.
+        """
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is None or (client_id not in lock_info.holders and client_id not in lock_info.queue):
+            return {"status": "error", "message": "Client does not hold or wait for this lock"}
+        
+        if not ttl:
+            lease = lock_info.get_lease(client_id)
+            if lease is None:
+                return {"status": "error", "message": "Lock has no lease; pass ttl to add one"}
+            ttl = lease[0]
+        
+        expires_at = self.set_lease(resource_id, lock_info, client_id, ttl, now)
+        return {"status": "success", "message": "Lease renewed", "expires_at": expires_at}
+
+    def apply_expire(self, leases: list, now: float) -> dict:
+        """
+        Expire lease logic (state machine). Each entry is [resource_id, client_id, expires_at];
+        it only applies if that lease was not renewed in the meantime.
+        """
+        expired = []
+        for resource_id, client_id, expires_at in leases:
+            if expires_at > now:
+                continue
+            lock_info = self.lock_data.get(resource_id)
+            if not self.lease_is_current(resource_id, client_id, expires_at):
+                continue
             
-            log.info(f"[{self.node_id}] Lock granted from queue: {next_client} -> {resource_id}")
+            if client_id in lock_info.holders:
+                self.apply_release(resource_id, client_id, now, event="expired")
+            elif client_id in lock_info.queue:
+                self.remove_waiter(resource_id, client_id, "expired", "Lease expired while waiting", now)
+            expired.append([resource_id, client_id])
         
-        return {"status": "success", "message": "Lock released"}
+        if expired:
+            log.info(f"[{self.node_id}] {len(expired)} lease(s) expired")
+        return {"status": "success", "expired": expired}
+
+    def lease_is_current(self, resource_id: str, client_id: str, expires_at: float) -> bool:
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is None:
+            return False
+        lease = lock_info.get_lease(client_id)
+        return lease is not None and lease[1] == expires_at
+
+    def rebuild_lease_wheel(self):
+        """Leader baru: bangun timer wheel dari semua lease di lock table."""
+        self.lease_wheel = TimerWheel(now=lease_clock(), tick=LEASE_TICK)
+        for resource_id, lock_info in self.lock_data.items():
+            if lock_info.leases:
+                for client_id, (_, expires_at) in lock_info.leases.items():
+                    self.lease_wheel.schedule((resource_id, client_id), expires_at)
+        self.lease_wheel_term = self.raft.current_term
+
+    async def lease_reaper_loop(self):
+        """
+        Leader: majukan timer wheel setiap LEASE_TICK dan usulkan lease yang
+        kedaluwarsa ke log Raft dalam batch (satu entry untuk banyak lease).
+        """
+        while True:
+            await asyncio.sleep(LEASE_TICK)
+            if self.raft.state != 'leader':
+                self.lease_wheel = None
+                self.lease_wheel_term = None
+                continue
+            try:
+                if self.lease_wheel is None or self.lease_wheel_term != self.raft.current_term:
+                    self.rebuild_lease_wheel()
+                
+                now = lease_clock()
+                due = self.lease_wheel.advance(now)
+                if not due:
+                    continue
+                # Lease yang sudah dilepas/diperbarui tidak perlu masuk log
+                leases = [[resource_id, client_id, expires_at]
+                          for (resource_id, client_id), expires_at in due
+                          if self.lease_is_current(resource_id, client_id, expires_at)]
+                for start in range(0, len(leases), LEASE_EXPIRE_BATCH):
+                    await self.raft.propose({
+                        "op": "expire",
+                        "leases": leases[start:start + LEASE_EXPIRE_BATCH],
+                        "now": now
+                    })
+            except Exception as e:
+                log.error(f"[{self.node_id}] Error in lease reaper: {e}")
+
+    def apply_abort_wait(self, client_ids: list, reason: str = "deadlock", only_resource: str = None,
+                         now: float = None) -> dict:
+        """
+        Abort the pending waits of deadlock victims, or of blocking acquires
+        that timed out (state machine). With 'only_resource' a wait is only
+        aborted if the client is still waiting for that resource, so a late
+        timeout never cancels a newer wait on another lock.
+        """
+        aborted = []
+        for client_id in client_ids:
+            deps = self.client_dependencies.get(client_id)
+            resource_id = deps.waiting_for if deps else None
+            if resource_id is None or (only_resource is not None and resource_id != only_resource):
+                continue
+            message = "Deadlock detected, wait aborted" if reason == "deadlock" else "Wait cancelled"
+            self.remove_waiter(resource_id, client_id, "aborted", message, now, reason=reason)
+            aborted.append({"client_id": client_id, "resource_id": resource_id})
+            log.warning(f"[{self.node_id}] Wait aborted ({reason}): {client_id} waiting for {resource_id}")
+        return {"status": "success", "aborted": aborted}
+
+    def remove_waiter(self, resource_id: str, client_id: str, event: str, message: str,
+                      now: float = None, **fields):
+        """
+        Keluarkan waiter dari antrean (expire/abort) dan bangunkan acquire
+        blocking-nya. Reader yang hanya tertahan oleh waiter ini (mis. writer
+        di depannya) langsung di-grant bersama holder shared yang ada.
+        """
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is not None:
+            lock_info.dequeue(client_id)
+        deps = self.client_dependencies.get(client_id)
+        if deps is not None and deps.waiting_for == resource_id:
+            deps.waiting_for = None
+            self.gc_client(client_id)
+        self.wait_for_graph.remove_waiter(client_id)
+        self.wait_started.pop(client_id, None)
+        
+        self.publish_lock_event(event, resource_id, client_id, **fields)
+        self.resolve_grant_waiter(resource_id, client_id, {"status": "error", "message": message})
+
+        if lock_info is not None:
+            if lock_info.holders and lock_info.type == "shared" and lock_info.queue:
+                granted, lock_type = self.next_grant_batch(lock_info)
+                if lock_type == "shared":
+                    self.grant_from_queue(resource_id, lock_info, granted, lock_type, now)
+            self.gc_resource(resource_id)
+
+    # --- Grant Notification (acquire blocking & event stream) ---
+
+    def publish_lock_event(self, event: str, resource_id: str, client_id: str, **fields):
+        if self.events.subscribers:
+            self.events.publish({
+                "event": event,
+                "index": self.raft.last_applied,
+                "resource_id": resource_id,
+                "client_id": client_id,
+                **fields
+            })
+
+    def resolve_grant_waiter(self, resource_id: str, client_id: str, result: dict):
+        future = self.grant_waiters.pop((resource_id, client_id), None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def wait_for_grant(self, resource_id: str, client_id: str, timeout: float) -> dict:
+        """
+        Leader: tunggu sampai waiter di-grant (diselesaikan dari apply_release).
+        Jika timeout, waiter ditarik dari antrean lewat log Raft. Jika node ini
+        bukan Leader lagi (atau abort tidak ter-commit), hasilnya dilaporkan
+        'unknown': waiter mungkin masih di antrean dan bisa di-grant nanti.
+        """
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is not None and client_id in lock_info.holders:
+            return {"status": "success", "message": "Lock granted from queue", "lock_type": lock_info.type}
+        if lock_info is None or client_id not in lock_info.queue:
+            return {"status": "error", "message": "No longer waiting for this lock"}
+        
+        key = (resource_id, client_id)
+        future = self.grant_waiters.get(key)
+        if future is None:
+            future = self.grant_waiters[key] = asyncio.get_running_loop().create_future()
+        
+        started = time.monotonic()
+        done, _ = await asyncio.wait({future}, timeout=timeout)
+        if future in done:
+            return {**future.result(), "waited": round(time.monotonic() - started, 3)}
+        
+        # Timeout: future ini tidak ditunggu lagi, jangan biarkan tertinggal di grant_waiters
+        if self.grant_waiters.get(key) is future:
+            del self.grant_waiters[key]
+        waited = round(time.monotonic() - started, 3)
+
+        # Tarik dari antrean, kecuali ternyata sudah di-grant di tengah jalan
+        result = await self.raft.propose({
+            "op": "abort_wait",
+            "client_ids": [client_id],
+            "resource_id": resource_id,
+            "reason": "timeout",
+            "now": lease_clock()
+        })
+        lock_info = self.lock_data.get(resource_id)
+        if lock_info is not None and client_id in lock_info.holders:
+            return {"status": "success", "message": "Lock granted from queue", "lock_type": lock_info.type,
+                    "waited": waited}
+        if result.get("status") != "success":
+            return {
+                "status": "unknown",
+                "message": f"Lock not granted within {timeout}s and the wait could not be cancelled "
+                           f"({result.get('message')}); the request may still be queued on the leader",
+                "leader_hint": self.raft.leader_id,
+                "waited": waited
+            }
+        return {"status": "timeout", "message": f"Lock not granted within {timeout}s, wait cancelled",
+                "waited": waited}
 
     # --- REST API Endpoints for Lock Management ---
     
+    def not_leader_response(self, status: int = 200):
+        """Balasan 'Not leader' dengan hint Leader yang kita kenal (jika ada)."""
+        leader_id = self.raft.leader_id
+        return web.json_response({
+            "status": "error",
+            "message": "Not leader",
+            "leader_hint": leader_id,
+            "leader_url": self.peer_list.get(leader_id)
+        }, status=status)
+
+    async def forward_to_leader(self, endpoint: str, data: dict, timeout: float = None):
+        """
+        Follower: teruskan request klien ke Leader (mode proxy), atau balas
+        dengan leader hint (mode redirect). Request yang sudah di-forward
+        sekali tidak di-forward lagi, untuk mencegah loop saat pergantian Leader.
+        """
+        leader_url = self.peer_list.get(self.raft.leader_id)
+        if LOCK_FOLLOWER_MODE != "proxy" or leader_url is None or data.get("forwarded_by"):
+            return self.not_leader_response()
+
+        response = await self.transport.send_message(
+            f"{leader_url}{endpoint}", {**data, "forwarded_by": self.node_id}, timeout=timeout)
+        if response is None:
+            return self.not_leader_response(status=503)
+        response.setdefault("handled_by", self.raft.leader_id)
+        return web.json_response(response)
+
     async def handle_acquire_lock(self, request: web.Request):
         """
         Handler for POST /acquire
-        Body: {"resource_id": "resource1", "client_id": "client1", "lock_type": "shared/exclusive"}
+        Body: {"resource_id": "resource1", "client_id": "client1", "lock_type": "shared/exclusive", "ttl": 30 (optional),
+               "wait": true (optional, block until granted), "timeout": 10 (optional, with wait)}
         """
         try:
             data = await request.json()
             resource_id = data.get('resource_id')
             client_id = data.get('client_id')
             lock_type = data.get('lock_type', 'exclusive')
+            ttl = data.get('ttl')
             
             if not resource_id or not client_id:
                 return web.json_response({"error": "resource_id and client_id required"}, status=400)
@@ -271,7 +923,23 @@ class LockManagerNode:
             if lock_type not in ['shared', 'exclusive']:
                 return web.json_response({"error": "lock_type must be 'shared' or 'exclusive'"}, status=400)
             
-            result = self.acquire_lock(resource_id, client_id, lock_type)
+            if ttl is not None and not is_positive_seconds(ttl):
+                return web.json_response({"error": "ttl must be a positive number of seconds"}, status=400)
+            
+            wait = bool(data.get('wait', False))
+            timeout = data.get('timeout', LOCK_WAIT_TIMEOUT)
+            if wait:
+                if not is_positive_seconds(timeout):
+                    return web.json_response({"error": "timeout must be a positive number of seconds"}, status=400)
+                timeout = min(timeout, LOCK_WAIT_MAX_TIMEOUT)
+            
+            if self.raft.state != 'leader':
+                # The leader parks the request, so the proxy hop must outlive the wait
+                return await self.forward_to_leader('/acquire', data, timeout=timeout + READ_TIMEOUT if wait else None)
+            
+            result = await self.acquire_lock(resource_id, client_id, lock_type, ttl)
+            if wait and result.get("status") == "waiting":
+                result = await self.wait_for_grant(resource_id, client_id, timeout)
             return web.json_response(result)
             
         except Exception as e:
@@ -290,22 +958,335 @@ class LockManagerNode:
             if not resource_id or not client_id:
                 return web.json_response({"error": "resource_id and client_id required"}, status=400)
             
-            result = self.release_lock(resource_id, client_id)
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/release', data)
+            
+            result = await self.release_lock(resource_id, client_id)
+            return web.json_response(result)
+            
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_acquire_batch(self, request: web.Request):
+        """
+        Handler for POST /acquire-batch
+        Body: {"client_id": "client1", "resources": [{"resource_id": "r1", "lock_type": "shared/exclusive"}, ...],
+               "ttl": 30 (optional)}
+        """
+        try:
+            data = await request.json()
+            client_id = data.get('client_id')
+            resources = data.get('resources')
+            ttl = data.get('ttl')
+            
+            if not client_id or not isinstance(resources, list) or not resources:
+                return web.json_response({"error": "client_id and a non-empty resources list required"}, status=400)
+            
+            if len(resources) > LOCK_BATCH_MAX:
+                return web.json_response({"error": f"at most {LOCK_BATCH_MAX} resources per batch"}, status=400)
+            
+            for item in resources:
+                if not isinstance(item, dict) or not item.get('resource_id'):
+                    return web.json_response({"error": "each resource needs a resource_id"}, status=400)
+                if item.get('lock_type', 'exclusive') not in ['shared', 'exclusive']:
+                    return web.json_response({"error": "lock_type must be 'shared' or 'exclusive'"}, status=400)
+            
+            if ttl is not None and not is_positive_seconds(ttl):
+                return web.json_response({"error": "ttl must be a positive number of seconds"}, status=400)
+            
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/acquire-batch', data)
+            
+            result = await self.acquire_batch(client_id, resources, ttl)
+            return web.json_response(result)
+            
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_release_batch(self, request: web.Request):
+        """
+        Handler for POST /release-batch
+        Body: {"client_id": "client1", "resource_ids": ["r1", "r2", ...]}
+        """
+        try:
+            data = await request.json()
+            client_id = data.get('client_id')
+            resource_ids = data.get('resource_ids')
+            
+            if not client_id or not isinstance(resource_ids, list) or not resource_ids:
+                return web.json_response({"error": "client_id and a non-empty resource_ids list required"}, status=400)
+            
+            if len(resource_ids) > LOCK_BATCH_MAX:
+                return web.json_response({"error": f"at most {LOCK_BATCH_MAX} resources per batch"}, status=400)
+            
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/release-batch', data)
+            
+            result = await self.release_batch(client_id, resource_ids)
+            return web.json_response(result)
+            
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_renew_lock(self, request: web.Request):
+        """
+        Handler for POST /renew
+        Body: {"resource_id": "resource1", "client_id": "client1", "ttl": 30 (optional)}
+        """
+        try:
+            data = await request.json()
+            resource_id = data.get('resource_id')
+            client_id = data.get('client_id')
+            ttl = data.get('ttl')
+            
+            if not resource_id or not client_id:
+                return web.json_response({"error": "resource_id and client_id required"}, status=400)
+            
+            if ttl is not None and not is_positive_seconds(ttl):
+                return web.json_response({"error": "ttl must be a positive number of seconds"}, status=400)
+            
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/renew', data)
+            
+            result = await self.renew_lock(resource_id, client_id, ttl)
             return web.json_response(result)
             
         except Exception as e:
             return web.json_response({"error": str(e)}, status=500)
 
+    async def handle_lock_events(self, request: web.Request):
+        """
+        Handler for GET /events - Server-Sent Events stream of lock events
+        (granted, released, expired, aborted) as they are applied on this node.
+        Query: ?resource_id=...&client_id=... (optional filters)
+        """
+        subscription = self.events.subscribe(request.query.get("resource_id"), request.query.get("client_id"))
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache"
+        })
+        try:
+            await response.prepare(request)
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), LOCK_EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(b": keep-alive\n\n")
+                    continue
+                await response.write(
+                    f"id: {event['index']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n".encode())
+            # Pelanggan terlalu lambat: beri tahu lalu putus, klien sinkron ulang lewat /locks
+            await response.write(b"event: overflow\ndata: {}\n\n")
+        except ConnectionResetError:
+            pass
+        finally:
+            self.events.unsubscribe(subscription)
+        return response
+
+    async def get_read_index(self, consistency: str):
+        """
+        Menentukan index yang harus sudah diterapkan sebelum read dilayani.
+        Leader: ReadIndex (atau lease). Follower: minta read index ke Leader.
+        Mengembalikan None jika tidak ada Leader yang bisa mengonfirmasi.
+        """
+        use_lease = consistency == "lease"
+        if self.raft.state == 'leader':
+            return await self.raft.read_index(use_lease=use_lease)
+
+        leader_url = self.peer_list.get(self.raft.leader_id)
+        if leader_url is None:
+            return None
+        response = await self.transport.send_message(f"{leader_url}/read-index", {"mode": consistency})
+        if not response:
+            return None
+        return response.get("read_index")
+
+    async def handle_read_index(self, request: web.Request):
+        """
+        Handler untuk endpoint POST /read-index (internal).
+        Follower meminta read index ke Leader untuk follower read.
+        Body: {"mode": "linearizable" | "lease"}
+        """
+        data = await request.json()
+        return web.json_response(await self.rpc_read_index(data))
+
     async def handle_lock_status(self, request: web.Request):
         """
         Handler for GET /locks - Show current lock status
+        Query: ?consistency=linearizable|lease|stale (default: LOCK_READ_CONSISTENCY)
+               &prefix=<resource prefix> &client_id=<holder/waiter> (filters)
+               &limit=N &cursor=<next_cursor> (pages ordered by resource_id)
+               &summary=true (counts only)
+               &since=<version> (only resources changed/deleted after that version;
+                                 client_id filters 'changed' only, 'deleted' keeps every
+                                 deleted resource since its holders are no longer known)
         """
-        return web.json_response({
+        consistency = request.query.get("consistency", LOCK_READ_CONSISTENCY)
+        if consistency not in READ_CONSISTENCY_MODES:
+            return web.json_response(
+                {"error": f"consistency must be one of {list(READ_CONSISTENCY_MODES)}"}, status=400)
+
+        read_index = None
+        if consistency != "stale":
+            try:
+                read_index = await asyncio.wait_for(self.get_read_index(consistency), READ_TIMEOUT)
+                if read_index is not None:
+                    await asyncio.wait_for(self.raft.wait_for_applied(read_index), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                read_index = None
+            if read_index is None:
+                return web.json_response({
+                    "error": "No leader available to confirm a consistent read",
+                    "leader_hint": self.raft.leader_id
+                }, status=503)
+
+        response = {
             "node_id": self.node_id,
             "raft_state": self.raft.state,
-            "locks": self.lock_data,
-            "dependencies": self.client_dependencies
-        })
+            "consistency": consistency,
+            "read_index": read_index,
+            "commit_index": self.raft.commit_index,
+            "version": self.raft.last_applied
+        }
+        query = request.query
+        prefix = query.get("prefix")
+        client_id = query.get("client_id")
+
+        if "since" in query:
+            try:
+                since = int(query["since"])
+            except ValueError:
+                return web.json_response({"error": "since must be an integer version"}, status=400)
+            if since < self.changes_floor:
+                return web.json_response({
+                    **response,
+                    "error": "since is older than the retained change history, reload without since",
+                    "changes_floor": self.changes_floor
+                }, status=410)
+            changed, deleted = self.lock_changes_since(since)
+            if prefix:
+                changed = [resource_id for resource_id in changed if resource_id.startswith(prefix)]
+                deleted = [resource_id for resource_id in deleted if resource_id.startswith(prefix)]
+            if client_id:
+                changed = [resource_id for resource_id in changed
+                           if client_id in self.lock_data[resource_id].holders
+                           or client_id in self.lock_data[resource_id].queue]
+            response["since"] = since
+            response["changed"] = {resource_id: self.lock_data[resource_id].to_dict() for resource_id in changed}
+            response["deleted"] = deleted
+            return web.json_response(response)
+
+        # Kandidat: resource milik client (O(lock client)) atau seluruh table
+        if client_id:
+            deps = self.client_dependencies.get(client_id)
+            candidates = set(deps.holding) if deps else set()
+            if deps and deps.waiting_for is not None:
+                candidates.add(deps.waiting_for)
+        else:
+            candidates = self.lock_data.keys()
+        if prefix:
+            candidates = (resource_id for resource_id in candidates if resource_id.startswith(prefix))
+
+        if query.get("summary", "").lower() in ("1", "true", "yes"):
+            response["summary"] = self.lock_summary(candidates)
+            return web.json_response(response)
+
+        try:
+            limit = min(int(query.get("limit", LOCK_PAGE_DEFAULT)), LOCK_PAGE_MAX)
+        except ValueError:
+            return web.json_response({"error": "limit must be an integer"}, status=400)
+        if limit <= 0:
+            return web.json_response({"error": "limit must be positive"}, status=400)
+
+        # Halaman berurutan menurut resource_id; cursor = resource_id terakhir halaman sebelumnya.
+        # nsmallest(limit + 1) menghindari sort seluruh table untuk satu halaman.
+        cursor = query.get("cursor")
+        if cursor:
+            candidates = (resource_id for resource_id in candidates if resource_id > cursor)
+        page = heapq.nsmallest(limit + 1, candidates)
+        next_cursor = page[limit - 1] if len(page) > limit else None
+        page = page[:limit]
+
+        locks = {resource_id: self.lock_data[resource_id].to_dict() for resource_id in page}
+        clients = set()
+        for lock_info in locks.values():
+            clients.update(lock_info["holders"])
+            clients.update(lock_info["queue"])
+        response["locks"] = locks
+        response["dependencies"] = {c: self.client_dependencies[c].to_dict()
+                                    for c in sorted(clients) if c in self.client_dependencies}
+        response["next_cursor"] = next_cursor
+        return web.json_response(response)
+
+    def lock_changes_since(self, since: int):
+        """Resource yang berubah / terhapus setelah versi 'since' (dibaca dari ujung OrderedDict)."""
+        changed = []
+        for resource_id in reversed(self.resource_versions):
+            if self.resource_versions[resource_id] <= since:
+                break
+            changed.append(resource_id)
+        deleted = []
+        for resource_id in reversed(self.resource_tombstones):
+            if self.resource_tombstones[resource_id] <= since:
+                break
+            deleted.append(resource_id)
+        changed.reverse()
+        deleted.reverse()
+        return changed, deleted
+
+    def lock_summary(self, resource_ids) -> dict:
+        """
+        Ringkasan hitungan (tanpa isi lock) untuk sekumpulan resource;
+        'clients' = client berbeda yang memegang / menunggu resource itu.
+        """
+        summary = {"resources": 0, "exclusive": 0, "shared": 0, "holders": 0, "waiters": 0, "leases": 0}
+        clients = set()
+        for resource_id in resource_ids:
+            lock_info = self.lock_data.get(resource_id)
+            if lock_info is None:
+                continue
+            summary["resources"] += 1
+            if lock_info.holders:
+                summary[lock_info.type] += 1
+            summary["holders"] += len(lock_info.holders)
+            summary["waiters"] += len(lock_info.queue)
+            if lock_info.leases:
+                summary["leases"] += len(lock_info.leases)
+            clients.update(lock_info.holders)
+            clients.update(lock_info.queue)
+        summary["clients"] = len(clients)
+        return summary
+
+    async def handle_raft_status(self, request: web.Request):
+        """
+        Handler for GET /raft/status - Raft state, log positions and storage metrics
+        """
+        status = {
+            "node_id": self.node_id,
+            "raft_state": self.raft.state,
+            "current_term": self.raft.current_term,
+            "voted_for": self.raft.voted_for,
+            "leader_id": self.raft.leader_id,
+            "lease_valid": self.raft.lease_valid(),
+            "transfer_target": self.raft.transfer_target,
+            "timing": self.raft.timing_stats(),
+            "last_log_index": self.raft.last_log_index(),
+            "snapshot_index": self.raft.snapshot_index,
+            "commit_index": self.raft.commit_index,
+            "last_applied": self.raft.last_applied,
+            "storage": self.raft.storage.get_stats() if self.raft.storage else None,
+            "deadlock": {
+                "mode": DEADLOCK_DETECTION,
+                "victim_policy": DEADLOCK_VICTIM,
+                "waiters": len(self.wait_for_graph.out_edges),
+                "edges": self.wait_for_graph.edge_count()
+            }
+        }
+        if self.raft.state == 'leader':
+            status["match_index"] = self.raft.match_index
+            status["next_index"] = self.raft.next_index
+            status["replication"] = self.raft.replication_stats()
+        return web.json_response(status)
 
     async def handle_root(self, request: web.Request):
         """
@@ -320,15 +1301,58 @@ class LockManagerNode:
                 "lock_management": [
                     "POST /acquire - Acquire lock",
                     "POST /release - Release lock", 
-                    "GET /locks - Show lock status"
+                    "POST /acquire-batch - Acquire many locks, all-or-nothing",
+                    "POST /release-batch - Release many locks",
+                    "POST /renew - Extend a lock lease (acquire with ttl)",
+                    "GET /events?resource_id=&client_id= - Server-Sent Events stream of lock grants/releases",
+                    "GET /locks?consistency=linearizable|lease|stale&prefix=&client_id=&limit=&cursor=&summary=&since= - Show lock status",
+                    "GET /raft/status - Raft state and storage metrics",
+                    "POST /raft/transfer-leadership - Hand leadership to another node (TimeoutNow)",
+                    "GET /raft/members - Cluster configuration (voters and learners)",
+                    "POST /raft/members/add - Add a node as a non-voting learner",
+                    "POST /raft/members/promote - Promote a caught-up learner to voter",
+                    "POST /raft/members/remove - Remove a voter or learner"
                 ],
                 "raft_internal": [
                     "POST /request-vote - Raft RPC",
-                    "POST /append-entries - Raft RPC"
+                    "POST /append-entries - Raft RPC",
+                    "POST /install-snapshot - Raft RPC",
+                    "POST /timeout-now - Raft RPC (leadership transfer)",
+                    "POST /read-index - ReadIndex for follower reads"
                 ]
             }
         })
 
+    # --- RPC Raft internal (dipakai endpoint HTTP dan transport biner) ---
+
+    async def rpc_request_vote(self, data: dict) -> dict:
+        return self.raft.receive_request_vote(data)
+
+    async def rpc_append_entries(self, data: dict) -> dict:
+        return await self.raft.receive_append_entries(data)
+
+    async def rpc_install_snapshot(self, data: dict) -> dict:
+        return await self.raft.receive_install_snapshot(data)
+
+    async def rpc_timeout_now(self, data: dict) -> dict:
+        return self.raft.receive_timeout_now(data)
+
+    async def rpc_read_index(self, data: dict) -> dict:
+        read_index = await self.raft.read_index(use_lease=data.get("mode") == "lease")
+        return {
+            "term": self.raft.current_term,
+            "read_index": read_index,
+            "leader_id": self.raft.leader_id
+        }
+
+    def register_rpc_routes(self, server: BinaryRpcServer):
+        """Daftarkan RPC Raft node ini (dengan prefix group) ke server RPC biner."""
+        server.add_route(f"{self.group_prefix}/request-vote", self.rpc_request_vote)
+        server.add_route(f"{self.group_prefix}/append-entries", self.rpc_append_entries)
+        server.add_route(f"{self.group_prefix}/install-snapshot", self.rpc_install_snapshot)
+        server.add_route(f"{self.group_prefix}/timeout-now", self.rpc_timeout_now)
+        server.add_route(f"{self.group_prefix}/read-index", self.rpc_read_index)
+
     # --- Endpoint Server (Menerima Pesan) ---
 
     async def handle_request_vote(self, request: web.Request):
@@ -337,66 +1361,129 @@ class LockManagerNode:
         Dipanggil saat Candidate meminta suara kita.
         """
         data = await request.json()
-        candidate_term = data.get('term')
-        candidate_id = data.get('candidate_id')
-        
-        vote_granted = False
-        
-        # 1. Cek apakah term si candidate lebih baru dari kita
-        if candidate_term > self.raft.current_term:
-            # Jika ya, kita otomatis 'step_down' dan update term
-            self.raft.step_down(candidate_term)
-
-        # 2. Logika memberi suara
-        if (candidate_term == self.raft.current_term) and \
-           (self.raft.voted_for is None or self.raft.voted_for == candidate_id):
-            # Jika term-nya sama DAN kita belum vote (atau kita vote dia lagi)
-            vote_granted = True
-            self.raft.voted_for = candidate_id
-            self.raft.reset_election_timer() # Kita reset timer kita karena kita berpartisipasi
-            log.info(f"[{self.node_id}] Memberi suara YA untuk {candidate_id} di Term {self.raft.current_term}")
-        
-        return web.json_response({
-            "term": self.raft.current_term,
-            "vote_granted": vote_granted
-        })
+        return web.json_response(await self.rpc_request_vote(data))
 
     async def handle_append_entries(self, request: web.Request):
         """
         Handler untuk endpoint POST /append-entries.
-        Ini adalah "heartbeat" dari Leader.
+        Ini adalah "heartbeat" dari Leader, sekaligus pembawa entry log baru.
         """
         data = await request.json()
-        leader_term = data.get('term')
-        
-        if leader_term < self.raft.current_term:
-            # Jika ada Leader 'abal-abal' dari term lama, tolak
-            return web.json_response({"term": self.raft.current_term, "success": False})
+        return web.json_response(await self.rpc_append_entries(data))
 
-        # Jika kita menerima heartbeat, berarti Leader-nya sah.
-        # Kita reset "jam pasir" kita.
-        self.raft.reset_election_timer()
-        
-        if leader_term > self.raft.current_term:
-            # Jika term Leader lebih baru, kita akui dia
-            self.raft.step_down(leader_term)
-        
-        # Pastikan kita adalah follower
-        if self.state == 'candidate':
-            self.raft.step_down(leader_term)
-        elif self.state == 'leader':
-            # Ini aneh, ada 2 leader. Kita 'step_down'.
-            self.raft.step_down(leader_term)
-        
-        # log.info(f"[{self.node_id}] Heartbeat diterima dari {data.get('leader_id')}")
-        
-        return web.json_response({"term": self.raft.current_term, "success": True})
+    async def handle_timeout_now(self, request: web.Request):
+        """
+        Handler untuk endpoint POST /timeout-now.
+        Leader yang sedang menyerahkan kepemimpinan meminta kita langsung election.
+        """
+        data = await request.json()
+        return web.json_response(await self.rpc_timeout_now(data))
+
+    async def handle_transfer_leadership(self, request: web.Request):
+        """
+        Handler for POST /raft/transfer-leadership - planned leader handoff (e.g. before a restart)
+        Body: {"target": "node_id"} (optional, default: most up-to-date follower)
+        """
+        try:
+            data = await request.json() if request.can_read_body else {}
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/raft/transfer-leadership', data)
+            result = await self.raft.transfer_leadership(data.get('target'))
+            return web.json_response(result)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_raft_members(self, request: web.Request):
+        """
+        Handler for GET /raft/members - current cluster configuration
+        """
+        return web.json_response({
+            "node_id": self.node_id,
+            "leader_id": self.raft.leader_id,
+            **self.raft.membership_stats()
+        })
+
+    async def handle_add_member(self, request: web.Request):
+        """
+        Handler for POST /raft/members/add - add a node as a learner (replicated, non-voting)
+        Body: {"node_id": "node4", "url": "http://node4:8000"} (url optional, default http://<node_id>:<port>)
+        """
+        try:
+            data = await request.json()
+            node_id = data.get('node_id')
+            if not node_id:
+                return web.json_response({"error": "node_id required"}, status=400)
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/raft/members/add', data)
+            url = data.get('url') or f"http://{node_id}:{self.port}{self.group_prefix}"
+            return web.json_response(await self.raft.add_learner(node_id, url))
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_promote_member(self, request: web.Request):
+        """
+        Handler for POST /raft/members/promote - make a learner a voter once it has caught up
+        Body: {"node_id": "node4", "timeout": 60 (optional, seconds to wait for catch-up)}
+        """
+        try:
+            data = await request.json()
+            node_id = data.get('node_id')
+            if not node_id:
+                return web.json_response({"error": "node_id required"}, status=400)
+            timeout = float(data.get('timeout', MEMBER_PROMOTE_TIMEOUT))
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/raft/members/promote', data, timeout=timeout + READ_TIMEOUT)
+            return web.json_response(await self.raft.promote_learner(node_id, timeout))
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_remove_member(self, request: web.Request):
+        """
+        Handler for POST /raft/members/remove - remove a voter or learner
+        Body: {"node_id": "node4"}
+        """
+        try:
+            data = await request.json()
+            node_id = data.get('node_id')
+            if not node_id:
+                return web.json_response({"error": "node_id required"}, status=400)
+            if self.raft.state != 'leader':
+                return await self.forward_to_leader('/raft/members/remove', data)
+            return web.json_response(await self.raft.remove_member(node_id))
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_install_snapshot(self, request: web.Request):
+        """
+        Handler untuk endpoint POST /install-snapshot.
+        Leader mengirim snapshot lock table per chunk ke follower yang tertinggal.
+        """
+        data = await request.json()
+        return web.json_response(await self.rpc_install_snapshot(data))
 
     # --- Menjalankan Server ---
     
-    async def run_server(self):
+    async def on_startup(self, app: web.Application):
+        """Hook startup aiohttp: buka pool koneksi keluar."""
+        await self.transport.start()
+
+    async def on_cleanup(self, app: web.Application):
+        """Hook shutdown aiohttp: tutup pool koneksi keluar dan flush WAL."""
+        if self.deadlock_task is not None:
+            self.deadlock_task.cancel()
+        if self.lease_task is not None:
+            self.lease_task.cancel()
+        if self.rpc_server is not None:
+            await self.rpc_server.close()
+        if self.owns_transport:
+            await self.transport.close()
+        if self.raft.storage is not None:
+            self.raft.storage.close()
+    
+    def build_app(self) -> web.Application:
         """
-        Menginisialisasi dan menjalankan server HTTP aiohttp.
+        Membuat aplikasi aiohttp berisi semua endpoint node ini
+        (dipasang di root, atau sebagai sub-app /groups/<id> oleh router).
         """
         app = web.Application()
         
@@ -406,11 +1493,44 @@ class LockManagerNode:
         # Lock Management API
         app.router.add_post('/acquire', self.handle_acquire_lock)
         app.router.add_post('/release', self.handle_release_lock)
+        app.router.add_post('/acquire-batch', self.handle_acquire_batch)
+        app.router.add_post('/release-batch', self.handle_release_batch)
+        app.router.add_post('/renew', self.handle_renew_lock)
         app.router.add_get('/locks', self.handle_lock_status)
+        app.router.add_get('/events', self.handle_lock_events)
+        app.router.add_get('/raft/status', self.handle_raft_status)
+        app.router.add_post('/raft/transfer-leadership', self.handle_transfer_leadership)
+        app.router.add_get('/raft/members', self.handle_raft_members)
+        app.router.add_post('/raft/members/add', self.handle_add_member)
+        app.router.add_post('/raft/members/promote', self.handle_promote_member)
+        app.router.add_post('/raft/members/remove', self.handle_remove_member)
         
         # Raft RPC endpoints (internal)
         app.router.add_post('/request-vote', self.handle_request_vote)
         app.router.add_post('/append-entries', self.handle_append_entries)
+        app.router.add_post('/install-snapshot', self.handle_install_snapshot)
+        app.router.add_post('/timeout-now', self.handle_timeout_now)
+        app.router.add_post('/read-index', self.handle_read_index)
+        
+        # Hook siklus hidup transport
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+    def start_background_tasks(self):
+        """Mulai timer election dan loop latar belakang (setelah server menerima koneksi)."""
+        # MULAI "JAM PASIR" PERTAMA KALI
+        self.raft.reset_election_timer()
+        
+        if DEADLOCK_DETECTION == "periodic":
+            self.deadlock_task = asyncio.create_task(self.deadlock_detector_loop())
+        self.lease_task = asyncio.create_task(self.lease_reaper_loop())
+    
+    async def run_server(self):
+        """
+        Menginisialisasi dan menjalankan server HTTP aiohttp.
+        """
+        app = self.build_app()
         
         # --- UBAH BARIS INI ---
         # Matikan access log aiohttp yang berisik
@@ -421,12 +1541,19 @@ class LockManagerNode:
         site = web.TCPSite(runner, self.host, self.port)
         await site.start()
         
+        if RPC_BINARY:
+            self.rpc_server = BinaryRpcServer(self.host, self.port, advertise_host=self.node_id)
+            self.register_rpc_routes(self.rpc_server)
+            await self.rpc_server.start()
+        
         log.info(f"======= Node {self.node_id} aktif di http://{self.host}:{self.port} (State: {self.raft.state}) =======")
         
-        # MULAI "JAM PASIR" PERTAMA KALI
-        self.raft.reset_election_timer()
+        self.start_background_tasks()
         
-        await asyncio.Event().wait()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
     # --- Properti untuk akses mudah ke state Raft ---
     @property
@@ -460,14 +1587,25 @@ if __name__ == "__main__":
     # Host harus 0.0.0.0 untuk Docker agar bisa menerima koneksi dari luar container
     HOST = "0.0.0.0" 
     
-    # Buat instance node dengan konfigurasi dari environment
-    node = LockManagerNode(
-        host=HOST, 
-        port=PORT, 
-        node_id=NODE_ID, 
-        peer_names=other_peer_names, 
-        peer_port=PORT  # Asumsi semua peer ada di port yang sama
-    )
+    # Buat instance node dengan konfigurasi dari environment.
+    # LOCK_GROUPS > 1: keyspace dibagi ke beberapa Raft group (Multi-Raft) di balik router
+    if int(os.environ.get("LOCK_GROUPS", 1)) > 1:
+        from src.nodes.lock_router import LockRouter
+        node = LockRouter(
+            host=HOST,
+            port=PORT,
+            node_id=NODE_ID,
+            peer_names=other_peer_names,
+            peer_port=PORT
+        )
+    else:
+        node = LockManagerNode(
+            host=HOST, 
+            port=PORT, 
+            node_id=NODE_ID, 
+            peer_names=other_peer_names, 
+            peer_port=PORT  # Asumsi semua peer ada di port yang sama
+        )
     
     try:
         asyncio.run(node.run_server())
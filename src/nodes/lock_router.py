@@ -0,0 +1,417 @@
+# src/nodes/lock_router.py
+
+import asyncio
+import logging
+import os
+import time
+from aiohttp import web
+
+from src.communication.message_passing import NodeTransport
+from src.communication.binary_rpc import RPC_BINARY, BinaryRpcServer
+from src.nodes.lock_manager import LockManagerNode
+from src.utils.hashing import ConsistentHashRing
+
+log = logging.getLogger(__name__)
+
+# Jumlah Raft group independen yang membagi keyspace resource (di setiap node)
+LOCK_GROUPS = int(os.environ.get("LOCK_GROUPS", 1))
+
+# Virtual node per group di hash ring; makin banyak makin merata pembagiannya
+LOCK_RING_REPLICAS = int(os.environ.get("LOCK_RING_REPLICAS", 64))
+
+# Jendela penggabungan heartbeat lintas group ke node yang sama (detik)
+HEARTBEAT_COALESCE_WINDOW = float(os.environ.get("LOCK_HEARTBEAT_COALESCE_MS", 10)) / 1000.0
+
+# Seberapa sering router memindahkan Leader group ke node pilihannya (detik)
+LEADER_BALANCE_INTERVAL = float(os.environ.get("LOCK_LEADER_BALANCE_INTERVAL", 5.0))
+
+
+def hash_key(resource_id: str) -> str:
+    """
+    Bagian resource_id yang di-hash. Hash tag ala Redis Cluster: jika ada
+    "{...}" tidak kosong, hanya isinya yang dipakai, sehingga "{order42}:a" dan
+    "{order42}:b" selalu berada di group yang sama (bisa di-batch atomik).
+    """
+    start = resource_id.find("{")
+    if start != -1:
+        end = resource_id.find("}", start + 1)
+        if end > start + 1:
+            return resource_id[start + 1:end]
+    return resource_id
+
+
+class HeartbeatCoalescer:
+    """
+    Menggabungkan heartbeat (AppendEntries tanpa entry) dari banyak Raft group
+    ke node tujuan yang sama menjadi satu POST /raft/heartbeats per jendela.
+    Heartbeat group yang ikut satu flush punya waktu kirim yang sama, sehingga
+    heartbeat berikutnya cenderung jatuh di jendela yang sama lagi.
+
+    Heartbeat 'urgent' (konfirmasi kepemimpinan untuk ReadIndex) tidak menunggu
+    jendela: batch yang sedang terkumpul langsung dikirim bersamanya.
+    """
+
+    def __init__(self, transport: NodeTransport, window: float = HEARTBEAT_COALESCE_WINDOW):
+        self.transport = transport
+        self.window = window
+        # base_url node tujuan -> [(group_id, payload, Future balasan), ...]
+        self.pending = {}
+
+    async def send(self, base_url: str, group_id: int, payload: dict, urgent: bool = False):
+        """
+        Titipkan satu heartbeat; mengembalikan (balasan group tujuan atau None
+        jika gagal, waktu monotonic batch-nya benar-benar dikirim).
+        """
+        batch = self.pending.get(base_url)
+        if batch is None:
+            batch = self.pending[base_url] = []
+            if not urgent:
+                asyncio.create_task(self.flush_later(base_url, batch))
+        future = asyncio.get_running_loop().create_future()
+        batch.append((group_id, payload, future))
+        if urgent:
+            del self.pending[base_url]
+            asyncio.create_task(self.flush(base_url, batch))
+        return await future
+
+    async def flush_later(self, base_url: str, batch: list):
+        await asyncio.sleep(self.window)
+        # Batch ini bisa sudah dikirim lebih awal oleh heartbeat urgent
+        if self.pending.get(base_url) is batch:
+            del self.pending[base_url]
+            await self.flush(base_url, batch)
+
+    async def flush(self, base_url: str, batch: list):
+        sent_at = time.monotonic()
+        try:
+            response = await self.transport.send_message(f"{base_url}/raft/heartbeats", {
+                "heartbeats": [{"group_id": group_id, "payload": payload} for group_id, payload, _ in batch]
+            })
+        except Exception as e:
+            log.error(f"Error mengirim heartbeat gabungan ke {base_url}: {e}")
+            response = None
+        responses = (response or {}).get("responses") or []
+        for position, (_, _, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((responses[position] if position < len(responses) else None, sent_at))
+
+
+class LockRouter:
+    """
+    Multi-Raft: keyspace resource dibagi (ConsistentHashRing) ke LOCK_GROUPS
+    Raft group yang semuanya di-host oleh set node yang sama. Setiap group
+    adalah LockManagerNode penuh (lock table, log, snapshot, Leader sendiri)
+    yang dipasang di /groups/<id>; router meneruskan /acquire, /release, dst.
+    ke group pemilik resource_id, dan group itu meneruskan ke Leader-nya.
+
+    Leader group disebar: group g lebih suka dipimpin voter ke-(g mod n), dan
+    router memindahkannya ke sana lewat leadership transfer.
+    """
+
+    def __init__(self, host: str, port: int, node_id: str, peer_names: list, peer_port: int,
+                 groups: int = LOCK_GROUPS):
+        self.host = host
+        self.port = port
+        self.node_id = node_id
+
+        # Satu pool koneksi untuk semua group
+        self.transport = NodeTransport()
+        self.heartbeat_coalescer = HeartbeatCoalescer(self.transport)
+
+        self.groups = []
+        for group_id in range(groups):
+            group = LockManagerNode(host, port, node_id, peer_names, peer_port,
+                                    group_id=group_id, transport=self.transport)
+            group.heartbeat_coalescer = self.heartbeat_coalescer
+            self.groups.append(group)
+
+        self.hash_ring = ConsistentHashRing(replicas=LOCK_RING_REPLICAS)
+        for group_id in range(groups):
+            self.hash_ring.add_node(str(group_id))
+
+        self.balance_task = None
+        self.rpc_server = None
+
+    # --- Routing ---
+
+    def group_for(self, resource_id: str) -> LockManagerNode:
+        return self.groups[int(self.hash_ring.get_node(hash_key(resource_id)))]
+
+    def group_from_query(self, request: web.Request):
+        """Group dari ?group=<id> atau ?resource_id=<id>, atau None."""
+        group_id = request.query.get("group")
+        if group_id is not None:
+            if group_id.isdigit() and int(group_id) < len(self.groups):
+                return self.groups[int(group_id)]
+            return None
+        resource_id = request.query.get("resource_id")
+        if resource_id:
+            return self.group_for(resource_id)
+        return None
+
+    async def read_json(self, request: web.Request) -> dict:
+        # Body di-cache aiohttp, handler group masih bisa membacanya lagi
+        try:
+            data = await request.json()
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    async def route_by_resource(self, request: web.Request, handler_name: str):
+        data = await self.read_json(request)
+        resource_id = data.get("resource_id")
+        group = self.group_for(resource_id) if isinstance(resource_id, str) and resource_id else self.groups[0]
+        return await getattr(group, handler_name)(request)
+
+    async def route_batch(self, request: web.Request, resource_ids: list, handler_name: str):
+        """Batch hanya atomik di dalam satu group; batch lintas group ditolak."""
+        owners = {
+            resource_id: self.group_for(resource_id).group_id
+            for resource_id in resource_ids if isinstance(resource_id, str) and resource_id
+        }
+        if len(set(owners.values())) > 1:
+            return web.json_response({
+                "error": "resources span multiple lock groups; give them a common {hash tag} to batch them",
+                "groups": owners
+            }, status=400)
+        group = self.groups[next(iter(owners.values()))] if owners else self.groups[0]
+        return await getattr(group, handler_name)(request)
+
+    def preferred_leader(self, group: LockManagerNode):
+        voters = sorted(group.raft.config["voters"])
+        return voters[group.group_id % len(voters)] if voters else None
+
+    # --- Endpoint Router ---
+
+    async def handle_acquire_lock(self, request: web.Request):
+        """
+        Handler for POST /acquire - routed to the group owning resource_id
+        """
+        return await self.route_by_resource(request, "handle_acquire_lock")
+
+    async def handle_release_lock(self, request: web.Request):
+        """
+        Handler for POST /release - routed to the group owning resource_id
+        """
+        return await self.route_by_resource(request, "handle_release_lock")
+
+    async def handle_renew_lock(self, request: web.Request):
+        """
+        Handler for POST /renew - routed to the group owning resource_id
+        """
+        return await self.route_by_resource(request, "handle_renew_lock")
+
+    async def handle_acquire_batch(self, request: web.Request):
+        """
+        Handler for POST /acquire-batch - all resources must live in one group
+        """
+        data = await self.read_json(request)
+        resources = data.get("resources")
+        resource_ids = [item.get("resource_id") for item in resources if isinstance(item, dict)] \
+            if isinstance(resources, list) else []
+        return await self.route_batch(request, resource_ids, "handle_acquire_batch")
+
+    async def handle_release_batch(self, request: web.Request):
+        """
+        Handler for POST /release-batch - all resources must live in one group
+        """
+        data = await self.read_json(request)
+        resource_ids = data.get("resource_ids")
+        return await self.route_batch(request, resource_ids if isinstance(resource_ids, list) else [],
+                                      "handle_release_batch")
+
+    async def handle_lock_status(self, request: web.Request):
+        """
+        Handler for GET /locks?group=<id> or ?resource_id=<id> - lock status of one group
+        """
+        group = self.group_from_query(request)
+        if group is None:
+            return web.json_response({
+                "error": f"specify group=<0..{len(self.groups) - 1}> or resource_id=<id>",
+                "groups": len(self.groups)
+            }, status=400)
+        return await group.handle_lock_status(request)
+
+    async def handle_lock_events(self, request: web.Request):
+        """
+        Handler for GET /events?group=<id> or ?resource_id=<id> - SSE stream of one group
+        """
+        group = self.group_from_query(request)
+        if group is None:
+            return web.json_response({
+                "error": f"specify group=<0..{len(self.groups) - 1}> or resource_id=<id>",
+                "groups": len(self.groups)
+            }, status=400)
+        return await group.handle_lock_events(request)
+
+    async def handle_groups(self, request: web.Request):
+        """
+        Handler for GET /groups - routing table (group leaders) for smart clients
+        """
+        groups = {}
+        for group in self.groups:
+            leader_id = group.raft.leader_id
+            leader_url = group.node_url if leader_id == self.node_id else group.peer_list.get(leader_id)
+            groups[group.group_id] = {
+                "leader_id": leader_id,
+                "leader_url": leader_url,
+                "preferred_leader": self.preferred_leader(group)
+            }
+        return web.json_response({
+            "node_id": self.node_id,
+            "ring_replicas": LOCK_RING_REPLICAS,
+            "groups": groups
+        })
+
+    async def handle_raft_status(self, request: web.Request):
+        """
+        Handler for GET /raft/status - summary of every Raft group on this node
+        (full status per group at /groups/<id>/raft/status)
+        """
+        groups = {}
+        for group in self.groups:
+            raft = group.raft
+            groups[group.group_id] = {
+                "raft_state": raft.state,
+                "current_term": raft.current_term,
+                "leader_id": raft.leader_id,
+                "preferred_leader": self.preferred_leader(group),
+                "commit_index": raft.commit_index,
+                "last_applied": raft.last_applied,
+                "locks": len(group.lock_data)
+            }
+        return web.json_response({
+            "node_id": self.node_id,
+            "leaders_here": sum(1 for group in self.groups if group.raft.state == 'leader'),
+            "groups": groups
+        })
+
+    async def handle_heartbeats(self, request: web.Request):
+        """
+        Handler untuk endpoint POST /raft/heartbeats (internal).
+        Heartbeat gabungan dari satu node untuk banyak group; balasan urut sesuai request.
+        Body: {"heartbeats": [{"group_id": 0, "payload": {...AppendEntries...}}, ...]}
+        """
+        data = await request.json()
+        return web.json_response(await self.rpc_heartbeats(data))
+
+    async def rpc_heartbeats(self, data: dict) -> dict:
+        async def deliver(item):
+            group_id = item.get("group_id")
+            if not isinstance(group_id, int) or not 0 <= group_id < len(self.groups):
+                return None
+            return await self.groups[group_id].raft.receive_append_entries(item["payload"])
+
+        responses = await asyncio.gather(*(deliver(item) for item in data.get("heartbeats", [])))
+        return {"responses": responses}
+
+    async def handle_root(self, request: web.Request):
+        """
+        Handler for GET / - Root endpoint
+        """
+        return web.json_response({
+            "service": "Distributed Lock Manager (Multi-Raft)",
+            "node_id": self.node_id,
+            "groups": len(self.groups),
+            "endpoints": {
+                "lock_management": [
+                    "POST /acquire, /release, /renew - Routed to the group owning resource_id",
+                    "POST /acquire-batch, /release-batch - Resources must share one group ({hash tag})",
+                    "GET /locks?group=|resource_id= - Lock status of one group",
+                    "GET /events?group=|resource_id= - SSE stream of one group",
+                    "GET /groups - Group leaders (routing table)",
+                    "GET /raft/status - Summary of all groups on this node",
+                    "* /groups/<id>/... - Full single-group API (members, transfer-leadership, ...)"
+                ],
+                "raft_internal": [
+                    "POST /raft/heartbeats - Coalesced heartbeats for many groups",
+                    "POST /groups/<id>/request-vote, /append-entries, ... - Per-group Raft RPC"
+                ]
+            }
+        })
+
+    # --- Penyebaran Leader ---
+
+    async def leader_balance_loop(self):
+        """
+        Pindahkan Leader setiap group ke node pilihannya (voter ke-(g mod n)),
+        agar beban Leader tersebar. Hanya jika node itu hidup dan sudah mengejar log.
+        """
+        while True:
+            await asyncio.sleep(LEADER_BALANCE_INTERVAL)
+            for group in self.groups:
+                raft = group.raft
+                if raft.state != 'leader' or raft.transfer_target is not None:
+                    continue
+                target = self.preferred_leader(group)
+                if target is None or target == self.node_id:
+                    continue
+                now = time.monotonic()
+                if now - raft.leader_since < LEADER_BALANCE_INTERVAL or \
+                   now - raft.peer_ack_at.get(target, 0.0) > raft.election_timeout_min or \
+                   raft.match_index.get(target, 0) < raft.commit_index:
+                    continue
+                try:
+                    result = await raft.transfer_leadership(target)
+                    log.info(f"[{self.node_id}] Group {group.group_id}: Leader dipindah ke {target}: {result.get('message')}")
+                except Exception as e:
+                    log.error(f"[{self.node_id}] Group {group.group_id}: gagal memindah Leader ke {target}: {e}")
+
+    # --- Menjalankan Server ---
+
+    async def on_cleanup(self, app: web.Application):
+        """Hook shutdown aiohttp: hentikan balancer dan tutup pool koneksi bersama."""
+        if self.balance_task is not None:
+            self.balance_task.cancel()
+        if self.rpc_server is not None:
+            await self.rpc_server.close()
+        await self.transport.close()
+
+    async def run_server(self):
+        """
+        Menjalankan router beserta semua Raft group dalam satu server aiohttp.
+        """
+        app = web.Application()
+
+        app.router.add_get('/', self.handle_root)
+        app.router.add_post('/acquire', self.handle_acquire_lock)
+        app.router.add_post('/release', self.handle_release_lock)
+        app.router.add_post('/renew', self.handle_renew_lock)
+        app.router.add_post('/acquire-batch', self.handle_acquire_batch)
+        app.router.add_post('/release-batch', self.handle_release_batch)
+        app.router.add_get('/locks', self.handle_lock_status)
+        app.router.add_get('/events', self.handle_lock_events)
+        app.router.add_get('/groups', self.handle_groups)
+        app.router.add_get('/raft/status', self.handle_raft_status)
+        app.router.add_post('/raft/heartbeats', self.handle_heartbeats)
+
+        # Setiap group dengan API lengkapnya sendiri di /groups/<id>
+        for group in self.groups:
+            app.add_subapp(group.group_prefix, group.build_app())
+
+        app.on_cleanup.append(self.on_cleanup)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+
+        if RPC_BINARY:
+            # Satu server biner untuk semua group (path ber-prefix /groups/<id>)
+            self.rpc_server = BinaryRpcServer(self.host, self.port, advertise_host=self.node_id)
+            self.rpc_server.add_route('/raft/heartbeats', self.rpc_heartbeats)
+            for group in self.groups:
+                group.register_rpc_routes(self.rpc_server)
+            await self.rpc_server.start()
+
+        log.info(f"======= Node {self.node_id} aktif di http://{self.host}:{self.port} "
+                 f"({len(self.groups)} Raft group) =======")
+
+        for group in self.groups:
+            group.start_background_tasks()
+        self.balance_task = asyncio.create_task(self.leader_balance_loop())
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
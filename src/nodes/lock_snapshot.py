@@ -0,0 +1,175 @@
+# src/nodes/lock_snapshot.py
+
+# Format biner snapshot lock table (semua angka integer memakai varint):
+#
+#   magic "LKS" + versi (1 byte)
+#   tabel string : jumlah, lalu [panjang, utf-8] untuk setiap resource/client id
+#   resources    : jumlah, lalu [id, tipe, jumlah holder, [holder, lease]..., jumlah antrean, [waiter, tipe, lease]...]
+#   lease        : 0 = tanpa lease, selain itu ttl_ms+1 lalu expires_at_ms (epoch)
+#   clients      : jumlah, lalu [id, waiting_for (0 = None, selain itu id+1), jumlah holding, holding...]
+#
+# Setiap id di-intern sekali di tabel string, sehingga client yang memegang
+# ribuan resource hanya menulis namanya satu kali.
+#
+# Versi lama masih bisa dibaca: versi 1 (antrean tanpa tipe per waiter,
+# dianggap "exclusive") dan versi 2 (tanpa lease).
+
+from src.nodes.lock_table import LockRecord, ClientRecord
+
+MAGIC = b"LKS"
+VERSION = 3
+
+LOCK_TYPES = [None, "shared", "exclusive"]
+LOCK_TYPE_CODES = {lock_type: code for code, lock_type in enumerate(LOCK_TYPES)}
+
+
+def write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, offset: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def write_lease(out: bytearray, lease):
+    if lease is None:
+        out.append(0)
+        return
+    ttl, expires_at = lease
+    write_varint(out, round(ttl * 1000) + 1)
+    write_varint(out, round(expires_at * 1000))
+
+
+def read_lease(data: bytes, offset: int):
+    ttl_code, offset = read_varint(data, offset)
+    if ttl_code == 0:
+        return None, offset
+    expires_ms, offset = read_varint(data, offset)
+    return ((ttl_code - 1) / 1000, expires_ms / 1000), offset
+
+
+def encode_lock_table(lock_data: dict, client_dependencies: dict) -> bytes:
+    """Serialisasi lock_data (LockRecord) + client_dependencies (ClientRecord) ke format biner ringkas."""
+    string_ids = {}
+    strings = []
+
+    def intern(value: str) -> int:
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = len(strings)
+            string_ids[value] = string_id
+            strings.append(value)
+        return string_id
+
+    body = bytearray()
+
+    write_varint(body, len(lock_data))
+    for resource_id, lock_info in lock_data.items():
+        write_varint(body, intern(resource_id))
+        body.append(LOCK_TYPE_CODES[lock_info.type])
+        write_varint(body, len(lock_info.holders))
+        for holder in lock_info.holders:
+            write_varint(body, intern(holder))
+            write_lease(body, lock_info.get_lease(holder))
+        write_varint(body, len(lock_info.queue))
+        for waiter, wanted in lock_info.queue.items():
+            write_varint(body, intern(waiter))
+            body.append(LOCK_TYPE_CODES[wanted])
+            write_lease(body, lock_info.get_lease(waiter))
+
+    write_varint(body, len(client_dependencies))
+    for client_id, deps in client_dependencies.items():
+        write_varint(body, intern(client_id))
+        waiting_for = deps.waiting_for
+        write_varint(body, 0 if waiting_for is None else intern(waiting_for) + 1)
+        write_varint(body, len(deps.holding))
+        for resource_id in deps.holding:
+            write_varint(body, intern(resource_id))
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    write_varint(out, len(strings))
+    for value in strings:
+        encoded = value.encode("utf-8")
+        write_varint(out, len(encoded))
+        out += encoded
+    out += body
+    return bytes(out)
+
+
+def decode_lock_table(data: bytes):
+    """Kebalikan dari encode_lock_table. Mengembalikan (lock_data, client_dependencies)."""
+    if data[:3] != MAGIC:
+        raise ValueError("Bukan snapshot lock table")
+    version = data[3]
+    if version not in (1, 2, VERSION):
+        raise ValueError(f"Versi snapshot tidak didukung: {version}")
+    offset = 4
+
+    count, offset = read_varint(data, offset)
+    strings = []
+    for _ in range(count):
+        length, offset = read_varint(data, offset)
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    def read_ids(offset):
+        count, offset = read_varint(data, offset)
+        ids = []
+        for _ in range(count):
+            string_id, offset = read_varint(data, offset)
+            ids.append(strings[string_id])
+        return ids, offset
+
+    lock_data = {}
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        string_id, offset = read_varint(data, offset)
+        lock_type = LOCK_TYPES[data[offset]]
+        offset += 1
+        record = LockRecord(lock_type)
+        count_holders, offset = read_varint(data, offset)
+        for _ in range(count_holders):
+            holder_id, offset = read_varint(data, offset)
+            record.holders.add(strings[holder_id])
+            if version >= 3:
+                lease, offset = read_lease(data, offset)
+                if lease is not None:
+                    record.set_lease(strings[holder_id], *lease)
+        count_waiters, offset = read_varint(data, offset)
+        for _ in range(count_waiters):
+            waiter_id, offset = read_varint(data, offset)
+            wanted = "exclusive"
+            if version >= 2:
+                wanted = LOCK_TYPES[data[offset]]
+                offset += 1
+            record.enqueue(strings[waiter_id], wanted)
+            if version >= 3:
+                lease, offset = read_lease(data, offset)
+                if lease is not None:
+                    record.set_lease(strings[waiter_id], *lease)
+        lock_data[strings[string_id]] = record
+
+    client_dependencies = {}
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        string_id, offset = read_varint(data, offset)
+        waiting_code, offset = read_varint(data, offset)
+        holding, offset = read_ids(offset)
+        record = ClientRecord()
+        record.waiting_for = None if waiting_code == 0 else strings[waiting_code - 1]
+        record.holding.update(holding)
+        client_dependencies[strings[string_id]] = record
+
+    return lock_data, client_dependencies
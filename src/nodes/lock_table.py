@@ -0,0 +1,91 @@
+# src/nodes/lock_table.py
+
+from collections import OrderedDict
+
+
+class LockRecord:
+    """
+    Satu entry lock table (per resource).
+
+    holders : set client_id  -> cek/hapus holder O(1)
+    queue   : OrderedDict client_id -> lock_type yang diminta, urutan FIFO;
+              popitem(last=False) dan hapus waiter di tengah antrean O(1)
+    waiting_writers : jumlah waiter "exclusive" di antrean (untuk kebijakan
+              writer-preference tanpa scan antrean)
+    leases  : None, atau dict client_id -> (ttl, expires_at) untuk holder/waiter
+              yang meminta TTL; dibuat saat lease pertama agar record tanpa
+              lease tetap kecil
+
+    __slots__ menghindari __dict__ per record; penting karena lock table bisa
+    berisi jutaan resource berumur pendek.
+    """
+    __slots__ = ("type", "holders", "queue", "waiting_writers", "leases")
+
+    def __init__(self, lock_type: str = None):
+        self.type = lock_type
+        self.holders = set()
+        self.queue = OrderedDict()
+        self.waiting_writers = 0
+        self.leases = None
+
+    def enqueue(self, client_id: str, lock_type: str):
+        self.queue[client_id] = lock_type
+        if lock_type == "exclusive":
+            self.waiting_writers += 1
+
+    def dequeue(self, client_id: str):
+        """Keluarkan waiter dari antrean; mengembalikan mode yang dimintanya (atau None)."""
+        lock_type = self.queue.pop(client_id, None)
+        if lock_type == "exclusive":
+            self.waiting_writers -= 1
+        if lock_type is not None:
+            self.clear_lease(client_id)
+        return lock_type
+
+    def set_lease(self, client_id: str, ttl: float, expires_at: float):
+        if self.leases is None:
+            self.leases = {}
+        self.leases[client_id] = (ttl, expires_at)
+
+    def get_lease(self, client_id: str):
+        """(ttl, expires_at) milik client, atau None jika tanpa lease."""
+        if self.leases is None:
+            return None
+        return self.leases.get(client_id)
+
+    def clear_lease(self, client_id: str):
+        if self.leases is not None:
+            self.leases.pop(client_id, None)
+            if not self.leases:
+                self.leases = None
+
+    def is_empty(self) -> bool:
+        return not self.holders and not self.queue
+
+    def to_dict(self) -> dict:
+        info = {
+            "type": self.type,
+            "holders": sorted(self.holders),
+            "queue": list(self.queue)
+        }
+        if self.leases:
+            info["leases"] = {client_id: expires_at for client_id, (_, expires_at) in self.leases.items()}
+        return info
+
+
+class ClientRecord:
+    """Dependency sebuah client: resource yang ditunggu dan yang sedang dipegang."""
+    __slots__ = ("waiting_for", "holding")
+
+    def __init__(self):
+        self.waiting_for = None
+        self.holding = set()
+
+    def is_empty(self) -> bool:
+        return self.waiting_for is None and not self.holding
+
+    def to_dict(self) -> dict:
+        return {
+            "waiting_for": self.waiting_for,
+            "holding": sorted(self.holding)
+        }
@@ -4,12 +4,15 @@ import os  # <-- TAMBAHKAN
 import logging
 import time
 import uuid
+from collections import deque
 from aiohttp import web
-import redis
+import redis.asyncio as aioredis
 
-from src.communication.message_passing import send_message
+from src.communication.message_passing import NodeTransport, RPC_TIMEOUT
+from src.communication.binary_rpc import RPC_BINARY, BinaryRpcServer
 # from src.algorithms.consistent_hashing import ConsistentHashRing
 from src.utils.hashing import ConsistentHashRing
+from src.utils.timer_wheel import TimerWheel
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
@@ -19,6 +22,120 @@ log = logging.getLogger(__name__)
 REDIS_HOST = os.environ.get("REDIS_HOST", "redis") # <-- UBAH INI
 REDIS_PORT = 6379
 
+# Ukuran pool koneksi Redis async yang dipakai bersama semua handler.
+# Jika semua koneksi terpakai, request menunggu (maks. REDIS_POOL_TIMEOUT detik).
+REDIS_POOL_SIZE = int(os.environ.get("REDIS_POOL_SIZE", 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", 5.0))
+
+# Batas jumlah pesan per /produce-batch dan per /consume?max=N
+QUEUE_MAX_BATCH = int(os.environ.get("QUEUE_MAX_BATCH", 1000))
+
+# Pesan yang belum di-ack dikembalikan ke queue setelah sekian detik
+# (default; bisa diatur per consume / per /extend lewat "visibility_timeout")
+QUEUE_VISIBILITY_TIMEOUT = float(os.environ.get("QUEUE_VISIBILITY_TIMEOUT", 60.0))
+QUEUE_MAX_VISIBILITY_TIMEOUT = float(os.environ.get("QUEUE_MAX_VISIBILITY_TIMEOUT", 12 * 3600))
+
+# Resolusi timer wheel visibility: pesan kedaluwarsa kembali paling lambat sekian detik setelah deadline
+QUEUE_VISIBILITY_TICK = float(os.environ.get("QUEUE_VISIBILITY_TICK", 0.1))
+
+# Seberapa sering timer wheel disinkronkan ulang dari Redis (restart node,
+# deadline yang dibuat node lain) (detik)
+QUEUE_REQUEUE_RESYNC = float(os.environ.get("QUEUE_REQUEUE_RESYNC", 30.0))
+
+# Jumlah pesan kedaluwarsa yang dikembalikan per eksekusi script requeue
+QUEUE_REQUEUE_BATCH = int(os.environ.get("QUEUE_REQUEUE_BATCH", 500))
+
+# Long polling /consume: batas wait_seconds. Consumer dibangunkan oleh push lewat
+# node ini; sebagai jaring pengaman (pesan dari writer eksternal) satu task per queue
+# mengecek LLEN, mulai tiap RECHECK detik dan melambat sampai RECHECK_MAX selama kosong.
+QUEUE_MAX_WAIT_SECONDS = float(os.environ.get("QUEUE_MAX_WAIT_SECONDS", 20.0))
+QUEUE_LONG_POLL_RECHECK = float(os.environ.get("QUEUE_LONG_POLL_RECHECK", 2.0))
+QUEUE_LONG_POLL_RECHECK_MAX = float(os.environ.get("QUEUE_LONG_POLL_RECHECK_MAX", 16.0))
+
+# --- Pesan in-flight di Redis (reliable queue) ---
+# inflight:deadlines:<queue>  ZSET  message_id -> deadline visibilitas (epoch detik)
+# inflight:messages:<queue>   HASH  message_id -> isi pesan
+# inflight:queues             SET   queue yang (mungkin) punya pesan in-flight
+# message_id berbentuk "<queue>:<uuid>" sehingga /ack bisa diarahkan ke node pemilik queue.
+INFLIGHT_PREFIX = "inflight:"
+INFLIGHT_QUEUES_KEY = "inflight:queues"
+
+# KEYS: queue, deadlines, messages, registry. ARGV: deadline, queue, message_id...
+# Pop dan pencatatan in-flight atomik: pesan tidak pernah hilang di antara keduanya.
+CONSUME_SCRIPT = """
+local popped = redis.call('LPOP', KEYS[1], #ARGV - 2)
+if not popped then
+    return {}
+end
+for i, message in ipairs(popped) do
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[i + 2])
+    redis.call('HSET', KEYS[3], ARGV[i + 2], message)
+end
+redis.call('SADD', KEYS[4], ARGV[2])
+return popped
+"""
+
+# KEYS: deadlines, messages. ARGV: message_id. Mengembalikan 1 jika pesan masih in-flight.
+ACK_SCRIPT = """
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return removed
+"""
+
+# KEYS: deadlines, messages, queue. ARGV: message_id.
+# Redelivery segera: pesan in-flight langsung kembali ke DEPAN queue.
+NACK_SCRIPT = """
+local message = redis.call('HGET', KEYS[2], ARGV[1])
+if not message or redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('LPUSH', KEYS[3], message)
+return 1
+"""
+
+# KEYS: queue, deadlines, messages, registry. ARGV: now, limit, queue.
+# Pesan kedaluwarsa kembali ke DEPAN queue, yang paling lama paling depan.
+# Mengembalikan {jumlah requeue, deadline berikutnya ("" jika tidak ada)}.
+REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for i = #expired, 1, -1 do
+    local message = redis.call('HGET', KEYS[3], expired[i])
+    if message then
+        redis.call('LPUSH', KEYS[1], message)
+    end
+end
+if #expired > 0 then
+    redis.call('ZREM', KEYS[2], unpack(expired))
+    redis.call('HDEL', KEYS[3], unpack(expired))
+end
+local next_deadline = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')[2]
+if not next_deadline then
+    redis.call('SREM', KEYS[4], ARGV[3])
+    next_deadline = ''
+end
+return {#expired, next_deadline}
+"""
+
+
+def inflight_keys(queue_name: str):
+    """Key ZSET deadline dan HASH isi pesan in-flight milik satu queue."""
+    return f"{INFLIGHT_PREFIX}deadlines:{queue_name}", f"{INFLIGHT_PREFIX}messages:{queue_name}"
+
+
+def queue_of(message_id: str) -> str:
+    """Nama queue dari message_id "<queue>:<uuid>" ("" jika formatnya tidak dikenal)."""
+    return message_id.rpartition(":")[0]
+
+
+def parse_visibility_timeout(value):
+    """visibility_timeout dari request (detik) -> float, atau None jika tidak valid."""
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return None
+    return timeout if 0 < timeout <= QUEUE_MAX_VISIBILITY_TIMEOUT else None
+
 class QueueNode:
     """
     Node untuk message queue dengan consistent hashing.
@@ -37,49 +154,225 @@ class QueueNode:
             if p_name != self.node_id:
                 self.peer_urls[p_name] = f"http://{p_name}:{peer_port}"
             
-        self.redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, db=0)
+        # Transport ber-pool untuk forward ke node yang bertanggung jawab
+        self.transport = NodeTransport()
+        self.rpc_server = None
+            
+        # Client Redis async bersama: round-trip Redis tidak lagi memblokir event loop
+        self.redis_pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOST, port=REDIS_PORT, db=0,
+            max_connections=REDIS_POOL_SIZE, timeout=REDIS_POOL_TIMEOUT
+        )
+        self.redis = aioredis.Redis(connection_pool=self.redis_pool)
+        self.consume_script = self.redis.register_script(CONSUME_SCRIPT)
+        self.ack_script = self.redis.register_script(ACK_SCRIPT)
+        self.requeue_script = self.redis.register_script(REQUEUE_SCRIPT)
+        self.nack_script = self.redis.register_script(NACK_SCRIPT)
         
         self.hash_ring = ConsistentHashRing(replicas=10)
         for n_id in self.all_nodes:
             self.hash_ring.add_node(n_id)
             
-        # Message acknowledgment tracking
-        # Format: {"message_id": {"queue": "queue_name", "message": "content", "consumer": "client_id", "timestamp": time}}
-        self.pending_acks = {}
+        # Timer wheel visibility: queue -> deadline in-flight paling awal yang diketahui.
+        # ZSET di Redis tetap sumber kebenaran; wheel hanya menentukan KAPAN dicek.
+        self.visibility_wheel = TimerWheel(now=time.time(), tick=QUEUE_VISIBILITY_TICK)
+        self.last_resync = 0.0
+        
+        # Long polling: queue -> deque Future consumer yang menunggu pesan (FIFO).
+        # Semua push ke queue lewat node pemiliknya, jadi notifikasi in-process cukup.
+        self.queue_waiters = {}
+        # queue -> task cek ulang bersama (jaring pengaman) selama ada consumer menunggu
+        self.queue_rechecks = {}
+        # queue -> nomor urut notifikasi push; consumer yang melihatnya berubah selama
+        # pop (belum sempat parkir) langsung mencoba lagi alih-alih kehilangan notifikasi
+        self.queue_push_seq = {}
         
-        # Cleanup task will be started in run_server()
-        self.cleanup_task = None
+        # Scheduler task will be started in run_server()
+        self.visibility_task = None
             
         log.info(f"Node {self.node_id} dibuat. Ring: {self.all_nodes}")
 
-    def get_redis_conn(self):
-        """Mendapatkan koneksi Redis dari pool."""
-        return redis.Redis(connection_pool=self.redis_pool)
+    def get_redis_conn(self) -> aioredis.Redis:
+        """Mendapatkan client Redis async (koneksi diambil dari pool per perintah)."""
+        return self.redis
+
+    # --- Visibility timeout (in-flight -> kembali ke queue) ---
 
-    async def cleanup_unacked_messages(self):
+    def schedule_visibility(self, queue_name: str, deadline: float):
+        """Pastikan queue dicek paling lambat pada 'deadline' (hanya memajukan jadwal)."""
+        current = self.visibility_wheel.deadlines.get(queue_name)
+        if current is None or deadline < current:
+            self.visibility_wheel.schedule(queue_name, deadline)
+
+    async def visibility_scheduler_loop(self):
         """
-        Background task to requeue messages that haven't been acknowledged
+        Background task: majukan timer wheel setiap QUEUE_VISIBILITY_TICK dan
+        kembalikan pesan kedaluwarsa hanya dari queue yang jatuh tempo
+        (bukan scan semua pesan in-flight).
         """
         while True:
             try:
-                await asyncio.sleep(30)  # Check every 30 seconds
-                current_time = time.time()
-                expired_messages = []
-                
-                for msg_id, msg_info in self.pending_acks.items():
-                    # If message is unacked for more than 60 seconds, requeue it
-                    if current_time - msg_info["timestamp"] > 60:
-                        expired_messages.append(msg_id)
-                
-                for msg_id in expired_messages:
-                    msg_info = self.pending_acks.pop(msg_id)
-                    # Requeue the message
-                    r = self.get_redis_conn()
-                    r.lpush(msg_info["queue"], msg_info["message"])
-                    log.warning(f"[{self.node_id}] Requeued unacked message: {msg_id} to {msg_info['queue']}")
-                    
+                await asyncio.sleep(QUEUE_VISIBILITY_TICK)
+                now = time.time()
+                if now - self.last_resync >= QUEUE_REQUEUE_RESYNC:
+                    await self.resync_visibility()
+                due = [queue_name for queue_name, _ in self.visibility_wheel.advance(now)]
+                if due:
+                    await self.requeue_expired(due, now)
             except Exception as e:
-                log.error(f"[{self.node_id}] Error in cleanup task: {e}")
+                log.error(f"[{self.node_id}] Error in visibility scheduler: {e}")
+
+    async def resync_visibility(self):
+        """
+        Jadwalkan ulang semua queue milik node ini dari deadline paling awal
+        di Redis: pesan in-flight dari sebelum restart ikut ter-requeue.
+        """
+        r = self.get_redis_conn()
+        queue_names = [
+            key.decode('utf-8') for key in await r.smembers(INFLIGHT_QUEUES_KEY)
+            if self.hash_ring.get_node(key.decode('utf-8')) == self.node_id
+        ]
+        async with r.pipeline(transaction=False) as pipe:
+            for queue_name in queue_names:
+                pipe.zrange(inflight_keys(queue_name)[0], 0, 0, withscores=True)
+            earliest = await pipe.execute()
+        for queue_name, first in zip(queue_names, earliest):
+            if first:
+                self.schedule_visibility(queue_name, first[0][1])
+        self.last_resync = time.time()
+
+    async def requeue_expired(self, queue_names: list, now: float) -> int:
+        """
+        Kembalikan pesan in-flight yang deadline-nya lewat ke queue asalnya:
+        script requeue semua queue jatuh tempo dikirim dalam satu pipeline,
+        lalu setiap queue dijadwalkan lagi pada deadline berikutnya. Jika
+        pipeline gagal, queue-queue itu dicoba lagi pada tick berikutnya.
+        """
+        r = self.get_redis_conn()
+        requeued = 0
+        while queue_names:
+            try:
+                async with r.pipeline(transaction=False) as pipe:
+                    for queue_name in queue_names:
+                        deadlines_key, messages_key = inflight_keys(queue_name)
+                        await self.requeue_script(
+                            keys=[queue_name, deadlines_key, messages_key, INFLIGHT_QUEUES_KEY],
+                            args=[now, QUEUE_REQUEUE_BATCH, queue_name],
+                            client=pipe
+                        )
+                    results = await pipe.execute()
+            except Exception:
+                # Queue ini sudah keluar dari timer wheel: jangan tunggu resync berikutnya
+                for queue_name in queue_names:
+                    self.schedule_visibility(queue_name, now + QUEUE_VISIBILITY_TICK)
+                raise
+            
+            # Queue yang mengisi penuh batch mungkin masih punya pesan kedaluwarsa
+            remaining = []
+            for queue_name, (count, next_deadline) in zip(queue_names, results):
+                requeued += count
+                if count:
+                    log.warning(f"[{self.node_id}] Requeued {count} unacked message(s) to '{queue_name}'")
+                    self.notify_queue(queue_name, count)
+                if count >= QUEUE_REQUEUE_BATCH:
+                    remaining.append(queue_name)
+                elif next_deadline:
+                    self.schedule_visibility(queue_name, float(next_deadline))
+            queue_names = remaining
+        return requeued
+
+    # --- Long polling ---
+
+    def notify_queue(self, queue_name: str, count: int):
+        """Bangunkan hingga 'count' consumer yang menunggu pesan di queue ini."""
+        self.queue_push_seq[queue_name] = self.queue_push_seq.get(queue_name, 0) + 1
+        waiters = self.queue_waiters.get(queue_name)
+        while waiters and count > 0:
+            future = waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                count -= 1
+
+    async def wait_for_messages(self, queue_name: str, timeout: float):
+        """Tunggu notifikasi push ke queue ini, paling lama 'timeout' detik."""
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.queue_waiters.setdefault(queue_name, deque())
+        waiters.append(future)
+        if queue_name not in self.queue_rechecks:
+            self.queue_rechecks[queue_name] = asyncio.create_task(self.recheck_queue(queue_name))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters and self.queue_waiters.get(queue_name) is waiters:
+                del self.queue_waiters[queue_name]
+
+    async def recheck_queue(self, queue_name: str):
+        """
+        Jaring pengaman long poll, satu untuk semua consumer yang menunggu queue
+        ini: cek LLEN dengan backoff dan bangunkan consumer jika ternyata ada
+        pesan. Berhenti sendiri begitu tidak ada lagi yang menunggu.
+        """
+        delay = QUEUE_LONG_POLL_RECHECK
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                if not self.queue_waiters.get(queue_name):
+                    return
+                try:
+                    length = await self.get_redis_conn().llen(queue_name)
+                except Exception as e:
+                    log.error(f"Error cek ulang queue {queue_name}: {e}")
+                    length = 0
+                if length:
+                    self.notify_queue(queue_name, length)
+                    delay = QUEUE_LONG_POLL_RECHECK
+                else:
+                    delay = min(delay * 2, QUEUE_LONG_POLL_RECHECK_MAX)
+        finally:
+            if self.queue_rechecks.get(queue_name) is asyncio.current_task():
+                del self.queue_rechecks[queue_name]
+
+    async def pop_inflight_wait(self, queue_name: str, count: int, visibility_timeout: float,
+                                wait_seconds: float) -> list:
+        """
+        Seperti pop_inflight, tapi jika queue kosong request diparkir (long poll)
+        sampai ada push ke queue ini atau wait_seconds habis. Redis hanya dicek
+        lagi setelah dibangunkan (notify atau recheck_queue), bukan per consumer.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        while True:
+            push_seq = self.queue_push_seq.get(queue_name, 0)
+            popped = await self.pop_inflight(queue_name, count, visibility_timeout)
+            if popped:
+                return popped
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            if self.queue_push_seq.get(queue_name, 0) != push_seq:
+                continue # Ada push selama pop (notifikasinya tidak sampai ke kita): coba lagi
+            # Bisa kalah cepat dari consumer lain: jika kosong lagi, tunggu lagi
+            await self.wait_for_messages(queue_name, remaining)
+
+    async def pop_inflight(self, queue_name: str, count: int, visibility_timeout: float) -> list:
+        """
+        Ambil hingga 'count' pesan dan catat sebagai in-flight secara atomik
+        (satu script Lua). Mengembalikan [(message_id, isi pesan), ...].
+        """
+        message_ids = [f"{queue_name}:{uuid.uuid4()}" for _ in range(count)]
+        deadlines_key, messages_key = inflight_keys(queue_name)
+        deadline = time.time() + visibility_timeout
+        popped = await self.consume_script(
+            keys=[queue_name, deadlines_key, messages_key, INFLIGHT_QUEUES_KEY],
+            args=[deadline, queue_name, *message_ids]
+        )
+        if popped:
+            self.schedule_visibility(queue_name, deadline)
+        return [(message_id, message.decode('utf-8')) for message_id, message in zip(message_ids, popped)]
 
     async def handle_produce(self, request: web.Request):
         """
@@ -93,82 +386,240 @@ class QueueNode:
         if not queue_name or not message:
             return web.json_response({"error": "queue dan message harus diisi"}, status=400)
         
+        return web.json_response(await self.produce(data))
+
+    async def produce(self, data: dict) -> dict:
+        """
+        Simpan pesan, atau forward ke node yang bertanggung jawab atas queue-nya.
+        Dipakai endpoint HTTP dan transport biner (body sudah divalidasi pengirim).
+        """
+        queue_name = data.get('queue')
+        message = data.get('message')
+        
         # Tentukan node yang bertanggung jawab untuk queue ini
         responsible_node = self.hash_ring.get_node(queue_name)
         
         if responsible_node == self.node_id:
             # Kita yang bertanggung jawab, simpan ke Redis
             r = self.get_redis_conn()
-            r.rpush(queue_name, message)
+            await r.rpush(queue_name, message)
+            self.notify_queue(queue_name, 1)
             log.info(f"[{self.node_id}] Pesan ditambahkan ke queue '{queue_name}': {message}")
-            return web.json_response({"status": "success", "handled_by": self.node_id})
+            return {"status": "success", "handled_by": self.node_id}
         else:
             # Forward ke node yang bertanggung jawab
             target_url = f"{self.peer_urls[responsible_node]}/produce"
             log.info(f"[{self.node_id}] Forwarding ke {responsible_node}")
-            response = await send_message(target_url, data)
-            return web.json_response(response if response else {"error": "Node tidak merespons"})
+            response = await self.transport.send_message(target_url, data)
+            return response if response else {"error": "Node tidak merespons"}
+
+    async def handle_produce_batch(self, request: web.Request):
+        """
+        Handler untuk POST /produce-batch
+        Menambahkan banyak pesan (boleh ke banyak queue) dalam satu request.
+        Body: {"messages": [{"queue": "q1", "message": "..."}, ...]}
+              ("queue" di level atas dipakai untuk item yang tidak menyebut queue)
+        """
+        data = await request.json()
+        default_queue = data.get('queue')
+        messages = data.get('messages')
+        
+        if not isinstance(messages, list) or not messages:
+            return web.json_response({"error": "messages harus berupa list yang tidak kosong"}, status=400)
+        if len(messages) > QUEUE_MAX_BATCH:
+            return web.json_response({"error": f"maksimal {QUEUE_MAX_BATCH} pesan per batch"}, status=400)
+        
+        items = []
+        invalid = []
+        for position, item in enumerate(messages):
+            queue_name = item.get('queue', default_queue) if isinstance(item, dict) else None
+            message = item.get('message') if isinstance(item, dict) else None
+            if not queue_name or not message:
+                invalid.append(position)
+            items.append({"queue": queue_name, "message": message})
+        if invalid:
+            return web.json_response({"error": "queue dan message harus diisi", "invalid": invalid}, status=400)
+        
+        return web.json_response(await self.produce_batch({"messages": items}))
+
+    async def produce_batch(self, data: dict) -> dict:
+        """
+        Kelompokkan pesan per node yang bertanggung jawab (hash ring): bagian
+        lokal ditulis dengan satu transaksi MULTI/EXEC berisi RPUSH (satu RPUSH
+        per queue, urutan terjaga), bagian node lain di-forward ke /produce-batch
+        node itu secara paralel. "failed" berisi posisi pesan yang gagal; bagian
+        lokal all-or-nothing, tapi node yang tidak merespons (timeout) bisa saja
+        sudah menulisnya, jadi kirim ulang bisa menggandakan pesan (at-least-once).
+        """
+        messages = data.get('messages', [])
+        by_node = {}
+        for position, item in enumerate(messages):
+            by_node.setdefault(self.hash_ring.get_node(item['queue']), []).append(position)
+        
+        async def store_local(positions):
+            by_queue = {}
+            for position in positions:
+                by_queue.setdefault(messages[position]['queue'], []).append(messages[position]['message'])
+            async with self.get_redis_conn().pipeline(transaction=True) as pipe:
+                for queue_name, values in by_queue.items():
+                    pipe.rpush(queue_name, *values)
+                await pipe.execute()
+            for queue_name, values in by_queue.items():
+                self.notify_queue(queue_name, len(values))
+            log.info(f"[{self.node_id}] {len(positions)} pesan ditambahkan ke {len(by_queue)} queue")
+            return {"status": "success", "produced": len(positions)}
+        
+        async def forward(node_id, positions):
+            target_url = f"{self.peer_urls[node_id]}/produce-batch"
+            response = await self.transport.send_message(target_url, {"messages": [messages[p] for p in positions]})
+            return response if response else {"error": "Node tidak merespons"}
+        
+        node_ids = list(by_node)
+        results = await asyncio.gather(
+            *(store_local(by_node[n]) if n == self.node_id else forward(n, by_node[n]) for n in node_ids),
+            return_exceptions=True
+        )
+        
+        produced = 0
+        failed = []
+        nodes = {}
+        for node_id, result in zip(node_ids, results):
+            if isinstance(result, Exception):
+                result = {"error": str(result)}
+            nodes[node_id] = result
+            if result.get('status') in ("success", "partial"):
+                produced += result.get('produced', 0)
+                # Posisi gagal di node itu dipetakan balik ke posisi di batch ini
+                failed.extend(by_node[node_id][p] for p in result.get('failed', []))
+            else:
+                failed.extend(by_node[node_id])
+        
+        return {
+            "status": "success" if not failed else ("partial" if produced else "error"),
+            "produced": produced,
+            "failed": sorted(failed),
+            "nodes": nodes,
+            "handled_by": self.node_id
+        }
 
     async def handle_consume(self, request: web.Request):
         """
         Handler untuk POST /consume
         Mengambil pesan dari queue dengan at-least-once delivery guarantee.
-        Body: {"queue": "queue_name", "consumer_id": "client_id"}
+        Body: {"queue": "queue_name", "consumer_id": "client_id", "visibility_timeout": 30 (optional)}
+        Query: ?max=N mengambil hingga N pesan sekaligus (balasan berisi "messages")
+               ?wait_seconds=S menunggu (long poll) hingga S detik jika queue kosong
         """
         data = await request.json()
         queue_name = data.get('queue')
-        consumer_id = data.get('consumer_id', 'anonymous')
         
         if not queue_name:
             return web.json_response({"error": "queue harus diisi"}, status=400)
         
+        max_count = request.query.get('max', data.get('max'))
+        if max_count is not None:
+            try:
+                max_count = int(max_count)
+            except (TypeError, ValueError):
+                max_count = 0
+            if not 1 <= max_count <= QUEUE_MAX_BATCH:
+                return web.json_response({"error": f"max harus 1..{QUEUE_MAX_BATCH}"}, status=400)
+            # Ikut di body agar sampai ke node tujuan jika di-forward
+            data['max'] = max_count
+        
+        if 'visibility_timeout' in data and parse_visibility_timeout(data['visibility_timeout']) is None:
+            return web.json_response(
+                {"error": f"visibility_timeout harus > 0 dan <= {QUEUE_MAX_VISIBILITY_TIMEOUT:g} detik"}, status=400
+            )
+        
+        wait_seconds = request.query.get('wait_seconds', data.get('wait_seconds'))
+        if wait_seconds is not None:
+            try:
+                wait_seconds = float(wait_seconds)
+            except (TypeError, ValueError):
+                wait_seconds = -1.0
+            if not 0 <= wait_seconds <= QUEUE_MAX_WAIT_SECONDS:
+                return web.json_response(
+                    {"error": f"wait_seconds harus 0..{QUEUE_MAX_WAIT_SECONDS:g}"}, status=400
+                )
+            data['wait_seconds'] = wait_seconds
+        
+        return web.json_response(await self.consume(data))
+
+    async def consume(self, data: dict) -> dict:
+        """
+        Ambil satu pesan (atau hingga data["max"] pesan), atau forward ke node
+        yang bertanggung jawab atas queue-nya.
+        Dipakai endpoint HTTP dan transport biner (body sudah divalidasi pengirim).
+        """
+        queue_name = data.get('queue')
+        consumer_id = data.get('consumer_id', 'anonymous')
+        visibility_timeout = parse_visibility_timeout(data.get('visibility_timeout', QUEUE_VISIBILITY_TIMEOUT)) \
+            or QUEUE_VISIBILITY_TIMEOUT
+        wait_seconds = min(float(data.get('wait_seconds') or 0), QUEUE_MAX_WAIT_SECONDS)
+        
         # Tentukan node yang bertanggung jawab
         responsible_node = self.hash_ring.get_node(queue_name)
         
+        if responsible_node == self.node_id and data.get('max') is not None:
+            return await self.consume_batch(queue_name, consumer_id, data['max'], visibility_timeout, wait_seconds)
+        
         if responsible_node == self.node_id:
-            # Kita yang bertanggung jawab
-            r = self.get_redis_conn()
-            message = r.lpop(queue_name)
+            # Kita yang bertanggung jawab: pop + catat in-flight di Redis
+            popped = await self.pop_inflight_wait(queue_name, 1, visibility_timeout, wait_seconds)
             
-            if message:
-                # Generate unique message ID for tracking
-                message_id = str(uuid.uuid4())
-                message_content = message.decode('utf-8')
-                
-                # Track message for acknowledgment
-                self.pending_acks[message_id] = {
-                    "queue": queue_name,
-                    "message": message_content,
-                    "consumer": consumer_id,
-                    "timestamp": time.time()
-                }
-                
-                log.info(f"[{self.node_id}] Pesan diambil dari queue '{queue_name}': {message_content} (ID: {message_id})")
-                return web.json_response({
+            if popped:
+                message_id, message_content = popped[0]
+                log.info(f"[{self.node_id}] Pesan diambil dari queue '{queue_name}' oleh {consumer_id}: {message_content} (ID: {message_id})")
+                return {
                     "status": "success",
                     "message": message_content,
                     "message_id": message_id,
+                    "visibility_timeout": visibility_timeout,
                     "handled_by": self.node_id,
                     "note": "Please acknowledge this message using /ack endpoint"
-                })
+                }
             else:
-                return web.json_response({
+                return {
                     "status": "empty",
                     "message": None,
                     "handled_by": self.node_id
-                })
+                }
         else:
             # Forward ke node yang bertanggung jawib
             target_url = f"{self.peer_urls[responsible_node]}/consume"
             log.info(f"[{self.node_id}] Forwarding ke {responsible_node}")
-            response = await send_message(target_url, data)
-            return web.json_response(response if response else {"error": "Node tidak merespons"})
+            # Long poll: node tujuan boleh menahan request selama wait_seconds
+            response = await self.transport.send_message(target_url, data, timeout=wait_seconds + RPC_TIMEOUT)
+            return response if response else {"error": "Node tidak merespons"}
+
+    async def consume_batch(self, queue_name: str, consumer_id: str, max_count: int,
+                            visibility_timeout: float, wait_seconds: float = 0.0) -> dict:
+        """
+        Ambil hingga max_count pesan dengan satu LPOP count (Redis >= 6.2) di script in-flight.
+        Dengan wait_seconds, kembali begitu ada minimal satu pesan.
+        """
+        popped = await self.pop_inflight_wait(queue_name, max_count, visibility_timeout, wait_seconds)
+        messages = [
+            {"message": message_content, "message_id": message_id}
+            for message_id, message_content in popped
+        ]
+        
+        if messages:
+            log.info(f"[{self.node_id}] {len(messages)} pesan diambil dari queue '{queue_name}' oleh {consumer_id}")
+        return {
+            "status": "success" if messages else "empty",
+            "messages": messages,
+            "count": len(messages),
+            "visibility_timeout": visibility_timeout,
+            "handled_by": self.node_id
+        }
 
     async def handle_acknowledge(self, request: web.Request):
         """
         Handler untuk POST /ack
         Acknowledge message consumption to ensure at-least-once delivery
-        Body: {"message_id": "uuid"}
+        Body: {"message_id": "<queue>:<uuid>"}
         """
         data = await request.json()
         message_id = data.get('message_id')
@@ -176,38 +627,156 @@ class QueueNode:
         if not message_id:
             return web.json_response({"error": "message_id harus diisi"}, status=400)
         
-        if message_id in self.pending_acks:
-            # Remove from pending acknowledgments
-            msg_info = self.pending_acks.pop(message_id)
-            log.info(f"[{self.node_id}] Message acknowledged: {message_id} from queue '{msg_info['queue']}'")
-            return web.json_response({
-                "status": "success",
-                "message": "Message acknowledged",
-                "handled_by": self.node_id
-            })
-        else:
-            return web.json_response({
+        return web.json_response(await self.acknowledge(data))
+
+    async def route_message_op(self, path: str, data: dict, local_op) -> dict:
+        """
+        Operasi atas satu pesan in-flight (/ack, /extend, /nack): jalankan
+        local_op(queue_name, message_id) jika node ini pemilik queue (diambil
+        dari message_id), selain itu forward ke node pemiliknya.
+        """
+        message_id = data.get('message_id')
+        queue_name = queue_of(message_id)
+        if not queue_name:
+            return {
+                "status": "error",
+                "message": "Message ID not found or already acknowledged"
+            }
+        
+        responsible_node = self.hash_ring.get_node(queue_name)
+        if responsible_node != self.node_id:
+            target_url = f"{self.peer_urls[responsible_node]}{path}"
+            response = await self.transport.send_message(target_url, data)
+            return response if response else {"error": "Node tidak merespons"}
+        return await local_op(queue_name, message_id)
+
+    async def acknowledge(self, data: dict) -> dict:
+        """
+        Hapus pesan dari struktur in-flight di Redis (di node pemilik queue).
+        Dipakai endpoint HTTP dan transport biner (body sudah divalidasi pengirim).
+        """
+        async def ack(queue_name: str, message_id: str) -> dict:
+            deadlines_key, messages_key = inflight_keys(queue_name)
+            if await self.ack_script(keys=[deadlines_key, messages_key], args=[message_id]):
+                log.info(f"[{self.node_id}] Message acknowledged: {message_id} from queue '{queue_name}'")
+                return {
+                    "status": "success",
+                    "message": "Message acknowledged",
+                    "handled_by": self.node_id
+                }
+            return {
                 "status": "error",
                 "message": "Message ID not found or already acknowledged"
-            })
+            }
+        
+        return await self.route_message_op('/ack', data, ack)
+
+    async def handle_extend(self, request: web.Request):
+        """
+        Handler untuk POST /extend
+        Heartbeat consumer: perpanjang visibility timeout pesan yang masih diproses.
+        Body: {"message_id": "<queue>:<uuid>", "visibility_timeout": 30 (optional, dihitung dari sekarang)}
+        """
+        data = await request.json()
+        
+        if not data.get('message_id'):
+            return web.json_response({"error": "message_id harus diisi"}, status=400)
+        if 'visibility_timeout' in data and parse_visibility_timeout(data['visibility_timeout']) is None:
+            return web.json_response(
+                {"error": f"visibility_timeout harus > 0 dan <= {QUEUE_MAX_VISIBILITY_TIMEOUT:g} detik"}, status=400
+            )
+        
+        return web.json_response(await self.extend(data))
+
+    async def extend(self, data: dict) -> dict:
+        """
+        Set deadline baru = sekarang + visibility_timeout, hanya jika pesan masih in-flight.
+        Dipakai endpoint HTTP dan transport biner (body sudah divalidasi pengirim).
+        """
+        visibility_timeout = parse_visibility_timeout(data.get('visibility_timeout', QUEUE_VISIBILITY_TIMEOUT)) \
+            or QUEUE_VISIBILITY_TIMEOUT
+        
+        async def extend_local(queue_name: str, message_id: str) -> dict:
+            deadline = time.time() + visibility_timeout
+            r = self.get_redis_conn()
+            # XX: jangan menghidupkan lagi pesan yang sudah di-ack atau di-requeue
+            if await r.zadd(inflight_keys(queue_name)[0], {message_id: deadline}, xx=True, ch=True):
+                self.schedule_visibility(queue_name, deadline)
+                return {
+                    "status": "success",
+                    "visibility_timeout": visibility_timeout,
+                    "deadline": deadline,
+                    "handled_by": self.node_id
+                }
+            return {
+                "status": "error",
+                "message": "Message ID not found (already acknowledged or redelivered)"
+            }
+        
+        return await self.route_message_op('/extend', data, extend_local)
+
+    async def handle_nack(self, request: web.Request):
+        """
+        Handler untuk POST /nack
+        Tolak pesan: langsung kembali ke depan queue untuk dikirim ulang.
+        Body: {"message_id": "<queue>:<uuid>"}
+        """
+        data = await request.json()
+        
+        if not data.get('message_id'):
+            return web.json_response({"error": "message_id harus diisi"}, status=400)
+        
+        return web.json_response(await self.nack(data))
+
+    async def nack(self, data: dict) -> dict:
+        """
+        Pindahkan pesan in-flight kembali ke queue secara atomik (script Lua).
+        Dipakai endpoint HTTP dan transport biner (body sudah divalidasi pengirim).
+        """
+        async def nack_local(queue_name: str, message_id: str) -> dict:
+            deadlines_key, messages_key = inflight_keys(queue_name)
+            if await self.nack_script(keys=[deadlines_key, messages_key, queue_name], args=[message_id]):
+                self.notify_queue(queue_name, 1)
+                log.info(f"[{self.node_id}] Message nacked: {message_id} kembali ke queue '{queue_name}'")
+                return {
+                    "status": "success",
+                    "message": "Message requeued",
+                    "handled_by": self.node_id
+                }
+            return {
+                "status": "error",
+                "message": "Message ID not found (already acknowledged or redelivered)"
+            }
+        
+        return await self.route_message_op('/nack', data, nack_local)
 
     async def handle_queue_status(self, request: web.Request):
         """
         Handler untuk GET /status - Show queue status
         """
         r = self.get_redis_conn()
-        queue_info = {}
         
-        # Get all queue keys
-        for key in r.scan_iter(match="*"):
-            queue_name = key.decode('utf-8')
-            length = r.llen(queue_name)
-            queue_info[queue_name] = length
+        # Get all queue keys (tanpa key in-flight), lalu LLEN semuanya dalam satu pipeline
+        queue_names = [
+            key.decode('utf-8') async for key in r.scan_iter(match="*")
+            if not key.startswith(INFLIGHT_PREFIX.encode())
+        ]
+        inflight_queues = [key.decode('utf-8') for key in await r.smembers(INFLIGHT_QUEUES_KEY)]
+        async with r.pipeline(transaction=False) as pipe:
+            for queue_name in queue_names:
+                pipe.llen(queue_name)
+            for queue_name in inflight_queues:
+                pipe.zcard(inflight_keys(queue_name)[0])
+            counts = await pipe.execute()
+        queue_info = dict(zip(queue_names, counts))
+        in_flight = {q: n for q, n in zip(inflight_queues, counts[len(queue_names):]) if n}
         
         return web.json_response({
             "node_id": self.node_id,
             "queues": queue_info,
-            "pending_acks": len(self.pending_acks),
+            "in_flight": in_flight,
+            "pending_acks": sum(in_flight.values()),
+            "waiting_consumers": sum(len(waiters) for waiters in self.queue_waiters.values()),
             "hash_ring_nodes": self.all_nodes
         })
 
@@ -222,13 +791,32 @@ class QueueNode:
             "endpoints": {
                 "queue_operations": [
                     "POST /produce - Add message to queue",
-                    "POST /consume - Get message from queue",
+                    "POST /produce-batch - Add many messages (any queues) in one request",
+                    "POST /consume - Get message from queue (?max=N for up to N messages, ?wait_seconds=S to long poll)",
                     "POST /ack - Acknowledge message",
+                    "POST /extend - Extend a message's visibility timeout (consumer heartbeat)",
+                    "POST /nack - Reject a message for immediate redelivery",
                     "GET /status - Show queue status"
                 ]
             }
         })
 
+    async def on_startup(self, app: web.Application):
+        """Hook startup aiohttp: buka pool koneksi keluar."""
+        await self.transport.start()
+
+    async def on_cleanup(self, app: web.Application):
+        """Hook shutdown aiohttp: hentikan task latar belakang, tutup pool koneksi keluar dan Redis."""
+        if self.visibility_task is not None:
+            self.visibility_task.cancel()
+        for task in list(self.queue_rechecks.values()):
+            task.cancel()
+        if self.rpc_server is not None:
+            await self.rpc_server.close()
+        await self.transport.close()
+        await self.redis.aclose()
+        await self.redis_pool.disconnect()
+
     async def run_server(self):
         """
         Menjalankan server HTTP.
@@ -240,10 +828,17 @@ class QueueNode:
         
         # Daftarkan endpoint
         app.router.add_post('/produce', self.handle_produce)
+        app.router.add_post('/produce-batch', self.handle_produce_batch)
         app.router.add_post('/consume', self.handle_consume)
         app.router.add_post('/ack', self.handle_acknowledge)
+        app.router.add_post('/extend', self.handle_extend)
+        app.router.add_post('/nack', self.handle_nack)
         app.router.add_get('/status', self.handle_queue_status)
         
+        # Hook siklus hidup transport
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        
         # --- UBAH BARIS INI ---
         # Matikan access log aiohttp yang berisik
         runner = web.AppRunner(app, access_log=None)
@@ -253,12 +848,26 @@ class QueueNode:
         site = web.TCPSite(runner, self.host, self.port)
         await site.start()
         
-        # Start cleanup task setelah event loop berjalan
-        self.cleanup_task = asyncio.create_task(self.cleanup_unacked_messages())
+        if RPC_BINARY:
+            # Forward antar node queue lewat transport biner
+            self.rpc_server = BinaryRpcServer(self.host, self.port, advertise_host=self.node_id)
+            self.rpc_server.add_route('/produce', self.produce)
+            self.rpc_server.add_route('/produce-batch', self.produce_batch)
+            self.rpc_server.add_route('/consume', self.consume)
+            self.rpc_server.add_route('/ack', self.acknowledge)
+            self.rpc_server.add_route('/extend', self.extend)
+            self.rpc_server.add_route('/nack', self.nack)
+            await self.rpc_server.start()
+        
+        # Start visibility scheduler setelah event loop berjalan
+        self.visibility_task = asyncio.create_task(self.visibility_scheduler_loop())
         
         log.info(f"======= Queue Node {self.node_id} aktif di http://{self.host}:{self.port} =======")
         
-        await asyncio.Event().wait()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
 # --- UBAH SEMUA SETELAH INI ---
 if __name__ == "__main__":
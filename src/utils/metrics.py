@@ -0,0 +1,42 @@
+# src/utils/metrics.py
+
+
+class RttEstimator:
+    """
+    Estimasi round-trip time satu peer dengan EWMA ala TCP (Jacobson/Karels):
+    srtt = rata-rata terhaluskan, rttvar = variasinya. rto() memberi batas atas
+    yang wajar untuk "balasan seharusnya sudah datang".
+    """
+    __slots__ = ("srtt", "rttvar", "last", "samples")
+
+    ALPHA = 0.125
+    BETA = 0.25
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = 0.0
+        self.last = None
+        self.samples = 0
+
+    def observe(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.last = rtt
+        self.samples += 1
+
+    def rto(self) -> float:
+        return self.srtt + 4 * self.rttvar
+
+    def to_dict(self) -> dict:
+        if self.srtt is None:
+            return {"samples": 0}
+        return {
+            "srtt_ms": round(self.srtt * 1000, 3),
+            "rttvar_ms": round(self.rttvar * 1000, 3),
+            "last_ms": round(self.last * 1000, 3),
+            "samples": self.samples
+        }
@@ -0,0 +1,108 @@
+# src/utils/timer_wheel.py
+
+import math
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel (Varghese & Lauck) untuk ribuan deadline sekaligus.
+
+    Level 0 punya `slots` slot selebar satu tick; setiap level berikutnya
+    `slots` kali lebih kasar. Deadline jauh disimpan di level atas dan turun
+    (cascade) ke level bawah saat waktunya mendekat, sehingga schedule O(1)
+    dan setiap tick hanya menyentuh satu slot.
+
+    Pembatalan bersifat lazy: `deadlines` menyimpan deadline terbaru per key,
+    entry slot yang tidak cocok lagi diabaikan saat slot-nya diproses.
+    """
+
+    def __init__(self, now: float, tick: float = 0.1, slots: int = 256, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.current_tick = int(now / tick)
+        # key -> deadline terbaru
+        self.deadlines = {}
+        # deadline yang sudah lewat saat di-schedule; dikembalikan di advance() berikutnya
+        self.due = []
+        self.max_delta = slots ** levels - 1
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, deadline: float):
+        """Jadwalkan (atau jadwalkan ulang) key pada deadline (detik epoch)."""
+        self.deadlines[key] = deadline
+        self.insert(key, deadline)
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+
+    def insert(self, key, deadline: float):
+        target = math.ceil(deadline / self.tick)
+        delta = target - self.current_tick
+        if delta <= 0:
+            self.due.append((key, deadline))
+            return
+        delta = min(delta, self.max_delta)
+        target = self.current_tick + delta
+
+        level = 0
+        span = self.slots
+        while delta >= span:
+            level += 1
+            span *= self.slots
+        width = self.slots ** level
+        self.wheels[level][(target // width) % self.slots].append((key, deadline))
+
+    def cascade(self, level: int):
+        """Turunkan isi slot level `level` yang sekarang jatuh tempo ke level di bawahnya."""
+        width = self.slots ** level
+        index = (self.current_tick // width) % self.slots
+        entries = self.wheels[level][index]
+        self.wheels[level][index] = []
+        for key, deadline in entries:
+            if self.deadlines.get(key) == deadline:
+                self.insert(key, deadline)
+
+    def advance(self, now: float) -> list:
+        """
+        Majukan wheel sampai `now`. Mengembalikan list (key, deadline) yang
+        sudah kedaluwarsa; key tersebut dihapus dari wheel.
+        """
+        ready = self.due
+        self.due = []
+        target_tick = int(now / self.tick)
+
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            # Cascade dari level paling atas yang berputar pada tick ini
+            width = self.slots
+            top = 0
+            while top + 1 < self.levels and self.current_tick % width == 0:
+                top += 1
+                width *= self.slots
+            for level in range(top, 0, -1):
+                self.cascade(level)
+
+            index = self.current_tick % self.slots
+            entries = self.wheels[0][index]
+            self.wheels[0][index] = []
+            ready.extend(entries)
+
+        # Entry hasil cascade yang target tick-nya sudah tercapai
+        ready.extend(self.due)
+        self.due = []
+
+        expired = []
+        for key, deadline in ready:
+            if self.deadlines.get(key) != deadline:
+                continue
+            if deadline <= now:
+                del self.deadlines[key]
+                expired.append((key, deadline))
+            else:
+                # Dipotong max_delta atau pembulatan tick: jadwalkan lagi
+                self.insert(key, deadline)
+        return expired
@@ -0,0 +1,126 @@
+# src/utils/wait_for_graph.py
+
+
+class WaitForGraph:
+    """
+    Wait-for graph yang di-maintain secara inkremental untuk deteksi deadlock.
+    Edge waiter -> holder berarti 'waiter' menunggu resource yang dipegang 'holder'.
+
+    Edge ditambah/dihapus saat event antre, grant, dan release, sehingga
+    pengecekan tidak perlu membangun ulang graph dari seluruh lock table.
+    Semua traversal iteratif (tanpa rekursi), aman untuk rantai panjang.
+    """
+
+    def __init__(self):
+        # waiter -> set(holder)
+        self.out_edges = {}
+        # holder -> set(waiter)
+        self.in_edges = {}
+
+    def add_edge(self, waiter: str, holder: str):
+        if waiter == holder:
+            return
+        self.out_edges.setdefault(waiter, set()).add(holder)
+        self.in_edges.setdefault(holder, set()).add(waiter)
+
+    def add_edges(self, waiter: str, holders):
+        for holder in holders:
+            self.add_edge(waiter, holder)
+
+    def remove_edge(self, waiter: str, holder: str):
+        holders = self.out_edges.get(waiter)
+        if holders is not None:
+            holders.discard(holder)
+            if not holders:
+                del self.out_edges[waiter]
+        waiters = self.in_edges.get(holder)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self.in_edges[holder]
+
+    def remove_waiter(self, waiter: str):
+        """Menghapus semua edge keluar dari 'waiter' (berhenti menunggu)."""
+        for holder in list(self.out_edges.get(waiter, ())):
+            self.remove_edge(waiter, holder)
+
+    def clear(self):
+        self.out_edges = {}
+        self.in_edges = {}
+
+    def would_deadlock(self, waiter: str, holders) -> bool:
+        """
+        Cek inkremental sebelum menambah edge waiter -> holders:
+        siklus baru pasti melewati 'waiter', jadi cukup cari apakah 'waiter'
+        bisa dicapai dari salah satu holder. Hanya komponen yang terdampak
+        yang dijelajahi.
+        """
+        stack = list(holders)
+        seen = set()
+        while stack:
+            node = stack.pop()
+            if node == waiter:
+                return True
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(self.out_edges.get(node, ()))
+        return False
+
+    def find_cycles(self) -> list:
+        """
+        Mencari semua komponen yang mengandung siklus (Tarjan SCC iteratif).
+        Mengembalikan list of list client_id; setiap list adalah satu deadlock.
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+        counter = 0
+
+        for root in list(self.out_edges):
+            if root in index:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.out_edges.get(root, ())))]
+
+            while work:
+                node, neighbours = work[-1]
+                descended = False
+                for neighbour in neighbours:
+                    if neighbour not in index:
+                        index[neighbour] = low[neighbour] = counter
+                        counter += 1
+                        stack.append(neighbour)
+                        on_stack.add(neighbour)
+                        work.append((neighbour, iter(self.out_edges.get(neighbour, ()))))
+                        descended = True
+                        break
+                    if neighbour in on_stack:
+                        low[node] = min(low[node], index[neighbour])
+                if descended:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cycles.append(component)
+
+        return cycles
+
+    def edge_count(self) -> int:
+        return sum(len(holders) for holders in self.out_edges.values())
@@ -0,0 +1,58 @@
+# tests/test_lock_snapshot.py
+
+import pytest
+
+from src.nodes.lock_snapshot import encode_lock_table, decode_lock_table
+from src.nodes.lock_table import LockRecord, ClientRecord
+
+
+def build_table():
+    shared = LockRecord("shared")
+    shared.holders.update({"reader1", "reader2"})
+    shared.set_lease("reader1", 30.0, 1700000000.125)
+    shared.enqueue("writer", "exclusive")
+    shared.set_lease("writer", 5.5, 1700000010.5)
+    shared.enqueue("reader3", "shared")
+
+    exclusive = LockRecord("exclusive")
+    exclusive.holders.add("writer")
+
+    clients = {}
+    for client_id, holding, waiting_for in [
+        ("reader1", {"r1"}, None),
+        ("reader2", {"r1"}, None),
+        ("reader3", set(), "r1"),
+        ("writer", {"r2"}, "r1"),
+    ]:
+        record = ClientRecord()
+        record.holding.update(holding)
+        record.waiting_for = waiting_for
+        clients[client_id] = record
+    return {"r1": shared, "r2": exclusive}, clients
+
+
+def test_roundtrip_keeps_holders_queue_order_and_leases():
+    lock_data, clients = build_table()
+    decoded_locks, decoded_clients = decode_lock_table(encode_lock_table(lock_data, clients))
+
+    assert {resource_id: record.to_dict() for resource_id, record in decoded_locks.items()} == \
+        {resource_id: record.to_dict() for resource_id, record in lock_data.items()}
+    assert list(decoded_locks["r1"].queue.items()) == [("writer", "exclusive"), ("reader3", "shared")]
+    assert decoded_locks["r1"].waiting_writers == 1
+    assert decoded_locks["r1"].get_lease("reader1") == (30.0, 1700000000.125)
+    assert decoded_locks["r1"].get_lease("writer") == (5.5, 1700000010.5)
+    assert decoded_locks["r2"].leases is None
+
+    assert {client_id: (record.holding, record.waiting_for) for client_id, record in decoded_clients.items()} == \
+        {client_id: (record.holding, record.waiting_for) for client_id, record in clients.items()}
+
+
+def test_empty_table_roundtrip():
+    assert decode_lock_table(encode_lock_table({}, {})) == ({}, {})
+
+
+def test_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        decode_lock_table(b"XYZ\x03")
+    with pytest.raises(ValueError):
+        decode_lock_table(b"LKS\x09")
@@ -0,0 +1,171 @@
+# tests/test_storage.py
+
+import asyncio
+import os
+
+from src.consensus.storage import RaftStorage, RECORD_HEADER
+
+
+def make_entries(start: int, count: int, term: int = 1) -> list:
+    return [{"term": term, "command": {"op": "noop", "n": index}} for index in range(start, start + count)]
+
+
+def write(storage: RaftStorage, start: int, entries: list):
+    """append() menjadwalkan group fsync di event loop; tunggu sampai durable."""
+    async def run():
+        storage.append(start, entries)
+        await storage.barrier()
+    asyncio.run(run())
+
+
+def reopen(data_dir, after_index: int = 0, **kwargs):
+    storage = RaftStorage(str(data_dir), fsync_window=0, **kwargs)
+    return storage, storage.load(after_index)
+
+
+def test_replay_returns_all_entries_across_segments(tmp_path):
+    storage, entries = reopen(tmp_path, segment_max_bytes=100)
+    assert entries == []
+    write(storage, 1, make_entries(1, 10))
+    assert len(storage.segments) > 1
+    storage.close()
+
+    storage, entries = reopen(tmp_path, segment_max_bytes=100)
+    assert entries == make_entries(1, 10)
+    assert storage.written_index == 10
+    assert storage.synced_index == 10
+    storage.close()
+
+
+def test_replay_cuts_torn_tail_and_keeps_appending(tmp_path):
+    storage, _ = reopen(tmp_path)
+    write(storage, 1, make_entries(1, 5))
+    storage.close()
+
+    # Crash di tengah menulis record ke-6: header utuh, payload terpotong
+    _, path = storage.segments[-1]
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(RECORD_HEADER.pack(6, 50, 0) + b'{"t":1')
+
+    storage, entries = reopen(tmp_path)
+    assert entries == make_entries(1, 5)
+    assert storage.written_index == 5
+    assert os.path.getsize(path) == valid_size
+
+    write(storage, 6, make_entries(6, 2))
+    storage.close()
+    _, entries = reopen(tmp_path)
+    assert entries == make_entries(1, 7)
+
+
+def test_replay_stops_at_corrupt_record(tmp_path):
+    storage, _ = reopen(tmp_path)
+    write(storage, 1, make_entries(1, 5))
+    storage.close()
+
+    # Balik satu byte di payload record terakhir: CRC tidak cocok lagi
+    _, path = storage.segments[-1]
+    with open(path, "r+b") as f:
+        f.seek(-2, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-2, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    storage, entries = reopen(tmp_path)
+    assert entries == make_entries(1, 4)
+    assert storage.written_index == 4
+    storage.close()
+
+
+def test_corrupt_segment_drops_later_segments(tmp_path):
+    storage, _ = reopen(tmp_path, segment_max_bytes=100)
+    write(storage, 1, make_entries(1, 10))
+    storage.close()
+    first_index, path = storage.segments[0]
+    segment_count = len(storage.segments)
+
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+
+    storage, entries = reopen(tmp_path, segment_max_bytes=100)
+    # Segment berikutnya tidak menyambung lagi dan ikut dibuang
+    assert len(storage.segments) == 1 < segment_count
+    assert entries == make_entries(1, len(entries))
+    assert storage.written_index == len(entries) < 10
+    storage.close()
+
+
+def test_truncate_from_discards_suffix_across_segments(tmp_path):
+    storage, _ = reopen(tmp_path, segment_max_bytes=100)
+    write(storage, 1, make_entries(1, 10))
+
+    storage.truncate_from(4)
+    assert storage.written_index == 3
+    assert storage.synced_index == 3
+    assert all(first_index < 4 for first_index, _ in storage.segments)
+
+    # Leader baru menimpa suffix dengan entry term lain
+    write(storage, 4, make_entries(4, 3, term=2))
+    storage.close()
+
+    _, entries = reopen(tmp_path, segment_max_bytes=100)
+    assert entries == make_entries(1, 3) + make_entries(4, 3, term=2)
+
+
+def test_truncate_from_past_end_is_noop(tmp_path):
+    storage, _ = reopen(tmp_path)
+    write(storage, 1, make_entries(1, 3))
+    storage.truncate_from(10)
+    assert storage.written_index == 3
+    storage.close()
+    _, entries = reopen(tmp_path)
+    assert entries == make_entries(1, 3)
+
+
+def test_reload_after_snapshot_and_compaction(tmp_path):
+    storage, _ = reopen(tmp_path, segment_max_bytes=100)
+    write(storage, 1, make_entries(1, 20))
+    segment_count = len(storage.segments)
+    config = {"voters": {"n1": "http://n1:8000"}, "learners": {}}
+
+    storage.save_snapshot(15, 1, b"state-at-15", config)
+    assert len(storage.segments) < segment_count
+    # Segment yang masih berisi entry > 15 tidak boleh ikut dihapus
+    assert storage.segments[0][0] <= 16
+    write(storage, 21, make_entries(21, 2))
+    storage.close()
+
+    storage = RaftStorage(str(tmp_path), fsync_window=0, segment_max_bytes=100)
+    assert storage.load_snapshot() == (15, 1, b"state-at-15", config)
+    entries = storage.load(after_index=15)
+    assert entries == make_entries(16, 7)
+    assert storage.written_index == 22
+    storage.close()
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    storage, _ = reopen(tmp_path)
+    storage.save_snapshot(5, 1, b"state")
+    path = os.path.join(str(tmp_path), "snapshot.bin")
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"X")
+    assert storage.load_snapshot() is None
+    storage.close()
+
+
+def test_wal_behind_snapshot_is_reset(tmp_path):
+    storage, _ = reopen(tmp_path)
+    write(storage, 1, make_entries(1, 3))
+    storage.close()
+
+    # Snapshot terpasang (install snapshot) tapi WAL belum menyambung
+    storage, entries = reopen(tmp_path, after_index=10)
+    assert entries == []
+    assert storage.written_index == 10
+    assert storage.segments == []
+    write(storage, 11, make_entries(11, 1))
+    storage.close()
+    _, entries = reopen(tmp_path, after_index=10)
+    assert entries == make_entries(11, 1)
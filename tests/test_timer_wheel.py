@@ -0,0 +1,68 @@
+# tests/test_timer_wheel.py
+
+from src.utils.timer_wheel import TimerWheel
+
+
+def run_until(wheel: TimerWheel, end: int, start: int = 0) -> dict:
+    """Majukan wheel satu detik per langkah; key -> detik saat ia kedaluwarsa."""
+    fired = {}
+    for now in range(start, end + 1):
+        for key, _ in wheel.advance(now):
+            assert key not in fired
+            fired[key] = now
+    return fired
+
+
+def test_deadlines_fire_on_time_across_levels():
+    # 4 slot x 3 level: level 0 = 4 tick, level 1 = 16 tick, level 2 = 64 tick
+    wheel = TimerWheel(now=0, tick=1, slots=4, levels=3)
+    deadlines = {"level0": 3, "level1": 10, "level2": 40, "fraction": 2.5}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+
+    fired = run_until(wheel, 60)
+    assert fired == {"level0": 3, "level1": 10, "level2": 40, "fraction": 3}
+    assert len(wheel) == 0
+
+
+def test_deadline_beyond_wheel_range_is_reinserted():
+    wheel = TimerWheel(now=0, tick=1, slots=4, levels=3)
+    assert wheel.max_delta == 63
+    wheel.schedule("far", 100)
+    assert run_until(wheel, 120) == {"far": 100}
+
+
+def test_advance_can_skip_many_ticks():
+    wheel = TimerWheel(now=0, tick=1, slots=4, levels=3)
+    for deadline in (5, 17, 33):
+        wheel.schedule(deadline, deadline)
+    expired = wheel.advance(50)
+    assert sorted(key for key, _ in expired) == [5, 17, 33]
+
+
+def test_past_deadline_is_returned_by_next_advance():
+    wheel = TimerWheel(now=100, tick=1)
+    wheel.schedule("late", 90)
+    assert wheel.advance(100) == [("late", 90)]
+    assert wheel.advance(101) == []
+
+
+def test_cancel_is_lazy():
+    wheel = TimerWheel(now=0, tick=1, slots=4, levels=3)
+    wheel.schedule("cancelled", 5)
+    wheel.schedule("cancelled-far", 30)
+    wheel.schedule("kept", 6)
+    wheel.cancel("cancelled")
+    wheel.cancel("cancelled-far")
+    assert len(wheel) == 1
+
+    assert run_until(wheel, 40) == {"kept": 6}
+
+
+def test_reschedule_only_fires_latest_deadline():
+    wheel = TimerWheel(now=0, tick=1, slots=4, levels=3)
+    wheel.schedule("key", 5)
+    wheel.schedule("key", 20)   # Entry lama di slot tick 5 jadi basi
+    wheel.schedule("other", 8)
+    wheel.schedule("other", 2)  # Dimajukan
+    assert run_until(wheel, 30) == {"key": 20, "other": 2}
@@ -0,0 +1,78 @@
+# tests/test_wait_for_graph.py
+
+from src.utils.wait_for_graph import WaitForGraph
+
+
+def cycle_sets(graph: WaitForGraph) -> list:
+    return sorted(sorted(cycle) for cycle in graph.find_cycles())
+
+
+def test_no_cycle_in_chain():
+    graph = WaitForGraph()
+    graph.add_edge("a", "b")
+    graph.add_edge("b", "c")
+    assert graph.find_cycles() == []
+    assert graph.edge_count() == 2
+
+
+def test_self_edge_is_ignored():
+    graph = WaitForGraph()
+    graph.add_edge("a", "a")
+    assert graph.edge_count() == 0
+    assert graph.find_cycles() == []
+
+
+def test_would_deadlock_checks_reachability_from_holders():
+    graph = WaitForGraph()
+    graph.add_edges("a", ["b"])
+    graph.add_edges("b", ["c"])
+    assert graph.would_deadlock("c", ["a"])
+    assert graph.would_deadlock("c", ["x", "b"])
+    assert not graph.would_deadlock("d", ["a"])
+    assert not graph.would_deadlock("a", ["d"])
+
+
+def test_find_cycles_returns_each_deadlock_once():
+    graph = WaitForGraph()
+    # Siklus a -> b -> c -> a, dengan ekor d -> a yang bukan bagian siklus
+    graph.add_edges("a", ["b"])
+    graph.add_edges("b", ["c"])
+    graph.add_edges("c", ["a"])
+    graph.add_edges("d", ["a"])
+    # Siklus terpisah x <-> y
+    graph.add_edges("x", ["y"])
+    graph.add_edges("y", ["x"])
+    # Shared lock: e menunggu dua holder, tanpa siklus
+    graph.add_edges("e", ["f", "g"])
+
+    assert cycle_sets(graph) == [["a", "b", "c"], ["x", "y"]]
+
+
+def test_overlapping_cycles_form_one_component():
+    graph = WaitForGraph()
+    graph.add_edges("a", ["b"])
+    graph.add_edges("b", ["a", "c"])
+    graph.add_edges("c", ["b"])
+    assert cycle_sets(graph) == [["a", "b", "c"]]
+
+
+def test_removing_waiter_breaks_cycle():
+    graph = WaitForGraph()
+    graph.add_edges("a", ["b"])
+    graph.add_edges("b", ["a"])
+    graph.remove_waiter("a")
+    assert graph.find_cycles() == []
+    assert graph.out_edges == {"b": {"a"}}
+    assert graph.in_edges == {"a": {"b"}}
+
+
+def test_long_chain_without_recursion_limit():
+    graph = WaitForGraph()
+    length = 20000
+    for position in range(length):
+        graph.add_edge(f"c{position}", f"c{position + 1}")
+    assert graph.find_cycles() == []
+    assert graph.would_deadlock(f"c{length}", ["c0"])
+    graph.add_edge(f"c{length}", "c0")
+    cycles = graph.find_cycles()
+    assert len(cycles) == 1 and len(cycles[0]) == length + 1